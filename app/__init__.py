@@ -22,14 +22,36 @@ def create_app(config_object: Optional[dict] = None) -> Flask:
     if not hasattr(app, "session_cookie_name"):
         app.session_cookie_name = app.config.get("SESSION_COOKIE_NAME", "session")
 
+    if config_object:
+        app.config.update(config_object)
+
     # Basic config
-    app.config.setdefault("SECRET_KEY", os.environ.get("SECRET_KEY", "super-secret-dev-key"))
-    app.config.setdefault("SESSION_TYPE", os.environ.get("SESSION_TYPE", "filesystem"))
+    # Flask pre-populates SECRET_KEY with None, so setdefault() would never apply
+    if not app.config.get("SECRET_KEY"):
+        app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "super-secret-dev-key")
+    # "sqlite" is served by app.utils.session_store; other types by Flask-Session
+    app.config.setdefault("SESSION_TYPE", os.environ.get("SESSION_TYPE", "sqlite"))
     app.config.setdefault("SESSION_COOKIE_HTTPONLY", True)
     app.config.setdefault("SESSION_COOKIE_SAMESITE", "Lax")
 
+    # Terminal output batching / flow control (see app.utils.pty_output)
+    app.config.setdefault("TERMINAL_FLUSH_INTERVAL_MS", os.environ.get("TERMINAL_FLUSH_INTERVAL_MS", "4"))
+    app.config.setdefault("TERMINAL_FRAME_MAX_BYTES", os.environ.get("TERMINAL_FRAME_MAX_BYTES", "65536"))
+    app.config.setdefault("TERMINAL_MAX_INFLIGHT_FRAMES", os.environ.get("TERMINAL_MAX_INFLIGHT_FRAMES", "4"))
+    app.config.setdefault("TERMINAL_OVERFLOW_MODE", os.environ.get("TERMINAL_OVERFLOW_MODE", "block"))
+    # Detached shells survive this long for a reattach (0 = kill on disconnect)
+    app.config.setdefault("TERMINAL_DETACH_GRACE_SECONDS", os.environ.get("TERMINAL_DETACH_GRACE_SECONDS", "300"))
+    app.config.setdefault("TERMINAL_SCROLLBACK_BYTES", os.environ.get("TERMINAL_SCROLLBACK_BYTES", "262144"))
+    app.config.setdefault("TERMINAL_SHELL_POOL_SIZE", os.environ.get("TERMINAL_SHELL_POOL_SIZE", "2"))
+
+    # Fork the shell spawner before the process grows (0 disables the pool)
+    from app.utils.shell_pool import start_pool
+    start_pool(int(app.config["TERMINAL_SHELL_POOL_SIZE"]))
+
     # Extensions
     server_session.init_app(app)
+    from app.utils.session_store import init_session
+    init_session(app)
     socketio.init_app(app, cors_allowed_origins="*")
 
     # Blueprints
@@ -40,6 +62,10 @@ def create_app(config_object: Optional[dict] = None) -> Flask:
     from app.routes.aws_api import aws_bp
     from app.routes.social_api import social_bp
     from app.routes.js_tools import js_bp
+    from app.routes import docker_ws  # noqa: F401 - registers the /docker Socket.IO namespace
+    from app.routes import aws_ws  # noqa: F401 - registers the /aws Socket.IO namespace
+    from app.routes import social_ws  # noqa: F401 - registers the /social Socket.IO namespace
+    from app.routes import gemini_ws  # noqa: F401 - registers the /gemini Socket.IO namespace
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(dashboard_bp)
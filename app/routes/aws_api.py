@@ -1,23 +1,53 @@
 """
 Minimal AWS boto3 wrappers for EC2 launch/terminate and CloudWatch logs.
 
+Fleet-sized launches/terminations run as background jobs (see
+`app.utils.ec2_jobs`); their progress is pushed over the /aws namespace.
+
 This file expects AWS credentials to be configured in the environment or via
 ~/.aws/credentials on the RHEL host.
 """
 from __future__ import annotations
 
+import json
 import os
-from datetime import datetime, timedelta
 from typing import Any
 
-import boto3
 from botocore.exceptions import ClientError
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 
 from app.auth import login_required
+from app.utils.aws_client import LOGS_MAX_EVENTS, get_aws_client, log_reader_from_payload
+from app.utils.cloudwatch_tail import get_tail_hub
+from app.utils.ec2_inventory import get_ec2_inventory
+from app.utils.ec2_jobs import get_job_manager
 
 aws_bp = Blueprint('aws_api', __name__)
 
+# Batch jobs keep the instance inventory current as they go
+get_job_manager().add_listener(lambda event: get_ec2_inventory().apply(event['region'], event['changed']))
+
+
+@aws_bp.route('/instances', methods=['GET'])
+@login_required
+def list_instances():
+    """List instances from the server-side inventory.
+
+    Query: region, state, refresh=true (start a full sweep in the background).
+    """
+    inventory = get_ec2_inventory()
+    region, state = request.args.get('region'), request.args.get('state')
+    if request.args.get('refresh', 'false').lower() == 'true':
+        inventory.request_sweep()
+    elif inventory.etag(region, state) in request.if_none_match:
+        # Skip building and serialising a large unchanged listing
+        return Response(status=304, headers={'ETag': f'"{inventory.etag(region, state)}"'})
+    result, etag = inventory.instances(region=region, state=state)
+    resp = jsonify(result)
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp.make_conditional(request)
+
 
 @aws_bp.route('/launch_ec2', methods=['POST'])
 @login_required
@@ -30,10 +60,11 @@ def launch_ec2():
     if not ami:
         return jsonify({'error': 'ami is required'}), 400
 
-    ec2 = boto3.client('ec2')
+    ec2 = get_aws_client('ec2')
     try:
         resp = ec2.run_instances(ImageId=ami, InstanceType=instance_type, MinCount=1, MaxCount=1, KeyName=key_name)
         inst = resp['Instances'][0]
+        get_ec2_inventory().apply(None, {inst['InstanceId']: inst['State']['Name']})
         return jsonify({'instance_id': inst['InstanceId'], 'state': inst['State']}), 200
     except ClientError as e:
         return jsonify({'error': str(e)}), 500
@@ -46,31 +77,135 @@ def terminate_ec2():
     instance_id = payload.get('instance_id')
     if not instance_id:
         return jsonify({'error': 'instance_id required'}), 400
-    ec2 = boto3.client('ec2')
+    ec2 = get_aws_client('ec2')
     try:
         resp = ec2.terminate_instances(InstanceIds=[instance_id])
+        get_ec2_inventory().apply(None, {instance_id: resp['TerminatingInstances'][0]['CurrentState']['Name']})
         return jsonify(resp['TerminatingInstances'][0]), 200
     except ClientError as e:
         return jsonify({'error': str(e)}), 500
 
 
+@aws_bp.route('/ec2/launch_batch', methods=['POST'])
+@login_required
+def launch_ec2_batch():
+    """Launch `count` instances in the background; returns 202 with a job id.
+
+    Body: {"ami", "count", "instance_type", "key_name", "region", "tags": {..}}.
+    Follow progress with GET /ec2/jobs/<id> or `watch_job` on the /aws namespace.
+    """
+    payload = request.json or {}
+    ami = payload.get('ami') or os.environ.get('DEFAULT_AMI')
+    if not ami:
+        return jsonify({'error': 'ami is required'}), 400
+    try:
+        job = get_job_manager().launch(
+            ami, int(payload.get('count', 1)),
+            instance_type=payload.get('instance_type') or 't3.micro',
+            key_name=payload.get('key_name'),
+            region=payload.get('region'),
+            tags=payload.get('tags'),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'job_id': job.id}), 202
+
+
+@aws_bp.route('/ec2/terminate_batch', methods=['POST'])
+@login_required
+def terminate_ec2_batch():
+    """Terminate a list of instances in the background; returns 202 with a job id."""
+    payload = request.json or {}
+    instance_ids = payload.get('instance_ids')
+    if not isinstance(instance_ids, list) or not instance_ids:
+        return jsonify({'error': 'instance_ids must be a non-empty list'}), 400
+    try:
+        job = get_job_manager().terminate([str(i) for i in instance_ids], region=payload.get('region'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'job_id': job.id}), 202
+
+
+@aws_bp.route('/ec2/jobs/<job_id>', methods=['GET'])
+@login_required
+def ec2_job_status(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify(job.snapshot()), 200
+
+
 @aws_bp.route('/cloudwatch_logs', methods=['POST'])
 @login_required
 def cloudwatch_logs():
     payload = request.json or {}
     log_group = payload.get('log_group')
-    start_minutes = int(payload.get('last_minutes', 60))
 
     if not log_group:
         return jsonify({'error': 'log_group required'}), 400
 
-    logs = boto3.client('logs')
-    end_time = int(datetime.utcnow().timestamp() * 1000)
-    start_time = int((datetime.utcnow() - timedelta(minutes=start_minutes)).timestamp() * 1000)
+    if payload.get('tail'):
+        return _tail_logs(payload)
 
     try:
-        resp = logs.filter_log_events(logGroupName=log_group, startTime=start_time, endTime=end_time, limit=100)
-        events = [{'message': e['message'], 'timestamp': e['timestamp']} for e in resp.get('events', [])]
-        return jsonify({'events': events}), 200
+        reader = log_reader_from_payload(payload, default_max_events=100)
+        events = [{'message': e['message'], 'timestamp': e['timestamp']} for batch in reader for e in batch]
+        return jsonify({'events': events, 'truncated': reader.truncated,
+                        'last_timestamp': reader.last_timestamp}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except ClientError as e:
         return jsonify({'error': str(e)}), 500
+
+
+def _tail_logs(payload):
+    """Tail mode: {"tail": true, "cursor": <from the previous response>}.
+
+    Served from the shared poller of the log group, so repeated polls by any
+    number of viewers cost no extra AWS calls. Without a cursor the recent
+    history is returned; "gap" is true if events were missed since `cursor`,
+    including when the poller was restarted (the history is then resent).
+    """
+    tailer = get_tail_hub().touch(payload['log_group'], payload.get('region'), payload.get('filter_pattern'))
+    try:
+        events, cursor, gap = tailer.since(payload.get('cursor'))
+    except ValueError:
+        return jsonify({'error': 'invalid cursor'}), 400
+    return jsonify({'id': tailer.id, 'events': events, 'cursor': cursor, 'gap': gap,
+                    'poll_interval': tailer.interval, 'error': tailer.last_error}), 200
+
+
+@aws_bp.route('/cloudwatch_logs/stream', methods=['POST'])
+@login_required
+def stream_cloudwatch_logs():
+    """Stream every event of a time window as NDJSON, page by page.
+
+    Body: {"log_group", "last_minutes" | "start_time"/"end_time" (epoch ms),
+    "filter_pattern", "log_streams": [...] | "log_stream_prefix",
+    "max_events", "max_bytes", "region"}. Each line is
+    {"timestamp", "message", "stream"}; the last line is
+    {"done": true, "events", "bytes", "pages", "truncated", "last_timestamp"}
+    or {"error": ...}.
+    """
+    payload = request.json or {}
+    if not payload.get('log_group'):
+        return jsonify({'error': 'log_group required'}), 400
+    try:
+        reader = log_reader_from_payload(payload, default_max_events=LOGS_MAX_EVENTS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        # Pages are fetched only as the client consumes them
+        try:
+            for batch in reader:
+                yield ''.join(json.dumps(event) + '\n' for event in batch)
+            yield json.dumps(dict(reader.summary(), done=True)) + '\n'
+        except Exception as e:
+            yield json.dumps({'error': str(e)}) + '\n'
+
+    resp = Response(generate(), mimetype='application/x-ndjson')
+    resp.headers['X-Accel-Buffering'] = 'no'
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
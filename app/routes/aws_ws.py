@@ -0,0 +1,171 @@
+"""
+Socket.IO namespace `/aws` for streamed AWS data.
+
+CloudWatch Logs: emit `read_logs` with the same body as
+POST /api/aws/cloudwatch_logs/stream; the server answers `logs_started`
+with a read id, then sends one `log_events` frame ({"id", "events": [...]})
+per page and finally `logs_done` ({"id", "events", "bytes", "pages",
+"truncated", "last_timestamp"}) or `logs_error`. Each frame must be acked;
+with too many unacked frames no further pages are fetched. Emit
+`cancel_logs` with {"id"} to stop early.
+
+Live tail: emit `tail_logs` with {"log_group", "region", "filter_pattern"};
+the server answers `tail_history` ({"id", "events", "cursor"}) and then
+broadcasts `tail_events` ({"id", "events"}) to everyone tailing that group,
+from a single shared poller. Emit `untail_logs` with {"id"} to stop.
+
+EC2 jobs: emit `watch_job` with {"id"} (from POST /api/aws/ec2/launch_batch
+or terminate_batch); the server answers `ec2_job` with the full job status
+and then sends `ec2_job_progress` ({"id", "status", "counts", "changed",
+"errors"}) on every state change until the job finishes.
+"""
+from __future__ import annotations
+
+import threading
+import uuid
+from typing import Dict, Set, Tuple
+
+from flask import request, session as flask_session
+from flask_socketio import disconnect, emit, join_room, leave_room
+
+from app import socketio
+from app.utils.aws_client import LOGS_MAX_EVENTS, log_reader_from_payload
+from app.utils.cloudwatch_tail import get_tail_hub
+from app.utils.ec2_jobs import get_job_manager
+
+_NAMESPACE = '/aws'
+_MAX_INFLIGHT_FRAMES = 4
+
+# (socket sid, read id) -> stop event
+_LOG_READS: Dict[Tuple[str, str], threading.Event] = {}
+# socket sid -> ids of the log groups it tails
+_TAILS: Dict[str, Set[str]] = {}
+
+
+def _tail_room(tid):
+    return f'tail:{tid}'
+
+
+def _publish_tail(tid, events):
+    socketio.emit('tail_events', {'id': tid, 'events': events}, to=_tail_room(tid), namespace=_NAMESPACE)
+
+
+get_tail_hub().add_listener(_publish_tail)
+
+
+def _job_room(job_id):
+    return f'job:{job_id}'
+
+
+def _publish_job(event):
+    socketio.emit('ec2_job_progress', event, to=_job_room(event['id']), namespace=_NAMESPACE)
+
+
+get_job_manager().add_listener(_publish_job)
+
+
+@socketio.on('connect', namespace=_NAMESPACE)
+def on_connect():
+    if 'user' not in flask_session:
+        disconnect()
+        return
+    emit('connected', {'msg': 'connected to aws namespace'})
+
+
+@socketio.on('read_logs', namespace=_NAMESPACE)
+def read_logs(data):
+    data = data or {}
+    if not data.get('log_group'):
+        emit('logs_error', {'error': 'log_group required'})
+        return
+    try:
+        reader = log_reader_from_payload(data, default_max_events=LOGS_MAX_EVENTS)
+    except ValueError as e:
+        emit('logs_error', {'error': str(e)})
+        return
+    read_id = uuid.uuid4().hex
+    stopped = threading.Event()
+    _LOG_READS[(request.sid, read_id)] = stopped
+    emit('logs_started', {'id': read_id, 'log_group': data['log_group']})
+    socketio.start_background_task(_pump_log_pages, request.sid, read_id, reader, stopped)
+
+
+@socketio.on('cancel_logs', namespace=_NAMESPACE)
+def cancel_logs(data):
+    stopped = _LOG_READS.pop((request.sid, (data or {}).get('id')), None)
+    if stopped is not None:
+        stopped.set()
+
+
+@socketio.on('tail_logs', namespace=_NAMESPACE)
+def tail_logs(data):
+    data = data or {}
+    if not data.get('log_group'):
+        emit('tail_error', {'error': 'log_group required'})
+        return
+    hub = get_tail_hub()
+    tails = _TAILS.setdefault(request.sid, set())
+    tailer = hub.subscribe(data['log_group'], data.get('region'), data.get('filter_pattern'))
+    if tailer.id in tails:
+        hub.unsubscribe(tailer.id)  # already tailing: just resend the history
+    else:
+        tails.add(tailer.id)
+        join_room(_tail_room(tailer.id))
+    events, cursor, _ = tailer.since(None)
+    emit('tail_history', {'id': tailer.id, 'log_group': data['log_group'], 'events': events, 'cursor': cursor})
+
+
+@socketio.on('untail_logs', namespace=_NAMESPACE)
+def untail_logs(data):
+    tid = (data or {}).get('id')
+    tails = _TAILS.get(request.sid, set())
+    if tid in tails:
+        tails.discard(tid)
+        leave_room(_tail_room(tid))
+        get_tail_hub().unsubscribe(tid)
+
+
+@socketio.on('watch_job', namespace=_NAMESPACE)
+def watch_job(data):
+    job = get_job_manager().get((data or {}).get('id') or '')
+    if job is None:
+        emit('ec2_job_error', {'error': 'unknown job'})
+        return
+    # Join first so no progress event falls between the snapshot and the room
+    join_room(_job_room(job.id))
+    emit('ec2_job', job.snapshot())
+
+
+@socketio.on('unwatch_job', namespace=_NAMESPACE)
+def unwatch_job(data):
+    leave_room(_job_room((data or {}).get('id') or ''))
+
+
+@socketio.on('disconnect', namespace=_NAMESPACE)
+def on_disconnect():
+    sid = request.sid
+    for key in [k for k in _LOG_READS if k[0] == sid]:
+        _LOG_READS.pop(key).set()
+    for tid in _TAILS.pop(sid, ()):
+        get_tail_hub().unsubscribe(tid)
+
+
+def _pump_log_pages(sid, read_id, reader, stopped):
+    window = threading.Semaphore(_MAX_INFLIGHT_FRAMES)
+    try:
+        for batch in reader:
+            # The paginator only fetches the next page once this returns
+            while not window.acquire(timeout=1.0):
+                if stopped.is_set():
+                    return
+            if stopped.is_set():
+                return
+            socketio.emit('log_events', {'id': read_id, 'events': batch}, to=sid,
+                          namespace=_NAMESPACE, callback=lambda *args: window.release())
+        if not stopped.is_set():
+            socketio.emit('logs_done', dict(reader.summary(), id=read_id), to=sid, namespace=_NAMESPACE)
+    except Exception as e:
+        if not stopped.is_set():
+            socketio.emit('logs_error', {'id': read_id, 'error': str(e)}, to=sid, namespace=_NAMESPACE)
+    finally:
+        _LOG_READS.pop((sid, read_id), None)
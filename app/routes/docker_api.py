@@ -5,42 +5,43 @@ Provides REST endpoints for the basic docker actions you specified.
 """
 from __future__ import annotations
 
+import json
 import typing
-from flask import Blueprint, jsonify, request
-
-try:
-    import docker
-except Exception:  # pragma: no cover - docker SDK optional
-    docker = None
+from flask import Blueprint, Response, jsonify, request
 
 from app.auth import login_required
+from app.utils.docker_client import (
+    BULK_ACTIONS, BULK_MAX_TARGETS, bulk_action, get_client, iter_log_batches, open_log_stream, parse_log_time,
+)
+from app.utils.docker_inspect import inspect_container as cached_inspect, inspect_many, project
+from app.utils.docker_inventory import get_inventory
 
 docker_bp = Blueprint('docker_api', __name__)
 
 
-def get_client():
-    if docker is None:
-        raise RuntimeError('docker SDK not installed')
-    return docker.from_env()
-
-
 @docker_bp.route('/images', methods=['GET'])
 @login_required
 def list_images():
-    client = get_client()
-    images = client.images.list()
-    result = [{'id': img.short_id, 'tags': img.tags} for img in images]
-    return jsonify(result)
+    result, etag = get_inventory().images()
+    return _conditional_json(result, etag)
 
 
 @docker_bp.route('/containers', methods=['GET'])
 @login_required
 def list_containers():
-    client = get_client()
     all_flag = request.args.get('all', 'false').lower() == 'true'
-    containers = client.containers.list(all=all_flag)
-    result = [{'id': c.short_id, 'name': c.name, 'status': c.status} for c in containers]
-    return jsonify(result)
+    result, etag = get_inventory().containers(all_containers=all_flag)
+    return _conditional_json(result, etag)
+
+
+def _conditional_json(result, etag):
+    # Inventory listings carry an ETag so unchanged lists answer 304
+    resp = jsonify(result)
+    if etag:
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'no-cache'
+        resp = resp.make_conditional(request)
+    return resp
 
 
 @docker_bp.route('/start', methods=['POST'])
@@ -106,16 +107,76 @@ def remove_image():
         return jsonify({'error': str(e)}), 500
 
 
+@docker_bp.route('/bulk', methods=['POST'])
+@login_required
+def bulk_containers():
+    """Apply one action to many containers/images in parallel.
+
+    Expects JSON: {"action": "start|stop|rm|rmi", "targets": ["name", ...],
+    "timeout": 60, "stop_timeout": 10, "stream": false}. With "stream": true
+    results are sent as NDJSON lines as each item finishes, followed by a
+    {"summary": ...} line.
+    """
+    payload = request.json or {}
+    action = payload.get('action')
+    targets = payload.get('targets') or []
+    if action not in BULK_ACTIONS:
+        return jsonify({'error': f'action must be one of {list(BULK_ACTIONS)}'}), 400
+    if not isinstance(targets, list) or not targets or not all(isinstance(t, str) and t for t in targets):
+        return jsonify({'error': 'targets must be a non-empty list of names'}), 400
+    if len(targets) > BULK_MAX_TARGETS:
+        return jsonify({'error': f'at most {BULK_MAX_TARGETS} targets per request'}), 400
+    try:
+        item_timeout = float(payload.get('timeout', 60))
+        stop_timeout = payload.get('stop_timeout')
+        stop_timeout = int(stop_timeout) if stop_timeout is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'timeout and stop_timeout must be numbers'}), 400
+
+    results = bulk_action(action, targets, item_timeout=item_timeout, stop_timeout=stop_timeout)
+    if not payload.get('stream'):
+        items = list(results)
+        return jsonify({'results': items, 'summary': _bulk_summary(items)})
+
+    def generate():
+        items = []
+        try:
+            for item in results:
+                items.append(item)
+                yield json.dumps(item) + '\n'
+            yield json.dumps({'summary': _bulk_summary(items)}) + '\n'
+        finally:
+            results.close()
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+def _bulk_summary(items):
+    summary = {'total': len(items)}
+    for item in items:
+        summary[item['status']] = summary.get(item['status'], 0) + 1
+    return summary
+
+
 @docker_bp.route('/inspect', methods=['GET'])
 @login_required
 def inspect_container():
+    """Inspect one or more containers, optionally projected to a few fields.
+
+    Query: name (or names=a,b,c for several), fields=State.Status,Config.Image.
+    A single name returns the document (or {field: value} when projected);
+    several names return {"containers": {name: ...}} with per-name errors.
+    """
+    names = [n for n in request.args.get('names', '').split(',') if n]
     name = request.args.get('name')
-    if not name:
+    fields = [f for f in request.args.get('fields', '').split(',') if f]
+    if not name and not names:
         return jsonify({'error': 'container name required'}), 400
-    client = get_client()
+    if names:
+        return jsonify({'containers': inspect_many(names, fields)})
     try:
-        container = client.containers.get(name)
-        return jsonify(container.attrs)
+        attrs = cached_inspect(name)
+        return jsonify(project(attrs, fields) if fields else attrs)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -133,4 +194,45 @@ def container_logs():
         logs = container.logs(tail=tail).decode(errors='ignore')
         return jsonify({'logs': logs})
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+@docker_bp.route('/logs/stream', methods=['GET'])
+@login_required
+def stream_container_logs():
+    """Stream logs as NDJSON, one {"line": ..} (plus "ts") object per line.
+
+    Query: name, follow, tail (default all), since, until (unix seconds or
+    ISO 8601), timestamps. The daemon connection is closed as soon as the
+    client goes away.
+    """
+    name = request.args.get('name')
+    if not name:
+        return jsonify({'error': 'container name required'}), 400
+    follow = request.args.get('follow', 'false').lower() == 'true'
+    timestamps = request.args.get('timestamps', 'false').lower() == 'true'
+    tail = request.args.get('tail', 'all')
+    try:
+        tail = int(tail) if tail != 'all' else tail
+        since = parse_log_time(request.args.get('since'))
+        until = parse_log_time(request.args.get('until'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        stream = open_log_stream(name, follow=follow, tail=tail, since=since, until=until, timestamps=timestamps)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    def generate():
+        # The WSGI server pulls one batch at a time, so a slow client
+        # throttles reads from the daemon instead of growing a buffer.
+        try:
+            for batch in iter_log_batches(stream, timestamps):
+                yield ''.join(json.dumps(record) + '\n' for record in batch)
+        finally:
+            stream.close()
+
+    resp = Response(generate(), mimetype='application/x-ndjson')
+    resp.headers['X-Accel-Buffering'] = 'no'
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
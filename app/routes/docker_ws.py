@@ -0,0 +1,163 @@
+"""
+Socket.IO namespace `/docker` for live container data.
+
+Log following: emit `follow_logs` with {"name", "tail", "since", "until",
+"timestamps", "follow"}; the server answers `logs_started` with a
+subscription id, then sends `log_lines` batches ({"id", "lines": [...]}) and
+finally `logs_ended`. Emit `stop_logs` with {"id"} to stop early. Each batch
+must be acked by the client; with too many unacked batches the reader stops
+pulling from the daemon, so per-client buffering stays bounded.
+
+Stats: emit `watch_stats` with {"name"}; the server answers `stats_history`
+({"id", "history": {field: [...]}}) and then broadcasts `stats_sample`
+({"id", "sample"}) to everyone watching that container, from a single
+daemon stats stream. Emit `unwatch_stats` with {"id"} to stop watching.
+"""
+from __future__ import annotations
+
+import threading
+import uuid
+from typing import Dict, Set, Tuple
+
+from flask import request, session as flask_session
+from flask_socketio import disconnect, emit, join_room, leave_room
+
+from app import socketio
+from app.utils.docker_client import get_client, iter_log_batches, open_log_stream, parse_log_time
+from app.utils.docker_stats import StatsHub
+
+_NAMESPACE = '/docker'
+_MAX_INFLIGHT_BATCHES = 8
+
+# (socket sid, subscription id) -> {'stream', 'stopped'}
+_LOG_SUBSCRIPTIONS: Dict[Tuple[str, str], Dict] = {}
+# socket sid -> full ids of the containers it watches
+_STATS_WATCHES: Dict[str, Set[str]] = {}
+
+
+def _publish_stats(container_id, sample):
+    socketio.emit('stats_sample', {'id': container_id[:12], 'sample': sample},
+                  to=_stats_room(container_id), namespace=_NAMESPACE)
+
+
+def _stats_room(container_id):
+    return f'stats:{container_id}'
+
+
+_stats_hub = StatsHub(_publish_stats)
+
+
+@socketio.on('connect', namespace=_NAMESPACE)
+def on_connect():
+    if 'user' not in flask_session:
+        disconnect()
+        return
+    emit('connected', {'msg': 'connected to docker namespace'})
+
+
+@socketio.on('follow_logs', namespace=_NAMESPACE)
+def follow_logs(data):
+    sid = request.sid
+    data = data or {}
+    name = data.get('name')
+    if not name:
+        emit('logs_error', {'error': 'container name required'})
+        return
+    timestamps = bool(data.get('timestamps', False))
+    try:
+        stream = open_log_stream(
+            name,
+            follow=bool(data.get('follow', True)),
+            tail=data.get('tail', 100),
+            since=parse_log_time(data.get('since')),
+            until=parse_log_time(data.get('until')),
+            timestamps=timestamps,
+        )
+    except Exception as e:
+        emit('logs_error', {'error': str(e)})
+        return
+
+    sub_id = uuid.uuid4().hex
+    sub = {'stream': stream, 'stopped': threading.Event()}
+    _LOG_SUBSCRIPTIONS[(sid, sub_id)] = sub
+    emit('logs_started', {'id': sub_id, 'name': name})
+    socketio.start_background_task(_pump_logs, sid, sub_id, sub, timestamps)
+
+
+@socketio.on('stop_logs', namespace=_NAMESPACE)
+def stop_logs(data):
+    _stop_subscription(request.sid, (data or {}).get('id'))
+
+
+@socketio.on('watch_stats', namespace=_NAMESPACE)
+def watch_stats(data):
+    sid = request.sid
+    name = (data or {}).get('name')
+    if not name:
+        emit('stats_error', {'error': 'container name required'})
+        return
+    try:
+        container_id = get_client().api.inspect_container(name)['Id']
+    except Exception as e:
+        emit('stats_error', {'error': str(e)})
+        return
+    watches = _STATS_WATCHES.setdefault(sid, set())
+    if container_id not in watches:
+        watches.add(container_id)
+        join_room(_stats_room(container_id))
+        watcher = _stats_hub.subscribe(container_id)
+    else:
+        watcher = _stats_hub.current(container_id)
+    emit('stats_history', {'id': container_id[:12], 'name': name, 'history': watcher.snapshot()})
+
+
+@socketio.on('unwatch_stats', namespace=_NAMESPACE)
+def unwatch_stats(data):
+    sid = request.sid
+    short_id = (data or {}).get('id') or ''
+    for container_id in [c for c in _STATS_WATCHES.get(sid, ()) if short_id and c.startswith(short_id)]:
+        _STATS_WATCHES[sid].discard(container_id)
+        leave_room(_stats_room(container_id))
+        _stats_hub.unsubscribe(container_id)
+
+
+@socketio.on('disconnect', namespace=_NAMESPACE)
+def on_disconnect():
+    sid = request.sid
+    for key in [k for k in _LOG_SUBSCRIPTIONS if k[0] == sid]:
+        _stop_subscription(*key)
+    for container_id in _STATS_WATCHES.pop(sid, ()):
+        _stats_hub.unsubscribe(container_id)
+
+
+def _stop_subscription(sid, sub_id):
+    sub = _LOG_SUBSCRIPTIONS.pop((sid, sub_id), None)
+    if not sub:
+        return
+    sub['stopped'].set()
+    # Closing the response unblocks the reader and frees the daemon connection
+    try:
+        sub['stream'].close()
+    except Exception:
+        pass
+
+
+def _pump_logs(sid, sub_id, sub, timestamps):
+    window = threading.Semaphore(_MAX_INFLIGHT_BATCHES)
+    stopped = sub['stopped']
+    try:
+        for batch in iter_log_batches(sub['stream'], timestamps):
+            while not window.acquire(timeout=1.0):
+                if stopped.is_set():
+                    return
+            if stopped.is_set():
+                return
+            socketio.emit('log_lines', {'id': sub_id, 'lines': batch}, to=sid,
+                          namespace=_NAMESPACE, callback=lambda *args: window.release())
+    except Exception as e:
+        if not stopped.is_set():
+            socketio.emit('logs_error', {'id': sub_id, 'error': str(e)}, to=sid, namespace=_NAMESPACE)
+    finally:
+        if not stopped.is_set():
+            socketio.emit('logs_ended', {'id': sub_id}, to=sid, namespace=_NAMESPACE)
+        _stop_subscription(sid, sub_id)
@@ -0,0 +1,83 @@
+"""
+Socket.IO namespace `/gemini` for streamed text generation.
+
+Emit `generate` with the same body as POST /api/js/gemini_text (plus an
+optional client-chosen "id"); the server answers `gemini_started` ({"id"}),
+then one `gemini_chunk` ({"id", "text"}) per upstream chunk and finally
+`gemini_done` ({"id", "text", "finish_reason", "cached", "coalesced", ...})
+or `gemini_error`. Emit `cancel_generate` with {"id"} to stop receiving
+chunks; the upstream call still completes and fills the cache.
+"""
+from __future__ import annotations
+
+import threading
+import uuid
+from typing import Dict, Tuple
+
+from flask import request, session as flask_session
+from flask_socketio import disconnect, emit
+
+from app import socketio
+from app.utils.gemini_proxy import get_gemini_proxy, parse_params
+
+_NAMESPACE = '/gemini'
+
+# (socket sid, generation id) -> stop event
+_GENERATIONS: Dict[Tuple[str, str], threading.Event] = {}
+
+
+@socketio.on('connect', namespace=_NAMESPACE)
+def on_connect():
+    if 'user' not in flask_session:
+        disconnect()
+        return
+    emit('connected', {'msg': 'connected to gemini namespace'})
+
+
+@socketio.on('disconnect', namespace=_NAMESPACE)
+def on_disconnect():
+    for key in [k for k in _GENERATIONS if k[0] == request.sid]:
+        _GENERATIONS.pop(key).set()
+
+
+@socketio.on('generate', namespace=_NAMESPACE)
+def generate(data):
+    data = data or {}
+    gen_id = str(data.get('id') or uuid.uuid4().hex)
+    if not data.get('prompt'):
+        emit('gemini_error', {'id': gen_id, 'error': 'prompt required'})
+        return
+    try:
+        params = parse_params(data)
+    except ValueError as e:
+        emit('gemini_error', {'id': gen_id, 'error': str(e)})
+        return
+    stopped = threading.Event()
+    _GENERATIONS[(request.sid, gen_id)] = stopped
+    emit('gemini_started', {'id': gen_id})
+    socketio.start_background_task(_pump, request.sid, gen_id, str(data['prompt']), params,
+                                   data.get('cache', True) is not False, stopped)
+
+
+@socketio.on('cancel_generate', namespace=_NAMESPACE)
+def cancel_generate(data):
+    stopped = _GENERATIONS.pop((request.sid, (data or {}).get('id')), None)
+    if stopped is not None:
+        stopped.set()
+
+
+def _pump(sid, gen_id, prompt, params, use_cache, stopped):
+    events = get_gemini_proxy().stream(prompt, params, use_cache=use_cache)
+    try:
+        for event in events:
+            if stopped.is_set():
+                return
+            if event.get('done'):
+                socketio.emit('gemini_done', dict(event, id=gen_id), to=sid, namespace=_NAMESPACE)
+            else:
+                socketio.emit('gemini_chunk', {'id': gen_id, 'text': event['text']}, to=sid, namespace=_NAMESPACE)
+    except Exception as e:
+        socketio.emit('gemini_error', {'id': gen_id, 'error': str(e)}, to=sid, namespace=_NAMESPACE)
+    finally:
+        events.close()
+        _GENERATIONS.pop((sid, gen_id), None)
@@ -1,81 +1,327 @@
 """
-JavaScript-related endpoints and Gemini proxy placeholders.
+JavaScript-related endpoints and the Gemini proxy.
 
-- Proxy to Gemini text/image generation (placeholder)
+- Proxy to Gemini text generation, cached and coalesced, optionally streamed (SSE)
 - Endpoint to accept uploaded media (photo/video) and prepare for emailing
+- Resumable chunked uploads for large captures (see app.utils.uploads)
+- Thumbnails/previews for uploads, built off-request (see app.utils.media_pipeline)
+- Emailing captured media as a streamed attachment or a download link
 - Note: All Gemini calls require API keys and you must add them to env vars.
 """
 from __future__ import annotations
 
 import os
 import base64
+import itertools
+import json
+import mimetypes
 from pathlib import Path
-from datetime import datetime
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, send_file, url_for
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from markupsafe import escape
+from werkzeug.exceptions import RequestEntityTooLarge
 
 from app.auth import login_required
+from app.utils import uploads
+from app.utils.gemini_proxy import get_gemini_proxy, parse_params
+from app.utils.mail_attachments import MAX_ATTACHMENT_BYTES
+from app.utils.media_pipeline import ARTIFACT_SUFFIXES, get_media_pipeline
+from app.utils.media_store import QuotaExceeded, get_media_store
+from app.utils.message_queue import QueueFull, get_message_queue
 
 js_bp = Blueprint('js_tools', __name__)
 
+MAIL_LINK_TTL = int(os.environ.get('MAIL_LINK_TTL', str(7 * 24 * 3600)))
+_LINK_SALT = 'captured-media-link'
+
 
 @js_bp.route('/gemini_text', methods=['POST'])
 @login_required
 def gemini_text():
-    """Proxy endpoint to send a text prompt to Gemini API and return response.
+    """Send a text prompt to Gemini and return the response.
 
-    Expects JSON: {"prompt": "..."}
+    Expects JSON: {"prompt": "...", "model", "temperature", "max_output_tokens",
+    "top_p", "top_k", "system", "cache": true, "stream": false} (all but
+    prompt optional). Identical prompts are answered from cache or share one
+    in-flight upstream call (see app.utils.gemini_proxy). With "stream" (or
+    Accept: text/event-stream) tokens are sent as Server-Sent Events:
+    `data: {"text": ...}` per chunk, then `event: done` with the full result.
     """
     payload = request.json or {}
     prompt = payload.get('prompt')
     if not prompt:
         return jsonify({'error': 'prompt required'}), 400
+    try:
+        params = parse_params(payload)
+        events = get_gemini_proxy().stream(str(prompt), params, use_cache=payload.get('cache', True) is not False)
+        # Validation and cache lookup happen on the first step, before any response is started
+        first = next(events)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 502
+
+    if not (payload.get('stream') or request.accept_mimetypes.best == 'text/event-stream'):
+        try:
+            result = first if first.get('done') else next(ev for ev in events if ev.get('done'))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 502
+        return jsonify(dict(result, response=result['text']))
+
+    def generate():
+        try:
+            for event in itertools.chain([first], events):
+                if event.get('done'):
+                    yield f"event: done\ndata: {json.dumps(event)}\n\n"
+                else:
+                    yield f"data: {json.dumps(event)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
 
-    # Placeholder: implement your Gemini HTTP call here using requests
-    # For now, return the prompt echoed back as "response".
-    return jsonify({'response': f"(gemini placeholder) {prompt}"})
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @js_bp.route('/upload_media', methods=['POST'])
 @login_required
 def upload_media():
-    """Accept multipart file uploads (photo/video) from the JS frontend and save locally.
+    """Accept a photo/video upload from the JS frontend and save it locally.
+
+    Multipart bodies (field "file") and raw bodies (filename in the
+    X-Filename header or ?filename=) are both streamed straight into the
+    upload store and hashed on the way; nothing is spooled to a temp file.
+    Responds with an upload id that frontend can use to trigger email sending.
+    """
+    if request.content_length is not None and request.content_length > uploads.MAX_UPLOAD_BYTES:
+        return jsonify({'error': f'upload exceeds {uploads.MAX_UPLOAD_BYTES} bytes'}), 413
+    try:
+        if request.mimetype == 'multipart/form-data':
+            saved = uploads.parse_multipart_to_disk(
+                request.stream, request.mimetype, request.content_length, request.mimetype_params, _upload_dir(),
+                commit=_store().add,
+            )
+            if saved is None:
+                return jsonify({'error': 'file required'}), 400
+        else:
+            filename = request.headers.get('X-Filename') or request.args.get('filename')
+            if not filename:
+                return jsonify({'error': 'file required'}), 400
+            saved = uploads.stream_to_disk(request.stream, _upload_dir(), filename, commit=_store().add)
+    except RequestEntityTooLarge as e:
+        return jsonify({'error': e.description}), 413
+    except QuotaExceeded as e:
+        return jsonify({'error': str(e)}), 507
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(_with_media_job(saved))
+
+
+def _with_media_job(saved: dict) -> dict:
+    """Queue thumbnail/preview generation for a finished upload."""
+    # Artifacts are kept next to the blob, so identical uploads share them
+    job = get_media_pipeline().submit(str(_store().blob_path(saved['sha256'])), saved['filename'])
+    if job is not None:
+        saved['media_job'] = job.id
+    return saved
+
+
+def _upload_dir() -> Path:
+    return Path(current_app.root_path) / 'uploads'
+
+
+def _store():
+    return get_media_store(_upload_dir())
+
+
+@js_bp.route('/uploads', methods=['POST'])
+@login_required
+def create_upload():
+    """Start a resumable upload.
+
+    Expects JSON: {"filename": "...", "size": <total bytes>}. Returns
+    {"upload_id", "offset", "chunk_size", ...}; the client then PATCHes
+    /uploads/<upload_id> with sequential chunks.
+    """
+    data = request.json or {}
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size required'}), 400
+    if not data.get('filename'):
+        return jsonify({'error': 'filename required'}), 400
+    if size > _store().quota_bytes:
+        return jsonify({'error': f'upload exceeds the {_store().quota_bytes} byte quota'}), 507
+    try:
+        status = uploads.create_resumable(_upload_dir(), data['filename'], size)
+    except RequestEntityTooLarge as e:
+        return jsonify({'error': e.description}), 413
+    return jsonify(status), 201
+
+
+@js_bp.route('/uploads/<upload_id>', methods=['GET', 'HEAD'])
+@login_required
+def upload_status(upload_id: str):
+    """Current offset of a resumable upload; a client resumes from here after a drop."""
+    status = uploads.resumable_status(_upload_dir(), upload_id)
+    if status is None:
+        return jsonify({'error': 'upload not found'}), 404
+    resp = jsonify(status)
+    resp.headers['Upload-Offset'] = str(status['offset'])
+    return resp
+
 
-    Responds with a path that frontend can use to trigger email sending.
+@js_bp.route('/uploads/<upload_id>', methods=['PATCH', 'PUT'])
+@login_required
+def upload_chunk(upload_id: str):
+    """Append the raw request body at the offset given in the Upload-Offset header.
+
+    409 (with the expected offset) if the offset doesn't match what the
+    server has; the response for the last chunk includes path and sha256.
     """
-    uploaded = request.files.get('file')
-    if not uploaded:
-        return jsonify({'error': 'file required'}), 400
+    try:
+        offset = int(request.headers.get('Upload-Offset', request.args.get('offset', '')))
+    except ValueError:
+        return jsonify({'error': 'Upload-Offset header required'}), 400
+    try:
+        status = uploads.append_chunk(_upload_dir(), upload_id, offset, request.stream, commit=_store().add)
+    except uploads.OffsetMismatch as e:
+        resp = jsonify({'error': str(e), 'offset': e.offset})
+        resp.headers['Upload-Offset'] = str(e.offset)
+        return resp, 409
+    except RequestEntityTooLarge as e:
+        return jsonify({'error': e.description}), 413
+    except QuotaExceeded as e:
+        return jsonify({'error': str(e)}), 507
+    if status is None:
+        return jsonify({'error': 'upload not found'}), 404
+    if status.get('complete'):
+        status = _with_media_job(status)
+    resp = jsonify(status)
+    resp.headers['Upload-Offset'] = str(status['offset'])
+    return resp
+
+
+@js_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def abort_upload(upload_id: str):
+    if not uploads.abort_resumable(_upload_dir(), upload_id):
+        return jsonify({'error': 'upload not found'}), 404
+    return jsonify({'status': 'aborted', 'upload_id': upload_id})
+
+
+@js_bp.route('/media_jobs/<job_id>', methods=['GET'])
+@login_required
+def media_job(job_id: str):
+    """Status of a thumbnail/preview job (queued, processing, done, failed) and its artifacts."""
+    job = get_media_pipeline().get(job_id)
+    if job is None:
+        return jsonify({'error': 'job not found'}), 404
+    return jsonify(job.snapshot())
+
+
+@js_bp.route('/media/<upload_id>', methods=['GET'])
+@login_required
+def media_file(upload_id: str):
+    """Serve a stored upload by id."""
+    record = _store().get(upload_id)
+    if record is None:
+        return jsonify({'error': 'upload not found'}), 404
+    return send_file(record['blob'], mimetype=mimetypes.guess_type(record['filename'])[0],
+                     download_name=record['original_name'] or record['filename'], conditional=True, max_age=3600)
 
-    save_dir = Path(current_app.root_path) / 'uploads'
-    save_dir.mkdir(parents=True, exist_ok=True)
-    timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
-    filename = f"upload_{timestamp}_{uploaded.filename}"
-    dest = save_dir / filename
-    uploaded.save(str(dest))
 
-    return jsonify({'path': str(dest), 'filename': filename})
+@js_bp.route('/media/<upload_id>/<artifact>', methods=['GET'])
+@login_required
+def media_artifact(upload_id: str, artifact: str):
+    """Serve an upload's "thumb" or "preview" once its media job has produced it."""
+    record = _store().get(upload_id)
+    if record is None:
+        return jsonify({'error': 'upload not found'}), 404
+    for suffix in ARTIFACT_SUFFIXES:
+        path = Path(record['blob'] + suffix)
+        if suffix.split('.')[1] == artifact and path.exists():
+            return send_file(path, conditional=True, max_age=3600)
+    return jsonify({'error': f'{artifact} not available'}), 404
+
+
+@js_bp.route('/media/<upload_id>', methods=['DELETE'])
+@login_required
+def delete_media(upload_id: str):
+    """Drop an upload; its bytes are reclaimed when the store needs the space."""
+    if not _store().delete(upload_id):
+        return jsonify({'error': 'upload not found'}), 404
+    return jsonify({'status': 'deleted', 'id': upload_id})
+
+
+@js_bp.route('/media_store', methods=['GET'])
+@login_required
+def media_store_stats():
+    return jsonify(_store().stats())
 
 
 @js_bp.route('/send_captured_email', methods=['POST'])
 @login_required
 def send_captured_email():
-    """Sample endpoint to send an uploaded image to an email address.
+    """Email an uploaded photo/video.
 
-    Expects JSON: {"to": "...", "file_path": "...", "subject": "..."}
+    Expects JSON: {"to": "...", "upload_id": "...", "subject": "...", "message": "..."}.
+    A "file_path" returned by an older upload_media response is still
+    accepted, but only if it names an upload in the store's index.
+    Files up to MAIL_ATTACHMENT_MAX_BYTES are attached (streamed, see
+    app.utils.mail_attachments); larger ones are sent as a signed download
+    link valid for MAIL_LINK_TTL seconds. Returns 202 with a message job id.
     """
     data = request.json or {}
     to = data.get('to')
+    upload_id = data.get('upload_id')
     file_path = data.get('file_path')
     subject = data.get('subject', 'Captured Media')
+    message = f"<p>{escape(data['message'])}</p>" if data.get('message') else ''
 
-    if not to or not file_path:
-        return jsonify({'error': 'to and file_path required'}), 400
+    if not to or not (upload_id or file_path):
+        return jsonify({'error': 'to and upload_id required'}), 400
 
-    # Use existing social_api.send_email function ideally — for brevity we just
-    # return success if file exists.
-    if not Path(file_path).exists():
+    record = _store().get(upload_id) if upload_id else _store().find_by_path(file_path)
+    if record is None:
         return jsonify({'error': 'file not found'}), 404
 
-    # Placeholder: call sendgrid / smtp to attach and send the file
-    return jsonify({'status': 'queued', 'to': to, 'file': file_path})
+    name = record['original_name'] or record['filename']
+    if record['size'] <= MAX_ATTACHMENT_BYTES:
+        delivery = 'attachment'
+        kind, payload = 'email_attachments', {
+            'to': to, 'subject': subject, 'content': message or f'<p>{escape(name)}</p>',
+            'attachments': [{'path': record['path'], 'filename': name, 'type': mimetypes.guess_type(name)[0]}],
+        }
+    else:
+        delivery = 'link'
+        token = URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=_LINK_SALT).dumps(record['id'])
+        url = url_for('js_tools.shared_media', token=token, _external=True)
+        kind, payload = 'email', {
+            'to': to, 'subject': subject,
+            'content': f'{message}<p><a href="{url}">Download {escape(name)}</a></p>',
+        }
+
+    try:
+        job = get_message_queue().enqueue(kind, payload)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'status': 'queued', 'job_id': job.id, 'delivery': delivery, 'to': to,
+                    'upload_id': record['id']}), 202
+
+
+@js_bp.route('/shared/<token>', methods=['GET'])
+def shared_media(token: str):
+    """Download link sent by send_captured_email for files too large to attach (no login)."""
+    try:
+        upload_id = URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=_LINK_SALT).loads(
+            token, max_age=MAIL_LINK_TTL
+        )
+    except BadSignature:
+        return jsonify({'error': 'link invalid or expired'}), 404
+    record = _store().get(upload_id)
+    if record is None:
+        return jsonify({'error': 'file not found'}), 404
+    return send_file(record['blob'], mimetype=mimetypes.guess_type(record['filename'])[0], as_attachment=True,
+                     download_name=record['original_name'] or record['filename'], conditional=True)
@@ -7,12 +7,16 @@ minimal and include placeholders where you must paste your API credentials.
 """
 from __future__ import annotations
 
-import os
+import json
 from typing import Dict
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 
 from app.auth import login_required
+from app.utils.message_queue import QueueFull, get_message_queue
+from app.utils.third_party_wrappers import (
+    BULK_MAX_RECIPIENTS, bulk_email_payloads, bulk_sms_payloads,
+)
 
 social_bp = Blueprint('social_api', __name__)
 
@@ -20,9 +24,10 @@ social_bp = Blueprint('social_api', __name__)
 @social_bp.route('/send_email', methods=['POST'])
 @login_required
 def send_email():
-    """Send an email using SendGrid (placeholder).
+    """Queue an email for sending via SendGrid.
 
     Expects JSON: { "to": "to@example.com", "subject": "..", "content": ".." }
+    Returns 202 with a job id; see /messages/<id> or `watch_message` on /social.
     """
     data = request.json or {}
     to = data.get('to')
@@ -32,28 +37,13 @@ def send_email():
     if not to or not subject or not content:
         return jsonify({'error': 'to, subject and content are required'}), 400
 
-    # Placeholder SendGrid implementation
-    # Install sendgrid: pip install sendgrid
-    try:
-        from sendgrid import SendGridAPIClient
-        from sendgrid.helpers.mail import Mail
-    except Exception:
-        return jsonify({'error': 'sendgrid package not installed'}), 500
-
-    sg_api_key = os.environ.get('SENDGRID_API_KEY', 'PASTE_YOUR_SENDGRID_KEY')
-    message = Mail(from_email=os.environ.get('EMAIL_FROM', 'noreply@example.com'), to_emails=to, subject=subject, html_content=content)
-    try:
-        sg = SendGridAPIClient(sg_api_key)
-        resp = sg.send(message)
-        return jsonify({'status': 'sent', 'code': resp.status_code}), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return _enqueue('email', {'to': to, 'subject': subject, 'content': content})
 
 
 @social_bp.route('/send_sms', methods=['POST'])
 @login_required
 def send_sms():
-    """Send SMS using Twilio. Expects JSON: {"to": "+9112345...", "body": "..."}
+    """Queue an SMS for sending via Twilio. Expects JSON: {"to": "+9112345...", "body": "..."}
     """
     data = request.json or {}
     to = data.get('to')
@@ -61,21 +51,140 @@ def send_sms():
     if not to or not body:
         return jsonify({'error': 'to and body required'}), 400
 
+    return _enqueue('sms', {'to': to, 'body': body})
+
+
+def _enqueue(kind, payload):
     try:
-        from twilio.rest import Client
-    except Exception:
-        return jsonify({'error': 'twilio package not installed'}), 500
+        job = get_message_queue().enqueue(kind, payload)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'status': 'queued', 'job_id': job.id}), 202
 
-    account_sid = os.environ.get('TWILIO_ACCOUNT_SID', 'PASTE_SID')
-    auth_token = os.environ.get('TWILIO_AUTH_TOKEN', 'PASTE_TOKEN')
-    from_number = os.environ.get('TWILIO_FROM_NUMBER', 'whatsapp:+1415...')
 
+@social_bp.route('/bulk_email', methods=['POST'])
+@login_required
+def bulk_email():
+    """Queue one email for many recipients on the message queue.
+
+    Expects JSON: {"recipients": ["a@x", {"to": "b@x", "substitutions": {"name": "B"}}],
+    "subject": "..", "content": "Hi -name-", "stream": false}. Recipients are
+    sent through SendGrid personalizations, one queued request per batch of
+    up to 1000, paced by MESSAGING_SENDGRID_RATE and retried like single
+    sends. Returns 202 with one job id per batch; with "stream": true the
+    per-recipient results are sent as NDJSON as each batch is sent or fails
+    for good, followed by a {"summary": ...} line. Disconnecting does not
+    cancel the queued batches.
+    """
+    data = request.json or {}
+    subject = data.get('subject')
+    content = data.get('content')
+    if not subject or not content:
+        return jsonify({'error': 'subject and content are required'}), 400
+    recipients, error = _parse_recipients(data.get('recipients'))
+    if error:
+        return jsonify({'error': error}), 400
+    queue = get_message_queue()
     try:
-        client = Client(account_sid, auth_token)
-        message = client.messages.create(body=body, from_=from_number, to=to)
-        return jsonify({'status': 'sent', 'sid': message.sid}), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        jobs = queue.enqueue_many('bulk_email', bulk_email_payloads(recipients, subject, content))
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    if not data.get('stream'):
+        return jsonify({'status': 'queued', 'job_ids': [job.id for job in jobs]}), 202
+    return _stream_results(item for job in queue.follow(jobs) for item in _email_results(job))
+
+
+@social_bp.route('/bulk_sms', methods=['POST'])
+@login_required
+def bulk_sms():
+    """Queue one SMS body for many recipients on the message queue.
+
+    Expects JSON: {"recipients": ["+91..", {"to": "+1..", "substitutions": {"code": 42}}],
+    "body": "Your code is -code-", "stream": false}. Sends are paced by the
+    Twilio rate (MESSAGING_TWILIO_RATE) and retried like single sends.
+    Returns 202 with one job id per recipient; with "stream": true the
+    per-recipient results are sent as NDJSON as each message is sent or
+    fails for good, followed by a {"summary": ...} line. Disconnecting does
+    not cancel the queued messages.
+    """
+    data = request.json or {}
+    body = data.get('body')
+    if not body:
+        return jsonify({'error': 'body required'}), 400
+    recipients, error = _parse_recipients(data.get('recipients'))
+    if error:
+        return jsonify({'error': error}), 400
+    queue = get_message_queue()
+    try:
+        jobs = queue.enqueue_many('sms', bulk_sms_payloads(recipients, body))
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    if not data.get('stream'):
+        return jsonify({'status': 'queued', 'job_ids': [job.id for job in jobs]}), 202
+    return _stream_results(_sms_result(job) for job in queue.follow(jobs))
+
+
+def _email_results(job):
+    result = job.result or {}
+    for to in job.payload['to']:
+        item = {'to': to, 'job_id': job.id, 'batch': job.payload['batch'], 'attempts': job.attempts}
+        if job.status == 'sent':
+            yield dict(item, status='accepted', status_code=result.get('status_code'),
+                       message_id=result.get('message_id'))
+        else:
+            yield dict(item, status='error', error=job.error)
+
+
+def _sms_result(job):
+    result = job.result or {}
+    item = {'to': job.payload['to'], 'job_id': job.id, 'attempts': job.attempts}
+    if job.status == 'sent':
+        return dict(item, status='accepted', sid=result.get('sid'), provider_status=result.get('status'))
+    return dict(item, status='error', error=job.error)
+
+
+def _parse_recipients(raw):
+    if not isinstance(raw, list) or not raw:
+        return None, 'recipients must be a non-empty list'
+    if len(raw) > BULK_MAX_RECIPIENTS:
+        return None, f'at most {BULK_MAX_RECIPIENTS} recipients per request'
+    recipients = []
+    for item in raw:
+        if isinstance(item, str):
+            item = {'to': item}
+        if not isinstance(item, dict) or not item.get('to') or not isinstance(item.get('substitutions') or {}, dict):
+            return None, 'each recipient must be an address or {"to", "substitutions"}'
+        recipients.append(item)
+    return recipients, None
+
+
+def _stream_results(results):
+    def generate():
+        counts = {}
+        try:
+            for item in results:
+                counts[item['status']] = counts.get(item['status'], 0) + 1
+                yield json.dumps(item) + '\n'
+            yield json.dumps({'summary': dict(counts, total=sum(counts.values()))}) + '\n'
+        finally:
+            results.close()
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+@social_bp.route('/messages/<job_id>', methods=['GET'])
+@login_required
+def message_status(job_id):
+    job = get_message_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify(job.snapshot()), 200
+
+
+@social_bp.route('/messages', methods=['GET'])
+@login_required
+def message_queue_stats():
+    return jsonify(get_message_queue().stats()), 200
 
 
 @social_bp.route('/post_x', methods=['POST'])
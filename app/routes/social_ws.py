@@ -0,0 +1,51 @@
+"""
+Socket.IO namespace `/social` for outbound message status.
+
+Emit `watch_message` with {"id"} (the job id returned by send_email /
+send_sms); the server answers `message_status` with the current status and
+sends another `message_status` on every change (sending, retrying, sent,
+failed). Emit `unwatch_message` with {"id"} to stop.
+"""
+from __future__ import annotations
+
+from flask import session as flask_session
+from flask_socketio import disconnect, emit, join_room, leave_room
+
+from app import socketio
+from app.utils.message_queue import get_message_queue
+
+_NAMESPACE = '/social'
+
+
+def _message_room(job_id):
+    return f'message:{job_id}'
+
+
+def _publish_status(snapshot):
+    socketio.emit('message_status', snapshot, to=_message_room(snapshot['id']), namespace=_NAMESPACE)
+
+
+get_message_queue().add_listener(_publish_status)
+
+
+@socketio.on('connect', namespace=_NAMESPACE)
+def on_connect():
+    if 'user' not in flask_session:
+        disconnect()
+        return
+    emit('connected', {'msg': 'connected to social namespace'})
+
+
+@socketio.on('watch_message', namespace=_NAMESPACE)
+def watch_message(data):
+    job = get_message_queue().get((data or {}).get('id') or '')
+    if job is None:
+        emit('message_error', {'error': 'unknown job'})
+        return
+    join_room(_message_room(job.id))
+    emit('message_status', job.snapshot())
+
+
+@socketio.on('unwatch_message', namespace=_NAMESPACE)
+def unwatch_message(data):
+    leave_room(_message_room((data or {}).get('id') or ''))
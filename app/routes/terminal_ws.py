@@ -1,29 +1,49 @@
 # app/routes/terminal_ws.py  -- REPLACE ENTIRE FILE WITH THIS
 from __future__ import annotations
 
+import codecs
 import os
 import select
-import signal
-import threading
 import fcntl
 import termios
 import struct
+import time
+import uuid
 from typing import Dict
 
-from flask import request, session as flask_session
+from flask import current_app, jsonify, request, session as flask_session
 from flask_socketio import emit, disconnect
 from flask import Blueprint
 terminal_bp = Blueprint("terminal", __name__)
 
 from app import socketio
+from app.auth import login_required
+from app.utils.pty_output import OutputBatcher
+from app.utils.pty_reactor import get_reactor
+from app.utils.scrollback import ScrollbackBuffer
+from app.utils.shell_pool import acquire_shell, record_first_output, stats as shell_pool_stats
 
-# Keep a map from socket sid -> pty master FD and child PID
+# Keep a map from shell session id -> pty master FD, child PID and scrollback.
+# Shells outlive their socket: on disconnect they are detached and only killed
+# once TERMINAL_DETACH_GRACE_SECONDS pass without a reattach.
 _PTY_SESSIONS: Dict[str, Dict] = {}
+# socket sid -> shell session id currently attached to it
+_SID_TO_SESSION: Dict[str, str] = {}
+
+# 'text' frames are UTF-8 decoded server-side, 'binary' frames carry raw bytes
+_OUTPUT_ENCODINGS = ('text', 'binary')
 
 @terminal_bp.route("/terminal")
 def terminal_page():
     return "Terminal WebSocket endpoint is active."
 
+
+@terminal_bp.route("/terminal/stats")
+@login_required
+def terminal_stats():
+    """Shell pool usage and time-to-first-prompt percentiles."""
+    return jsonify(shell_pool_stats())
+
 @socketio.on('connect', namespace='/terminal')
 def on_connect():
     # Only allow if Flask session has user
@@ -36,68 +56,209 @@ def on_connect():
 @socketio.on('start_shell', namespace='/terminal')
 def start_shell(data):
     sid = request.sid
-    if sid in _PTY_SESSIONS:
+    if sid in _SID_TO_SESSION:
         emit('pty_error', {'error': 'shell already started for this session'})
         return
+    encoding = (data or {}).get('encoding', 'text')
+    if encoding not in _OUTPUT_ENCODINGS:
+        emit('pty_error', {'error': f'encoding must be one of {_OUTPUT_ENCODINGS}'})
+        return
 
-    master_fd, slave_fd = os.openpty()
+    # Warm shells come from the pre-forked pool (see app.utils.shell_pool)
+    started = time.monotonic()
+    try:
+        shell = acquire_shell()
+    except OSError as e:
+        emit('pty_error', {'error': f'could not start shell: {e}'})
+        return
+    master_fd = shell.master_fd
+    reactor = get_reactor()
+    config = current_app.config
+    session_id = uuid.uuid4().hex
+    # Output is dropped until _attach points the batcher at this client
+    batcher = OutputBatcher(
+        reactor,
+        master_fd,
+        _discard_frame,
+        flush_interval=float(config['TERMINAL_FLUSH_INTERVAL_MS']) / 1000.0,
+        max_bytes=int(config['TERMINAL_FRAME_MAX_BYTES']),
+        max_inflight=int(config['TERMINAL_MAX_INFLIGHT_FRAMES']),
+        overflow=config['TERMINAL_OVERFLOW_MODE'],
+    )
+    scrollback = ScrollbackBuffer(int(config['TERMINAL_SCROLLBACK_BYTES']))
+    _PTY_SESSIONS[session_id] = {
+        'master_fd': master_fd,
+        'shell': shell,
+        'user': flask_session.get('user'),
+        'sid': None,
+        'batcher': batcher,
+        'scrollback': scrollback,
+        'grace': float(config['TERMINAL_DETACH_GRACE_SECONDS']),
+        'expiry': None,
+        'warm': shell.warm,
+    }
+    _SID_TO_SESSION[sid] = session_id
 
-    pid = os.fork()
-    if pid == 0:
-        # child
-        os.setsid()
-        os.dup2(slave_fd, 0)
-        os.dup2(slave_fd, 1)
-        os.dup2(slave_fd, 2)
-        try:
-            os.execv('/bin/bash', ['/bin/bash'])
-        except Exception:
-            os._exit(1)
+    first_output = [True]
+
+    def on_data(data):
+        if first_output[0]:
+            first_output[0] = False
+            record_first_output(started)
+        scrollback.write(data)
+        batcher.feed(data)
+
+    # A single shared reactor thread watches every master FD
+    reactor.register(master_fd, on_data, lambda: _on_pty_eof(session_id))
+    reactor.call_soon(lambda: _attach(session_id, sid, encoding))
+
+
+@socketio.on('attach_shell', namespace='/terminal')
+def attach_shell(data):
+    """Reattach this connection to a detached (or elsewhere attached) shell."""
+    sid = request.sid
+    data = data or {}
+    session_id = data.get('session_id')
+    encoding = data.get('encoding', 'text')
+    if sid in _SID_TO_SESSION:
+        emit('pty_error', {'error': 'shell already started for this session'})
+        return
+    if encoding not in _OUTPUT_ENCODINGS:
+        emit('pty_error', {'error': f'encoding must be one of {_OUTPUT_ENCODINGS}'})
+        return
+    info = _PTY_SESSIONS.get(session_id)
+    if not info or info['user'] != flask_session.get('user'):
+        emit('pty_error', {'error': 'no such shell session', 'code': 'unknown_session'})
+        return
+    _SID_TO_SESSION[sid] = session_id
+    get_reactor().call_soon(lambda: _attach(session_id, sid, encoding))
+
+
+@socketio.on('list_shells', namespace='/terminal')
+def list_shells(data=None):
+    user = flask_session.get('user')
+    sessions = []
+    for session_id, info in list(_PTY_SESSIONS.items()):
+        if info['user'] != user:
+            continue
+        scrollback = info['scrollback']
+        sessions.append({
+            'session_id': session_id,
+            'attached': info['sid'] is not None,
+            'warm': info['warm'],
+            'scrollback_bytes': scrollback.nbytes,
+            'scrollback_capacity': scrollback.capacity,
+            'memory_bytes': scrollback.nbytes + info['batcher'].pending_bytes,
+        })
+    emit('shell_list', {'sessions': sessions})
+
+
+def _attach(session_id, sid, encoding):
+    # Runs on the reactor thread, so the replay frame is ordered before live output
+    info = _PTY_SESSIONS.get(session_id)
+    if not info:
+        _SID_TO_SESSION.pop(sid, None)
+        socketio.emit('pty_error', {'error': 'no such shell session', 'code': 'unknown_session'},
+                      to=sid, namespace='/terminal')
+        return
+    if info['expiry'] is not None:
+        info['expiry'].cancel()
+        info['expiry'] = None
+    previous = info['sid']
+    if previous is not None and previous != sid:
+        _SID_TO_SESSION.pop(previous, None)
+        socketio.emit('pty_error', {'error': 'shell attached from another connection', 'code': 'detached'},
+                      to=previous, namespace='/terminal')
+    info['sid'] = sid
+    socketio.emit('pty_started', {'msg': 'shell started', 'session_id': session_id, 'encoding': encoding},
+                  to=sid, namespace='/terminal')
+    batcher = info['batcher']
+    batcher.send = _frame_sender(sid, encoding)
+    batcher.reset(replay=info['scrollback'].tail())
+
+
+def _detach(session_id, sid):
+    # Reactor thread; the shell keeps running and filling its scrollback
+    info = _PTY_SESSIONS.get(session_id)
+    if not info or info['sid'] != sid:
+        return
+    info['sid'] = None
+    info['batcher'].send = _discard_frame
+    info['batcher'].reset()
+    if info['grace'] <= 0:
+        _cleanup_pty(session_id)
     else:
-        # parent
-        os.close(slave_fd)
-        _PTY_SESSIONS[sid] = {'master_fd': master_fd, 'pid': pid}
+        info['expiry'] = get_reactor().call_later(info['grace'], lambda: _expire(session_id))
 
-        t = threading.Thread(target=_pty_reader, args=(sid,), daemon=True)
-        t.start()
-        emit('pty_started', {'msg': 'shell started'})
 
+def _expire(session_id):
+    info = _PTY_SESSIONS.get(session_id)
+    if info and info['sid'] is None:
+        _cleanup_pty(session_id)
 
-def _pty_reader(sid):
-    session_info = _PTY_SESSIONS.get(sid)
-    if not session_info:
+
+def _frame_sender(sid, encoding):
+    # send only to the attached client; the client acks each frame for flow control
+    if encoding == 'binary':
+        # bytes go out as a Socket.IO binary attachment, no decode or JSON escaping
+        def send(frame, ack):
+            socketio.emit('pty_output', {'data': frame}, to=sid, namespace='/terminal', callback=ack)
+        return send
+
+    # keep partial multibyte sequences at frame boundaries for the next frame
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def send(frame, ack):
+        socketio.emit('pty_output', {'data': decoder.decode(frame)}, to=sid,
+                      namespace='/terminal', callback=ack)
+    return send
+
+
+def _discard_frame(frame, ack):
+    # Nobody attached: output only lands in the scrollback
+    ack()
+
+
+def _on_pty_eof(session_id):
+    info = _PTY_SESSIONS.get(session_id)
+    if not info:
         return
-    fd = session_info['master_fd']
+    info['batcher'].close()
+    if info['sid'] is not None:
+        socketio.emit('pty_exit', {'session_id': session_id}, to=info['sid'], namespace='/terminal')
+    _cleanup_pty(session_id)
 
-    try:
-        while True:
-            r, _, _ = select.select([fd], [], [], 0.1)
-            if fd in r:
-                try:
-                    data = os.read(fd, 4096)
-                    if not data:
-                        break
-                    # send only to the requesting client
-                    socketio.emit('pty_output', {'data': data.decode(errors='ignore')}, to=sid, namespace='/terminal')
-                except OSError:
-                    break
-    finally:
-        _cleanup_pty(sid)
+
+def _write_all(fd, data):
+    # Master FDs are non-blocking (see PtyReactor.register); wait for room on large pastes
+    view = memoryview(data)
+    while view:
+        try:
+            written = os.write(fd, view)
+        except BlockingIOError:
+            select.select([], [fd], [], 1.0)
+            continue
+        view = view[written:]
 
 
 @socketio.on('pty_input', namespace='/terminal')
 def receive_input(message):
     sid = request.sid
-    session_info = _PTY_SESSIONS.get(sid)
+    session_info = _PTY_SESSIONS.get(_SID_TO_SESSION.get(sid))
     if not session_info:
         emit('pty_error', {'error': 'no active shell'})
         return
     fd = session_info['master_fd']
-    data = message.get('data', '')
+    # binary clients send raw bytes (optionally wrapped as {'data': bytes}),
+    # which are written as-is; text clients send str
+    if isinstance(message, (bytes, bytearray)):
+        data = message
+    else:
+        data = message.get('data', '')
     if isinstance(data, str):
         data = data.encode()
     try:
-        os.write(fd, data)
+        _write_all(fd, data)
     except OSError:
         emit('pty_error', {'error': 'write failed'})
 
@@ -105,7 +266,7 @@ def receive_input(message):
 @socketio.on('resize', namespace='/terminal')
 def handle_resize(message):
     sid = request.sid
-    session_info = _PTY_SESSIONS.get(sid)
+    session_info = _PTY_SESSIONS.get(_SID_TO_SESSION.get(sid))
     if not session_info:
         return
     master_fd = session_info['master_fd']
@@ -119,27 +280,28 @@ def handle_resize(message):
 @socketio.on('disconnect', namespace='/terminal')
 def on_disconnect():
     sid = request.sid
-    _cleanup_pty(sid)
+    session_id = _SID_TO_SESSION.pop(sid, None)
+    if session_id:
+        get_reactor().call_soon(lambda: _detach(session_id, sid))
 
 
-def _cleanup_pty(sid):
-    info = _PTY_SESSIONS.pop(sid, None)
+def _cleanup_pty(session_id):
+    info = _PTY_SESSIONS.pop(session_id, None)
     if not info:
         return
+    if info['sid'] is not None:
+        _SID_TO_SESSION.pop(info['sid'], None)
+    if info['expiry'] is not None:
+        info['expiry'].cancel()
     fd = info.get('master_fd')
-    pid = info.get('pid')
+    shell = info.get('shell')
+    info['batcher'].close(flush=False)
     try:
         if fd:
+            get_reactor().unregister(fd)
             os.close(fd)
     except Exception:
         pass
-    try:
-        if pid:
-            os.kill(pid, signal.SIGHUP)
-            # try to reap child to avoid zombie
-            try:
-                os.waitpid(pid, os.WNOHANG)
-            except Exception:
-                pass
-    except Exception:
-        pass
+    if shell is not None:
+        # Signals through the shell's pidfd; the spawner (or shell_pool, for in-process forks) reaps it
+        shell.hangup()
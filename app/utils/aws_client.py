@@ -3,18 +3,123 @@ Simple boto3 helpers used by the Flask app.
 
 Note: boto3 credentials should be configured on the host via environment
 variables or ~/.aws/credentials as usual.
+
+Clients are expensive to build (service model loading, credential resolution,
+a new connection pool), so every caller goes through `get_aws_client()`,
+which hands out one shared, thread-safe client per (service, region, profile).
 """
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from typing import Dict, Any, List
+import os
+import re
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 
 import boto3
+from botocore.config import Config
+from botocore.credentials import RefreshableCredentials
 from botocore.exceptions import ClientError
 
+# Error codes meaning the credentials a client was built with are no longer valid
+_EXPIRED_CODES = {
+    'ExpiredToken', 'ExpiredTokenException', 'RequestExpired', 'InvalidClientTokenId',
+    'UnrecognizedClientException', 'AuthFailure',
+}
+
+
+class AwsClientCache:
+    """Share boto3 clients keyed by (service, region, profile).
+
+    One `boto3.Session` is kept per profile and clients are created from it
+    under a lock (sessions are not thread-safe, clients are). Credentials are
+    managed here rather than per call site:
+
+    * refreshable credentials (assumed roles, SSO, instance metadata) refresh
+      themselves inside botocore;
+    * static credentials are re-read from the environment / ~/.aws files at
+      most every `credentials_ttl` seconds, so rotated keys are picked up;
+    * a call failing with an expired/invalid token error marks the profile
+      stale, and the next `get()` rebuilds its session and clients.
+    """
+
+    def __init__(self, max_pool_connections: int = 10, retry_mode: str = 'standard',
+                 max_attempts: int = 3, credentials_ttl: float = 3600.0,
+                 endpoint_url: Optional[str] = None):
+        self.config = Config(
+            max_pool_connections=max_pool_connections,
+            retries={'mode': retry_mode, 'max_attempts': max_attempts},
+        )
+        self.credentials_ttl = credentials_ttl
+        self.endpoint_url = endpoint_url
+        # profile -> (session, loaded at, clients by (service, region))
+        self._sessions: Dict[Optional[str], Tuple[boto3.Session, float, Dict[Tuple[str, Optional[str]], Any]]] = {}
+        self._stale: set = set()
+        self._lock = threading.Lock()
+
+    def get(self, service: str, region: Optional[str] = None, profile: Optional[str] = None):
+        with self._lock:
+            session, clients = self._session_locked(profile)
+            client = clients.get((service, region))
+            if client is None:
+                client = session.client(service, region_name=region, config=self.config,
+                                        endpoint_url=self.endpoint_url)
+                client.meta.events.register('after-call', self._make_error_hook(profile))
+                clients[(service, region)] = client
+            return client
+
+    def reset(self, profile: Optional[str] = None) -> None:
+        """Drop the session and clients of `profile` (all profiles if None)."""
+        with self._lock:
+            if profile is None:
+                self._sessions.clear()
+                self._stale.clear()
+            else:
+                self._sessions.pop(profile, None)
+                self._stale.discard(profile)
+
+    def _session_locked(self, profile: Optional[str]):
+        entry = self._sessions.get(profile)
+        now = time.monotonic()
+        if entry is not None and profile not in self._stale:
+            session, loaded_at, clients = entry
+            credentials = session.get_credentials()
+            if isinstance(credentials, RefreshableCredentials) or now - loaded_at < self.credentials_ttl:
+                return session, clients
+        self._stale.discard(profile)
+        session = boto3.Session(profile_name=profile)
+        self._sessions[profile] = (session, now, {})
+        return session, self._sessions[profile][2]
+
+    def _make_error_hook(self, profile: Optional[str]):
+        def on_after_call(http_response=None, parsed=None, **kwargs):
+            code = ((parsed or {}).get('Error') or {}).get('Code')
+            if code in _EXPIRED_CODES:
+                with self._lock:
+                    self._stale.add(profile)
+        return on_after_call
+
+
+_cache = AwsClientCache(
+    max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '10')),
+    retry_mode=os.environ.get('AWS_RETRY_MODE', 'standard'),
+    max_attempts=int(os.environ.get('AWS_MAX_ATTEMPTS', '3')),
+    credentials_ttl=float(os.environ.get('AWS_CREDENTIALS_TTL', '3600')),
+    endpoint_url=os.environ.get('AWS_ENDPOINT_URL') or None,
+)
+
+
+def get_aws_client(service: str, region: Optional[str] = None, profile: Optional[str] = None):
+    """Return the shared boto3 client for `service` in `region` / `profile`."""
+    return _cache.get(service, region or os.environ.get('AWS_DEFAULT_REGION'), profile)
+
+
+def reset_aws_clients(profile: Optional[str] = None) -> None:
+    _cache.reset(profile)
+
 
 def launch_ec2(ami: str, instance_type: str = 't3.micro', key_name: str | None = None) -> Dict[str, Any]:
-    ec2 = boto3.client('ec2')
+    ec2 = get_aws_client('ec2')
     params = dict(ImageId=ami, InstanceType=instance_type, MinCount=1, MaxCount=1)
     if key_name:
         params['KeyName'] = key_name
@@ -23,16 +128,121 @@ def launch_ec2(ami: str, instance_type: str = 't3.micro', key_name: str | None =
 
 
 def terminate_ec2(instance_id: str) -> Dict[str, Any]:
-    ec2 = boto3.client('ec2')
+    ec2 = get_aws_client('ec2')
     resp = ec2.terminate_instances(InstanceIds=[instance_id])
     return resp['TerminatingInstances'][0]
 
 
-def get_cloudwatch_logs(log_group: str, last_minutes: int = 60) -> List[Dict[str, Any]]:
-    logs = boto3.client('logs')
-    end_time = int(datetime.utcnow().timestamp() * 1000)
-    start_time = int((datetime.utcnow() - timedelta(minutes=last_minutes)).timestamp() * 1000)
+def missing_instance_ids(error: Exception) -> List[str]:
+    """Instance ids an `InvalidInstanceID.NotFound` error names (empty for any other error).
+
+    A batched EC2 call fails as a whole when one of its ids is unknown; the
+    message lists the offending ids, so callers can drop them and retry.
+    """
+    if not isinstance(error, ClientError):
+        return []
+    info = error.response.get('Error', {})
+    if info.get('Code') != 'InvalidInstanceID.NotFound':
+        return []
+    return re.findall(r'\bi-[0-9a-f]+\b', info.get('Message', ''))
+
+
+
+
+LOGS_PAGE_SIZE = int(os.environ.get('AWS_LOGS_PAGE_SIZE', '1000'))
+# Upper bounds for a single read, whatever the caller asks for
+LOGS_MAX_EVENTS = int(os.environ.get('AWS_LOGS_MAX_EVENTS', '1000000'))
+LOGS_MAX_BYTES = int(os.environ.get('AWS_LOGS_MAX_BYTES', str(256 * 1024 * 1024)))
+
+
+def log_window(payload: Dict[str, Any]) -> Tuple[int, int]:
+    """Return (start, end) in epoch ms from `start_time`/`end_time` or `last_minutes`."""
+    now = int(time.time() * 1000)
+    end_time = int(payload.get('end_time') or now)
+    if payload.get('start_time') is not None:
+        start_time = int(payload['start_time'])
+    else:
+        start_time = end_time - int(payload.get('last_minutes', 60)) * 60_000
+    return start_time, end_time
+
+
+class CloudWatchLogReader:
+    """Walk every `filter_log_events` page of a time window, within a budget.
+
+    Iterating yields one list of {"timestamp", "message", "stream"} records
+    per page, so at most one page is held in memory. Reading stops early once
+    `max_events` or `max_bytes` (UTF-8 message bytes) would be exceeded; then
+    `truncated` is set and `last_timestamp` tells where to resume.
+    """
+
+    def __init__(self, log_group: str, start_time: int, end_time: int, filter_pattern: Optional[str] = None,
+                 log_streams: Optional[List[str]] = None, log_stream_prefix: Optional[str] = None,
+                 max_events: Optional[int] = None, max_bytes: Optional[int] = None,
+                 region: Optional[str] = None, page_size: int = LOGS_PAGE_SIZE):
+        self.params: Dict[str, Any] = {'logGroupName': log_group, 'startTime': start_time, 'endTime': end_time}
+        if filter_pattern:
+            self.params['filterPattern'] = filter_pattern
+        if log_streams:
+            self.params['logStreamNames'] = list(log_streams)
+        elif log_stream_prefix:
+            self.params['logStreamNamePrefix'] = log_stream_prefix
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.region = region
+        self.page_size = page_size
+        self.events = 0
+        self.bytes = 0
+        self.pages = 0
+        self.truncated = False
+        self.last_timestamp: Optional[int] = None
+
+    def __iter__(self) -> Iterator[List[Dict[str, Any]]]:
+        paginator = get_aws_client('logs', self.region).get_paginator('filter_log_events')
+        pages = paginator.paginate(**self.params, PaginationConfig={'PageSize': self.page_size})
+        for page in pages:
+            self.pages += 1
+            batch = []
+            for event in page.get('events', []):
+                size = len(event['message'].encode())
+                if ((self.max_events is not None and self.events >= self.max_events)
+                        or (self.max_bytes is not None and self.bytes + size > self.max_bytes)):
+                    self.truncated = True
+                    break
+                self.events += 1
+                self.bytes += size
+                self.last_timestamp = event['timestamp']
+                batch.append({'timestamp': event['timestamp'], 'message': event['message'],
+                              'stream': event.get('logStreamName')})
+            if batch:
+                yield batch
+            if self.truncated:
+                return
+
+    def summary(self) -> Dict[str, Any]:
+        return {'events': self.events, 'bytes': self.bytes, 'pages': self.pages,
+                'truncated': self.truncated, 'last_timestamp': self.last_timestamp}
+
+
+def log_reader_from_payload(payload: Dict[str, Any], default_max_events: int = 100) -> CloudWatchLogReader:
+    """Build a reader from a request body (see /api/aws/cloudwatch_logs/stream), clamping the budget."""
+    start_time, end_time = log_window(payload)
+    log_streams = payload.get('log_streams')
+    if log_streams is not None and (not isinstance(log_streams, list) or len(log_streams) > 100):
+        raise ValueError('log_streams must be a list of at most 100 names')
+    max_events = min(int(payload.get('max_events') or payload.get('limit') or default_max_events), LOGS_MAX_EVENTS)
+    max_bytes = min(int(payload.get('max_bytes') or LOGS_MAX_BYTES), LOGS_MAX_BYTES)
+    return CloudWatchLogReader(
+        payload['log_group'], start_time, end_time,
+        filter_pattern=payload.get('filter_pattern'),
+        log_streams=log_streams,
+        log_stream_prefix=payload.get('log_stream_prefix'),
+        max_events=max_events,
+        max_bytes=max_bytes,
+        region=payload.get('region'),
+    )
+
 
-    resp = logs.filter_log_events(logGroupName=log_group, startTime=start_time, endTime=end_time, limit=500)
-    events = [{'message': e['message'], 'timestamp': e['timestamp']} for e in resp.get('events', [])]
-    return events
\ No newline at end of file
+def get_cloudwatch_logs(log_group: str, last_minutes: int = 60, max_events: int = 500) -> List[Dict[str, Any]]:
+    start_time, end_time = log_window({'last_minutes': last_minutes})
+    reader = CloudWatchLogReader(log_group, start_time, end_time, max_events=max_events)
+    return [{'message': e['message'], 'timestamp': e['timestamp']} for batch in reader for e in batch]
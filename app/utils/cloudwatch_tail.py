@@ -0,0 +1,255 @@
+"""
+Live tailing of CloudWatch log groups, shared between viewers.
+
+One `LogGroupTailer` thread polls `filter_log_events` for each distinct
+(region, log group, filter pattern), however many Socket.IO subscribers or
+HTTP pollers follow it. Each poll starts a little before the newest event
+seen so far (CloudWatch ingests out of order) and drops event ids it has
+already delivered. While a group is quiet, or requests are throttled, the
+poll interval doubles up to a ceiling; new events reset it.
+
+New events get increasing sequence numbers and are kept in a short ring, so
+late joiners get recent history and HTTP clients can poll with a cursor
+without causing an AWS call of their own. Cursors are "<epoch>:<seq>", where
+the epoch is random per tailer: sequence numbers start over when a tailer is
+restarted, and a cursor from an earlier tailer is reported as a gap.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from app.utils.aws_client import get_aws_client
+
+TailListener = Callable[[str, List[Dict[str, Any]]], None]
+
+_THROTTLE_CODES = {'ThrottlingException', 'Throttling', 'TooManyRequestsException', 'RequestLimitExceeded'}
+
+
+def tail_id(log_group: str, region: Optional[str] = None, filter_pattern: Optional[str] = None) -> str:
+    key = f'{region or ""}|{log_group}|{filter_pattern or ""}'
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+class LogGroupTailer:
+    """Poll one log group on a daemon thread and hand new events to `publish`."""
+
+    def __init__(self, log_group: str, region: Optional[str], filter_pattern: Optional[str],
+                 publish: TailListener, min_interval: float = 1.0, max_interval: float = 30.0,
+                 lookback_ms: int = 10_000, backfill_ms: int = 60_000, history_size: int = 500,
+                 max_events_per_poll: int = 10_000, lease_seconds: float = 60.0,
+                 on_exit: Optional[Callable[['LogGroupTailer'], None]] = None):
+        self.id = tail_id(log_group, region, filter_pattern)
+        self.epoch = uuid.uuid4().hex[:8]
+        self.log_group = log_group
+        self.region = region
+        self.filter_pattern = filter_pattern
+        self.publish = publish
+        self.on_exit = on_exit
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.lookback_ms = lookback_ms
+        self.max_events_per_poll = max_events_per_poll
+        self.lease_seconds = lease_seconds
+        self.interval = min_interval
+        self.subscribers = 0
+        self.polls = 0
+        self.last_error: Optional[str] = None
+        self._lease_until = 0.0
+        self._seq = 0
+        self._recent: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=history_size)
+        # eventId -> timestamp, for events inside the lookback window
+        self._seen: "OrderedDict[str, int]" = OrderedDict()
+        self._newest = int(time.time() * 1000) - backfill_ms
+        self._closing = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'cw-tail-{self.id}', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive() and not self._closing
+
+    def retain(self, lease: bool = False) -> bool:
+        """Add a subscriber (or extend the HTTP lease); False if already shutting down."""
+        with self._lock:
+            if self._closing:
+                return False
+            if lease:
+                self._lease_until = time.monotonic() + self.lease_seconds
+            else:
+                self.subscribers += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.subscribers = max(0, self.subscribers - 1)
+        self._wake.set()
+
+    def since(self, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], str, bool]:
+        """Return (events after `cursor`, new cursor, gap); gap means events were missed.
+
+        A cursor from another tailer (this one was restarted since) is a gap
+        too, and the whole recent history is returned as after no cursor.
+        Raises ValueError for a malformed cursor.
+        """
+        if cursor is not None:
+            epoch, _, seq_text = str(cursor).rpartition(':')
+            position = int(seq_text)
+        with self._lock:
+            recent = list(self._recent)
+            new_cursor = f'{self.epoch}:{self._seq}'
+        if cursor is None:
+            return [e for _, e in recent], new_cursor, False
+        if epoch != self.epoch:
+            return [e for _, e in recent], new_cursor, True
+        gap = bool(recent) and recent[0][0] > position + 1
+        return [e for s, e in recent if s > position], new_cursor, gap
+
+    # -- worker -----------------------------------------------------------
+
+    def _idle_locked(self) -> bool:
+        return self.subscribers == 0 and time.monotonic() >= self._lease_until
+
+    def _run(self) -> None:
+        try:
+            self._loop()
+        finally:
+            if self.on_exit is not None:
+                self.on_exit(self)
+
+    def _loop(self) -> None:
+        while True:
+            with self._lock:
+                if self._idle_locked():
+                    self._closing = True
+                    return
+            try:
+                found = self._poll()
+                self.last_error = None
+                self.interval = self.min_interval if found else min(self.interval * 2, self.max_interval)
+            except ClientError as e:
+                self.last_error = str(e)
+                code = e.response.get('Error', {}).get('Code')
+                self.interval = min(self.interval * (4 if code in _THROTTLE_CODES else 2), self.max_interval)
+            except Exception as e:
+                self.last_error = str(e)
+                self.interval = min(self.interval * 2, self.max_interval)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _poll(self) -> int:
+        self.polls += 1
+        client = get_aws_client('logs', self.region)
+        params: Dict[str, Any] = {'logGroupName': self.log_group, 'startTime': self._newest - self.lookback_ms}
+        if self.filter_pattern:
+            params['filterPattern'] = self.filter_pattern
+        fresh: List[Dict[str, Any]] = []
+        scanned = 0
+        while scanned < self.max_events_per_poll:
+            resp = client.filter_log_events(**params)
+            for event in resp.get('events', []):
+                scanned += 1
+                if event['eventId'] in self._seen:
+                    continue
+                self._seen[event['eventId']] = event['timestamp']
+                fresh.append({'timestamp': event['timestamp'], 'message': event['message'],
+                              'stream': event.get('logStreamName')})
+            if not resp.get('nextToken'):
+                break
+            params['nextToken'] = resp['nextToken']
+        if not fresh:
+            return 0
+        fresh.sort(key=lambda e: e['timestamp'])
+        self._newest = max(self._newest, fresh[-1]['timestamp'])
+        horizon = self._newest - self.lookback_ms
+        for event_id, ts in list(self._seen.items()):
+            if ts < horizon:
+                del self._seen[event_id]
+        with self._lock:
+            for event in fresh:
+                self._seq += 1
+                self._recent.append((self._seq, event))
+        self.publish(self.id, fresh)
+        return len(fresh)
+
+
+class TailHub:
+    """Reference-counted tailers keyed by `tail_id`, fanning out to listeners."""
+
+    def __init__(self, **tailer_options):
+        self.tailer_options = tailer_options
+        self._tailers: Dict[str, LogGroupTailer] = {}
+        self._listeners: List[TailListener] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback: TailListener) -> None:
+        self._listeners.append(callback)
+
+    def subscribe(self, log_group: str, region: Optional[str] = None,
+                  filter_pattern: Optional[str] = None) -> LogGroupTailer:
+        return self._retain(log_group, region, filter_pattern, lease=False)
+
+    def touch(self, log_group: str, region: Optional[str] = None,
+              filter_pattern: Optional[str] = None) -> LogGroupTailer:
+        """Keep a tailer alive for HTTP pollers, who never unsubscribe."""
+        return self._retain(log_group, region, filter_pattern, lease=True)
+
+    def unsubscribe(self, tid: str) -> None:
+        with self._lock:
+            tailer = self._tailers.get(tid)
+        if tailer is not None:
+            tailer.release()
+
+    def tailers(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            live = [t for t in self._tailers.values() if t.is_alive()]
+        return {t.id: {'log_group': t.log_group, 'region': t.region, 'subscribers': t.subscribers,
+                       'interval': t.interval, 'polls': t.polls, 'error': t.last_error} for t in live}
+
+    def _retain(self, log_group, region, filter_pattern, lease) -> LogGroupTailer:
+        tid = tail_id(log_group, region, filter_pattern)
+        with self._lock:
+            tailer = self._tailers.get(tid)
+            if tailer is not None and tailer.retain(lease):
+                return tailer
+            # Missing, or its thread already decided to exit: start a new one
+            tailer = LogGroupTailer(log_group, region, filter_pattern, self._publish, on_exit=self._forget,
+                                    **self.tailer_options)
+            tailer.retain(lease)
+            self._tailers[tid] = tailer
+            tailer.start()
+            return tailer
+
+    def _forget(self, tailer: LogGroupTailer) -> None:
+        # Called from the tailer's thread as it exits; a replacement may already be registered
+        with self._lock:
+            if self._tailers.get(tailer.id) is tailer:
+                del self._tailers[tailer.id]
+
+    def _publish(self, tid: str, events: List[Dict[str, Any]]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(tid, events)
+            except Exception:
+                pass
+
+
+_hub = TailHub(
+    min_interval=float(os.environ.get('AWS_TAIL_MIN_INTERVAL', '1')),
+    max_interval=float(os.environ.get('AWS_TAIL_MAX_INTERVAL', '30')),
+    lookback_ms=int(os.environ.get('AWS_TAIL_LOOKBACK_MS', '10000')),
+)
+
+
+def get_tail_hub() -> TailHub:
+    return _hub
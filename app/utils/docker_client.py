@@ -1,9 +1,18 @@
 """
 Wrapper utilities for interacting with Docker using docker-py.
+
+All callers share one process-wide `DockerClient` (see `DockerClientManager`)
+instead of building a new client, connection pool and API version
+negotiation per request.
 """
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Union
 
 try:
     import docker
@@ -12,14 +21,118 @@ except Exception:  # docker SDK optional at import-time
     docker = None
 
 
+class DockerClientManager:
+    """Lazily create, share and health-check a single `DockerClient`.
+
+    docker-py clients are backed by a thread-safe requests session, so one
+    instance with a bounded pool (`max_pool_size`) serves every Flask and
+    Socket.IO thread. At most every `health_interval` seconds one caller
+    pings the daemon, with a separate probe client limited to `ping_timeout`
+    seconds; meanwhile other callers keep getting the current client. If the
+    ping fails (e.g. the daemon restarted) the client is dropped and rebuilt.
+    Pings and reconnects happen outside the manager lock, so a slow or hung
+    daemon never holds up callers that only need the existing client.
+    """
+
+    def __init__(self, max_pool_size: int = 10, timeout: int = 60, health_interval: float = 30.0,
+                 ping_timeout: float = 3.0):
+        self.max_pool_size = max_pool_size
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self._client = None
+        self._probe = None
+        # Negotiated once; reconnects reuse it instead of asking the daemon again
+        self._api_version: Optional[str] = None
+        self._checked_at = 0.0
+        self._checking = False
+        self._lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+
+    def get(self):
+        if docker is None:
+            raise RuntimeError("docker SDK not installed. Install with: pip install docker")
+        with self._lock:
+            client = self._client
+            check = (client is not None and not self._checking
+                     and time.monotonic() - self._checked_at >= self.health_interval)
+            if check:
+                self._checking = True
+        if check:
+            healthy = self._ping(client)
+            with self._lock:
+                self._checking = False
+                if healthy:
+                    self._checked_at = time.monotonic()
+                elif self._client is client:
+                    self._close_locked()
+            if not healthy:
+                client = None
+        return client if client is not None else self._connect()
+
+    def reset(self) -> None:
+        """Drop the current client; the next `get()` reconnects."""
+        with self._lock:
+            self._close_locked()
+
+    def _ping(self, client) -> bool:
+        # Only the thread that set _checking gets here, so the probe is not shared
+        try:
+            if self._probe is None:
+                self._probe = docker.from_env(timeout=self.ping_timeout, max_pool_size=1,
+                                              version=client.api.api_version)
+            return bool(self._probe.ping())
+        except Exception:
+            probe, self._probe = self._probe, None
+            if probe is not None:
+                try:
+                    probe.close()
+                except Exception:
+                    pass
+            return False
+
+    def _connect(self):
+        # One thread negotiates with the daemon; the others wait for its client
+        with self._connect_lock:
+            with self._lock:
+                if self._client is not None:
+                    return self._client
+            client = docker.from_env(max_pool_size=self.max_pool_size, timeout=self.timeout,
+                                     version=self._api_version)
+            self._api_version = client.api.api_version
+            with self._lock:
+                self._client = client
+                self._checked_at = time.monotonic()
+            return client
+
+    def _close_locked(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+
+_manager = DockerClientManager(
+    max_pool_size=int(os.environ.get('DOCKER_MAX_POOL_SIZE', '10')),
+    timeout=int(os.environ.get('DOCKER_TIMEOUT', '60')),
+    health_interval=float(os.environ.get('DOCKER_HEALTH_INTERVAL', '30')),
+    ping_timeout=float(os.environ.get('DOCKER_PING_TIMEOUT', '3')),
+)
+
+
 def client_available() -> bool:
     return docker is not None
 
 
 def get_client():
-    if docker is None:
-        raise RuntimeError("docker SDK not installed. Install with: pip install docker")
-    return docker.from_env()
+    """Return the shared Docker client."""
+    return _manager.get()
+
+
+def reset_client() -> None:
+    _manager.reset()
 
 
 def list_images() -> List[Dict[str, Any]]:
@@ -75,4 +188,115 @@ def inspect_container(name: str) -> Dict[str, Any]:
 def get_logs(name: str, tail: int = 200) -> str:
     c = get_client()
     cont = c.containers.get(name)
-    return cont.logs(tail=tail).decode(errors='ignore')
\ No newline at end of file
+    return cont.logs(tail=tail).decode(errors='ignore')
+
+
+MAX_LOG_LINE_BYTES = 65536
+
+
+def parse_log_time(value: Optional[str]) -> Optional[Union[int, datetime]]:
+    """Accept unix seconds or an ISO 8601 timestamp for logs `since`/`until`."""
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+
+def open_log_stream(name: str, follow: bool = False, tail: Union[int, str] = 'all',
+                    since=None, until=None, timestamps: bool = False):
+    """Open a streaming logs request; call `.close()` on it to free the connection."""
+    c = get_client()
+    cont = c.containers.get(name)
+    return cont.logs(stream=True, follow=follow, tail=tail, since=since, until=until, timestamps=timestamps)
+
+
+def iter_log_batches(stream, timestamps: bool = False) -> Iterator[List[Dict[str, str]]]:
+    """Split a raw log stream into lines, yielding one list of records per chunk.
+
+    Only one partial line is held between chunks, capped at MAX_LOG_LINE_BYTES.
+    """
+    pending = b''
+    for chunk in stream:
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        if len(pending) > MAX_LOG_LINE_BYTES:
+            lines.append(pending)
+            pending = b''
+        if lines:
+            yield [_log_record(line, timestamps) for line in lines]
+    if pending:
+        yield [_log_record(pending, timestamps)]
+
+
+def _log_record(line: bytes, timestamps: bool) -> Dict[str, str]:
+    text = line.decode(errors='replace').rstrip('\r')
+    if timestamps:
+        ts, _, text = text.partition(' ')
+        return {'ts': ts, 'line': text}
+    return {'line': text}
+
+
+
+BULK_ACTIONS = ('start', 'stop', 'rm', 'rmi')
+BULK_MAX_TARGETS = 1000
+
+# Kept below DOCKER_MAX_POOL_SIZE so workers don't churn pooled connections
+_bulk_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('DOCKER_BULK_WORKERS', '8')),
+    thread_name_prefix='docker-bulk',
+)
+
+
+def _bulk_one(action: str, target: str, stop_timeout: Optional[int]) -> Dict[str, Any]:
+    # Low-level calls take a name or id directly: one daemon round trip per item
+    api = get_client().api
+    if action == 'start':
+        api.start(target)
+        return {'target': target, 'status': 'started'}
+    if action == 'stop':
+        api.stop(target, timeout=stop_timeout)
+        return {'target': target, 'status': 'stopped'}
+    if action == 'rm':
+        api.remove_container(target, force=True)
+        return {'target': target, 'status': 'removed'}
+    api.remove_image(target, force=True)
+    return {'target': target, 'status': 'image_removed'}
+
+
+def bulk_action(action: str, targets: List[str], item_timeout: float = 60.0,
+                stop_timeout: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Run `action` on every target in parallel, yielding results as they finish.
+
+    Items still running after `item_timeout` seconds are reported with status
+    'timeout' (the daemon call itself cannot be interrupted). Closing the
+    generator cancels items that have not started yet.
+    """
+    if action not in BULK_ACTIONS:
+        raise ValueError(f'action must be one of {BULK_ACTIONS}')
+    started: Dict[int, float] = {}
+
+    def run(index: int, target: str) -> Dict[str, Any]:
+        started[index] = time.monotonic()
+        try:
+            return _bulk_one(action, target, stop_timeout)
+        except Exception as e:
+            return {'target': target, 'status': 'error', 'error': str(e)}
+
+    futures = {_bulk_executor.submit(run, i, t): (i, t) for i, t in enumerate(targets)}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+            now = time.monotonic()
+            for fut in list(pending):
+                index, target = futures[fut]
+                if index in started and now - started[index] > item_timeout:
+                    pending.discard(fut)
+                    yield {'target': target, 'status': 'timeout'}
+    finally:
+        for fut in pending:
+            fut.cancel()
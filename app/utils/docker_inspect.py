@@ -0,0 +1,127 @@
+"""
+Cached, field-projected container inspect.
+
+`inspect` documents are kept in a small LRU cache with a short TTL, keyed by
+the name or id they were requested with and invalidated as soon as the
+Docker event stream (see `docker_inventory`) reports anything about that
+container. `project` trims a document down to the dotted paths a caller asked
+for, e.g. ``State.Status`` or ``NetworkSettings.IPAddress``.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.utils.docker_client import get_client
+from app.utils.docker_inventory import get_inventory
+
+
+def project(attrs: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """Return {path: value} for each dotted path; missing paths map to None."""
+    result = {}
+    for path in fields:
+        value: Any = attrs
+        for part in path.split('.'):
+            if isinstance(value, dict):
+                value = value.get(part)
+            elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+                value = value[int(part)]
+            else:
+                value = None
+            if value is None:
+                break
+        result[path] = value
+    return result
+
+
+class InspectCache:
+    def __init__(self, ttl: float = 2.0, max_entries: int = 512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._refs_by_id: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, ref: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(ref)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                if entry is not None:
+                    self._drop_locked(ref)
+                return None
+            self._entries.move_to_end(ref)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, ref: str, attrs: Dict[str, Any]) -> None:
+        with self._lock:
+            self._drop_locked(ref)
+            self._entries[ref] = (time.monotonic() + self.ttl, attrs)
+            self._refs_by_id.setdefault(attrs.get('Id', ''), set()).add(ref)
+            while len(self._entries) > self.max_entries:
+                self._drop_locked(next(iter(self._entries)))
+
+    def invalidate(self, container_id: str) -> None:
+        with self._lock:
+            for ref in self._refs_by_id.pop(container_id, set()):
+                self._entries.pop(ref, None)
+
+    def _drop_locked(self, ref: str) -> None:
+        entry = self._entries.pop(ref, None)
+        if entry is None:
+            return
+        refs = self._refs_by_id.get(entry[1].get('Id', ''))
+        if refs is not None:
+            refs.discard(ref)
+            if not refs:
+                del self._refs_by_id[entry[1].get('Id', '')]
+
+
+_cache = InspectCache(
+    ttl=float(os.environ.get('DOCKER_INSPECT_TTL', '2')),
+    max_entries=int(os.environ.get('DOCKER_INSPECT_CACHE_SIZE', '512')),
+)
+_subscribed = False
+_subscribe_lock = threading.Lock()
+
+
+def _on_event(kind: str, action: str, obj_id: str) -> None:
+    if kind == 'container' and obj_id:
+        _cache.invalidate(obj_id)
+
+
+def inspect_container(ref: str) -> Dict[str, Any]:
+    """Return the inspect document for a container name or id, cached."""
+    global _subscribed
+    if not _subscribed:
+        with _subscribe_lock:
+            if not _subscribed:
+                get_inventory().add_listener(_on_event)
+                _subscribed = True
+    attrs = _cache.get(ref)
+    if attrs is None:
+        attrs = get_client().api.inspect_container(ref)
+        _cache.put(ref, attrs)
+    return attrs
+
+
+def inspect_many(refs: List[str], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Inspect several containers; failures are reported per container."""
+    result: Dict[str, Any] = {}
+    for ref in refs:
+        try:
+            attrs = inspect_container(ref)
+            result[ref] = project(attrs, fields) if fields else attrs
+        except Exception as e:
+            result[ref] = {'error': str(e)}
+    return result
+
+
+def cache_stats() -> Dict[str, int]:
+    return {'hits': _cache.hits, 'misses': _cache.misses, 'entries': len(_cache._entries)}
@@ -0,0 +1,176 @@
+"""
+In-memory container and image inventory kept current from Docker events.
+
+The inventory is primed with one sparse listing per kind (no per-container
+inspect) and then updated by a background worker subscribed to the daemon's
+`/events` stream, so dashboard refreshes no longer hit the daemon. Each
+change bumps a version number that doubles as the ETag of the listings.
+
+Until the worker has primed the cache (or while it is reconnecting after the
+daemon went away) listings are fetched directly from the daemon.
+"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.utils.docker_client import get_client
+
+# States `docker ps` (all=False) lists, i.e. containers that have not exited
+_LISTED_STATES = {'running', 'paused', 'restarting'}
+# Container actions that can change what the listing shows
+_CONTAINER_ACTIONS = {
+    'create', 'start', 'restart', 'stop', 'die', 'kill', 'pause', 'unpause',
+    'rename', 'update', 'destroy', 'oom',
+}
+_IMAGE_ACTIONS = {'pull', 'tag', 'untag', 'delete', 'import', 'load', 'build'}
+
+
+def _container_summary(raw: Dict[str, Any]) -> Dict[str, Any]:
+    names = raw.get('Names') or ['']
+    return {
+        'id': raw['Id'][:12],
+        'name': names[0].lstrip('/'),
+        'status': raw.get('State', ''),
+    }
+
+
+def _image_summary(raw: Dict[str, Any]) -> Dict[str, Any]:
+    image_id = raw['Id']
+    # Same as docker-py's Image.short_id
+    short_id = image_id[:19] if image_id.startswith('sha256:') else image_id[:12]
+    tags = [t for t in (raw.get('RepoTags') or []) if t != '<none>:<none>']
+    return {'id': short_id, 'tags': tags}
+
+
+class DockerInventory:
+    def __init__(self, retry_delay: float = 2.0, max_retry_delay: float = 60.0):
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._lock = threading.Lock()
+        self._containers: Dict[str, Dict[str, Any]] = {}
+        self._images: List[Dict[str, Any]] = []
+        self._version = 0
+        self._epoch = uuid.uuid4().hex[:8]
+        self._ready = False
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[str, str, str], None]] = []
+
+    # -- public API -------------------------------------------------------
+
+    def add_listener(self, callback: Callable[[str, str, str], None]) -> None:
+        """Call `callback(type, action, id)` for every container/image event.
+
+        Also starts the event worker if it is not running yet.
+        """
+        self._listeners.append(callback)
+        self._ensure_running()
+
+    def containers(self, all_containers: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return (container summaries, etag); etag is None when not served from cache."""
+        self._ensure_running()
+        with self._lock:
+            if self._ready:
+                raw = list(self._containers.values())
+                etag = self._etag('containers-all' if all_containers else 'containers')
+            else:
+                raw, etag = None, None
+        if raw is None:
+            raw = get_client().api.containers(all=True)
+        if not all_containers:
+            raw = [c for c in raw if c.get('State') in _LISTED_STATES]
+        return [_container_summary(c) for c in raw], etag
+
+    def images(self) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return (image summaries, etag)."""
+        self._ensure_running()
+        with self._lock:
+            if self._ready:
+                return [_image_summary(i) for i in self._images], self._etag('images')
+        return [_image_summary(i) for i in get_client().api.images()], None
+
+    # -- worker -----------------------------------------------------------
+
+    def _etag(self, kind: str) -> str:
+        return f'{kind}-{self._epoch}-{self._version}'
+
+    def _ensure_running(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='docker-inventory', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        delay = self.retry_delay
+        while True:
+            try:
+                self._follow_events()
+            except Exception:
+                pass
+            with self._lock:
+                was_ready, self._ready = self._ready, False
+            if was_ready:
+                delay = self.retry_delay
+            # The shared client is left alone (other threads may be using it);
+            # get_client() health-checks it and replaces it if the daemon is gone
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def _follow_events(self) -> None:
+        client = get_client()
+        # Subscribe from before the listing so nothing that happens while
+        # priming is missed; replayed events are harmless re-fetches.
+        since = int(time.time())
+        containers = {c['Id']: c for c in client.api.containers(all=True)}
+        images = client.api.images()
+        with self._lock:
+            self._containers = containers
+            self._images = images
+            self._version += 1
+            self._ready = True
+        events = client.events(since=since, decode=True, filters={'type': ['container', 'image']})
+        try:
+            for event in events:
+                self._apply_event(client, event)
+        finally:
+            events.close()
+
+    def _apply_event(self, client, event: Dict[str, Any]) -> None:
+        kind = event.get('Type')
+        action = (event.get('Action') or event.get('status') or '').split(':', 1)[0]
+        cid = event.get('id') or event.get('Actor', {}).get('ID')
+        for listener in self._listeners:
+            try:
+                listener(kind, action, cid)
+            except Exception:
+                pass
+        if kind == 'container' and action in _CONTAINER_ACTIONS:
+            if not cid:
+                return
+            found = [] if action == 'destroy' else client.api.containers(all=True, filters={'id': cid})
+            with self._lock:
+                if found:
+                    self._containers[found[0]['Id']] = found[0]
+                else:
+                    self._containers.pop(cid, None)
+                self._version += 1
+        elif kind == 'image' and action in _IMAGE_ACTIONS:
+            images = client.api.images()
+            with self._lock:
+                self._images = images
+                self._version += 1
+
+
+_inventory: Optional[DockerInventory] = None
+_inventory_lock = threading.Lock()
+
+
+def get_inventory() -> DockerInventory:
+    """Return the process-wide inventory, starting its worker on first use."""
+    global _inventory
+    with _inventory_lock:
+        if _inventory is None:
+            _inventory = DockerInventory()
+        return _inventory
@@ -0,0 +1,208 @@
+"""
+Shared live resource stats for watched containers.
+
+One `stats(stream=True)` connection is opened per watched container, no
+matter how many clients watch it. Each raw daemon sample is reduced to a
+compact record (CPU %, memory, network and block IO rates) that is appended
+to a fixed-size, array-backed history and handed to a publish callback. The
+stream is closed when the last subscriber leaves: the reader thread notices
+at the next sample (the daemon sends one per second) and closes the
+generator returned by the public `APIClient.stats()`, which frees the
+connection.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils.docker_client import get_client
+
+FIELDS = ('t', 'cpu', 'mem', 'mem_limit', 'net_rx', 'net_tx', 'blk_r', 'blk_w')
+
+PublishCallback = Callable[[str, Dict[str, float]], None]
+
+
+class StatsHistory:
+    """Fixed-capacity ring of samples, one `array('d')` per field."""
+
+    def __init__(self, capacity: int = 300):
+        self.capacity = capacity
+        self._columns = {f: array('d', bytes(8 * capacity)) for f in FIELDS}
+        self._count = 0
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, sample: Dict[str, float]) -> None:
+        for field, column in self._columns.items():
+            column[self._pos] = sample[field]
+        self._pos = (self._pos + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        """Return {field: [values oldest first]}."""
+        start = (self._pos - self._count) % self.capacity
+        result = {}
+        for field, column in self._columns.items():
+            if start + self._count <= self.capacity:
+                values = column[start:start + self._count]
+            else:
+                values = column[start:] + column[:self._pos]
+            result[field] = values.tolist()
+        return result
+
+
+def _cpu_percent(raw: Dict[str, Any]) -> float:
+    cpu, pre = raw.get('cpu_stats') or {}, raw.get('precpu_stats') or {}
+    cpu_delta = cpu.get('cpu_usage', {}).get('total_usage', 0) - pre.get('cpu_usage', {}).get('total_usage', 0)
+    system_delta = cpu.get('system_cpu_usage', 0) - pre.get('system_cpu_usage', 0)
+    if cpu_delta <= 0 or system_delta <= 0:
+        return 0.0
+    online = cpu.get('online_cpus') or len(cpu.get('cpu_usage', {}).get('percpu_usage') or []) or 1
+    return cpu_delta / system_delta * online * 100.0
+
+
+def _memory(raw: Dict[str, Any]):
+    mem = raw.get('memory_stats') or {}
+    stats = mem.get('stats') or {}
+    # Same as `docker stats`: exclude page cache (cgroup v1) / inactive file (v2)
+    cache = stats.get('total_inactive_file', stats.get('inactive_file', stats.get('cache', 0)))
+    return max(0, mem.get('usage', 0) - cache), mem.get('limit', 0)
+
+
+def _io_totals(raw: Dict[str, Any]):
+    rx = tx = 0
+    for net in (raw.get('networks') or {}).values():
+        rx += net.get('rx_bytes', 0)
+        tx += net.get('tx_bytes', 0)
+    blk_r = blk_w = 0
+    for entry in (raw.get('blkio_stats') or {}).get('io_service_bytes_recursive') or []:
+        op = entry.get('op', '').lower()
+        if op == 'read':
+            blk_r += entry.get('value', 0)
+        elif op == 'write':
+            blk_w += entry.get('value', 0)
+    return rx, tx, blk_r, blk_w
+
+
+class ContainerStatsWatcher:
+    """Read one container's stats stream on a daemon thread."""
+
+    def __init__(self, container_id: str, publish: PublishCallback, history_size: int = 300):
+        self.container_id = container_id
+        self.publish = publish
+        self.history = StatsHistory(history_size)
+        self.subscribers = 0
+        self._lock = threading.Lock()
+        self._stream = None
+        self._stopped = threading.Event()
+        self._prev: Optional[tuple] = None
+        self._thread = threading.Thread(target=self._run, name=f'docker-stats-{container_id[:12]}', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def is_alive(self) -> bool:
+        """False once the stream ended, e.g. because the container stopped."""
+        return self._thread.is_alive()
+
+    def stop(self) -> None:
+        # A generator can only be closed by the thread running it; _run does
+        # that as soon as the next sample arrives
+        self._stopped.set()
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        with self._lock:
+            return self.history.snapshot()
+
+    def _open(self):
+        return get_client().api.stats(self.container_id, decode=True, stream=True)
+
+    def _run(self) -> None:
+        try:
+            self._stream = self._open()
+            for raw in self._stream:
+                if self._stopped.is_set():
+                    break
+                sample = self._reduce(raw)
+                if sample is None:
+                    continue
+                with self._lock:
+                    self.history.append(sample)
+                self.publish(self.container_id, sample)
+        except Exception:
+            pass
+        finally:
+            if self._stream is not None:
+                self._stream.close()
+
+    def _reduce(self, raw: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        now = time.time()
+        totals = _io_totals(raw)
+        prev, self._prev = self._prev, (now, totals)
+        if prev is None:
+            return None  # rates need two samples
+        elapsed = max(now - prev[0], 1e-6)
+        rates = [max(0.0, (cur - old) / elapsed) for cur, old in zip(totals, prev[1])]
+        mem, limit = _memory(raw)
+        return {
+            't': round(now, 3),
+            'cpu': round(_cpu_percent(raw), 2),
+            'mem': float(mem),
+            'mem_limit': float(limit),
+            'net_rx': round(rates[0], 1),
+            'net_tx': round(rates[1], 1),
+            'blk_r': round(rates[2], 1),
+            'blk_w': round(rates[3], 1),
+        }
+
+
+class StatsHub:
+    """Reference-counted watchers keyed by full container id."""
+
+    def __init__(self, publish: PublishCallback, history_size: int = 300):
+        self.publish = publish
+        self.history_size = history_size
+        self._watchers: Dict[str, ContainerStatsWatcher] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, container_id: str) -> ContainerStatsWatcher:
+        with self._lock:
+            watcher = self._current_locked(container_id)
+            watcher.subscribers += 1
+            return watcher
+
+    def current(self, container_id: str) -> ContainerStatsWatcher:
+        """Return the live watcher for an already subscribed container."""
+        with self._lock:
+            return self._current_locked(container_id)
+
+    def _current_locked(self, container_id: str) -> ContainerStatsWatcher:
+        # A watcher whose stream ended (container restarted) is replaced
+        previous = self._watchers.get(container_id)
+        if previous is not None and previous.is_alive():
+            return previous
+        watcher = ContainerStatsWatcher(container_id, self.publish, self.history_size)
+        if previous is not None:
+            watcher.subscribers = previous.subscribers
+        self._watchers[container_id] = watcher
+        watcher.start()
+        return watcher
+
+    def unsubscribe(self, container_id: str) -> None:
+        with self._lock:
+            watcher = self._watchers.get(container_id)
+            if watcher is None:
+                return
+            watcher.subscribers -= 1
+            if watcher.subscribers > 0:
+                return
+            del self._watchers[container_id]
+        watcher.stop()
+
+    def watched(self) -> Dict[str, int]:
+        with self._lock:
+            return {cid: w.subscribers for cid, w in self._watchers.items()}
@@ -0,0 +1,259 @@
+"""
+Server-side EC2 instance inventory.
+
+A background worker sweeps every configured region in parallel with the
+paginated `describe_instances` (AWS_INVENTORY_REGIONS, comma separated, or
+"all" for every enabled region) every `sweep_interval` seconds. In between,
+only instances in a transitional state (pending, stopping, shutting-down)
+are re-described every `fast_interval` seconds, by id, so state changes
+show up quickly without a full sweep. Launch/terminate calls made through
+this app are applied immediately via `apply()`; ids it had not seen yet are
+added as stubs, filled in by the next refresh and dropped by the first
+sweep that started after them if the region does not list them. Ids that
+`describe_instances` reports as not found are removed (stubs only after
+`_STUB_GRACE` seconds, as new instances take a moment to become visible).
+
+Listings never wait for the first sweep: until it has finished they return
+whatever is known so far with `"ready": false`.
+
+Each change bumps a version number used as the ETag of the listing.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.aws_client import get_aws_client, missing_instance_ids
+
+_TRANSITIONAL = {'pending', 'stopping', 'shutting-down'}
+_DESCRIBE_CHUNK = 1000
+_STUB_GRACE = 60.0
+
+
+def _instance_summary(raw: Dict[str, Any], region: str) -> Dict[str, Any]:
+    tags = {t['Key']: t['Value'] for t in raw.get('Tags') or []}
+    launch_time = raw.get('LaunchTime')
+    return {
+        'id': raw['InstanceId'],
+        'region': region,
+        'name': tags.get('Name', ''),
+        'state': raw.get('State', {}).get('Name'),
+        'type': raw.get('InstanceType'),
+        'ami': raw.get('ImageId'),
+        'az': raw.get('Placement', {}).get('AvailabilityZone'),
+        'private_ip': raw.get('PrivateIpAddress'),
+        'public_ip': raw.get('PublicIpAddress'),
+        'launch_time': launch_time.isoformat() if hasattr(launch_time, 'isoformat') else launch_time,
+        'tags': tags,
+    }
+
+
+class Ec2Inventory:
+    def __init__(self, regions: Optional[List[str]] = None, sweep_interval: float = 300.0,
+                 fast_interval: float = 5.0, workers: int = 8):
+        self.configured_regions = regions
+        self.sweep_interval = sweep_interval
+        self.fast_interval = fast_interval
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ec2-inventory')
+        self._lock = threading.Lock()
+        self._instances: Dict[str, Dict[str, Any]] = {}
+        # stub id -> time.monotonic() it was added by apply()
+        self._stubs: Dict[str, float] = {}
+        self._swept: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+        self._version = 0
+        self._epoch = uuid.uuid4().hex[:8]
+        self._ready = threading.Event()
+        self._wake = threading.Event()
+        self._sweep_requested = False
+        self._thread: Optional[threading.Thread] = None
+
+    # -- public API -------------------------------------------------------
+
+    def instances(self, region: Optional[str] = None, state: Optional[str] = None,
+                  wait: float = 0.0) -> Tuple[Dict[str, Any], str]:
+        """Return ({"instances", "regions", "ready"}, etag).
+
+        The first call starts the worker. Before the initial sweep is done
+        the listing is partial and "ready" is false; `wait` > 0 blocks up to
+        that many seconds for it instead.
+        """
+        self._ensure_running()
+        if wait:
+            self._ready.wait(wait)
+        with self._lock:
+            items = [dict(i) for i in self._instances.values()
+                     if (not region or i['region'] == region) and (not state or i['state'] == state)]
+            regions = {r: {'swept_at': t, 'error': self._errors.get(r)} for r, t in self._swept.items()}
+            etag = self._etag_locked(region, state)
+        items.sort(key=lambda i: (i['region'], i['id']))
+        return {'instances': items, 'regions': regions, 'ready': self._ready.is_set()}, etag
+
+    def etag(self, region: Optional[str] = None, state: Optional[str] = None, wait: float = 0.0) -> str:
+        """ETag the listing would currently have, without building it."""
+        self._ensure_running()
+        if wait:
+            self._ready.wait(wait)
+        with self._lock:
+            return self._etag_locked(region, state)
+
+    def apply(self, region: Optional[str], changes: Dict[str, str]) -> None:
+        """Record state changes made through this app; new ids are added as stubs."""
+        if not changes:
+            return
+        region = region or os.environ.get('AWS_DEFAULT_REGION') or 'us-east-1'
+        with self._lock:
+            for instance_id, state in changes.items():
+                entry = self._instances.get(instance_id)
+                if entry is None:
+                    entry = self._instances[instance_id] = {
+                        'id': instance_id, 'region': region, 'name': '', 'state': state, 'type': None,
+                        'ami': None, 'az': None, 'private_ip': None, 'public_ip': None,
+                        'launch_time': None, 'tags': {},
+                    }
+                    self._stubs[instance_id] = time.monotonic()
+                entry['state'] = state
+            self._version += 1
+        # Transitional instances get filled in by the next fast refresh
+        self._wake.set()
+
+    def request_sweep(self) -> None:
+        self._ensure_running()
+        self._sweep_requested = True
+        self._wake.set()
+
+    # -- worker -----------------------------------------------------------
+
+    def _etag_locked(self, region: Optional[str], state: Optional[str]) -> str:
+        return f'ec2-{self._epoch}-{self._version}-{region or ""}-{state or ""}'
+
+    def _ensure_running(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ec2-inventory', daemon=True)
+                self._thread.start()
+
+    def _regions(self) -> List[str]:
+        regions = self.configured_regions or [os.environ.get('AWS_DEFAULT_REGION') or 'us-east-1']
+        if regions == ['all']:
+            resp = get_aws_client('ec2').describe_regions()
+            regions = [r['RegionName'] for r in resp.get('Regions', [])]
+        return regions
+
+    def _run(self) -> None:
+        next_sweep = 0.0
+        while True:
+            now = time.monotonic()
+            try:
+                if self._sweep_requested or now >= next_sweep:
+                    self._sweep_requested = False
+                    self._sweep()
+                    next_sweep = time.monotonic() + self.sweep_interval
+                else:
+                    self._refresh_transitional()
+            except Exception:
+                next_sweep = time.monotonic() + self.fast_interval
+            self._ready.set()
+            self._wake.wait(self.fast_interval)
+            self._wake.clear()
+
+    def _sweep(self) -> None:
+        started = time.monotonic()
+        regions = self._regions()
+        futures = {region: self._executor.submit(self._describe_region, region) for region in regions}
+        for region, future in futures.items():
+            try:
+                found = future.result()
+            except Exception as e:
+                with self._lock:
+                    self._errors[region] = str(e)
+                continue
+            with self._lock:
+                self._errors.pop(region, None)
+                self._swept[region] = time.time()
+                current = {k: v for k, v in self._instances.items() if v['region'] == region}
+                if current != found:
+                    for instance_id in current.keys() - found.keys():
+                        # Stubs from apply() may be newer than this sweep
+                        added = self._stubs.get(instance_id)
+                        if added is None or added < started:
+                            del self._instances[instance_id]
+                            self._stubs.pop(instance_id, None)
+                    for instance_id in found.keys() & self._stubs.keys():
+                        del self._stubs[instance_id]
+                    self._instances.update(found)
+                    self._version += 1
+
+    def _describe_region(self, region: str, instance_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        paginator = get_aws_client('ec2', region).get_paginator('describe_instances')
+        params: Dict[str, Any] = {'PaginationConfig': {'PageSize': 1000}}
+        if instance_ids:
+            # InstanceIds and MaxResults cannot be combined
+            params = {'InstanceIds': instance_ids}
+        found = {}
+        for page in paginator.paginate(**params):
+            for reservation in page.get('Reservations', []):
+                for raw in reservation.get('Instances', []):
+                    found[raw['InstanceId']] = _instance_summary(raw, region)
+        return found
+
+    def _describe_ids(self, region: str, instance_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Describe `instance_ids`, dropping the ones EC2 does not know and retrying the rest."""
+        while instance_ids:
+            try:
+                return self._describe_region(region, instance_ids)
+            except Exception as e:
+                missing = set(missing_instance_ids(e)) & set(instance_ids)
+                if not missing:
+                    raise
+            self._forget(missing)
+            instance_ids = [i for i in instance_ids if i not in missing]
+        return {}
+
+    def _forget(self, instance_ids) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for instance_id in instance_ids:
+                added = self._stubs.get(instance_id)
+                if added is not None and now - added < _STUB_GRACE:
+                    continue
+                self._stubs.pop(instance_id, None)
+                if self._instances.pop(instance_id, None) is not None:
+                    self._version += 1
+
+    def _refresh_transitional(self) -> None:
+        with self._lock:
+            by_region: Dict[str, List[str]] = {}
+            for inst in self._instances.values():
+                if inst['state'] in _TRANSITIONAL or inst['id'] in self._stubs:
+                    by_region.setdefault(inst['region'], []).append(inst['id'])
+        jobs = []
+        for region, ids in by_region.items():
+            for i in range(0, len(ids), _DESCRIBE_CHUNK):
+                jobs.append(self._executor.submit(self._describe_ids, region, ids[i:i + _DESCRIBE_CHUNK]))
+        for job in jobs:
+            try:
+                found = job.result()
+            except Exception:
+                continue
+            with self._lock:
+                for instance_id in found.keys() & self._stubs.keys():
+                    del self._stubs[instance_id]
+                changed = {k: v for k, v in found.items() if self._instances.get(k) != v}
+                if changed:
+                    self._instances.update(changed)
+                    self._version += 1
+
+_inventory = Ec2Inventory(
+    regions=[r.strip() for r in os.environ.get('AWS_INVENTORY_REGIONS', '').split(',') if r.strip()] or None,
+    sweep_interval=float(os.environ.get('AWS_INVENTORY_SWEEP_INTERVAL', '300')),
+    fast_interval=float(os.environ.get('AWS_INVENTORY_FAST_INTERVAL', '5')),
+)
+
+
+def get_ec2_inventory() -> Ec2Inventory:
+    return _inventory
@@ -0,0 +1,249 @@
+"""
+Background EC2 fleet launch/terminate jobs.
+
+A job issues the multi-instance forms of `run_instances` (MaxCount up to
+`LAUNCH_CHUNK` per call) and `terminate_instances` (up to
+`TERMINATE_CHUNK` ids per call), then tracks every instance with batched
+`describe_instances` calls until each reaches its target state or the job
+times out. Waiters would block one thread per chunk with no intermediate
+progress, so state is polled directly and every change is handed to the
+job listeners (the `/aws` Socket.IO namespace pushes it to watchers).
+
+Jobs run on a small thread pool; the request that creates one returns at
+once with the job id.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils.aws_client import get_aws_client, missing_instance_ids
+
+LAUNCH_CHUNK = int(os.environ.get('AWS_EC2_LAUNCH_CHUNK', '100'))
+TERMINATE_CHUNK = 1000
+DESCRIBE_CHUNK = 1000
+MAX_BATCH = int(os.environ.get('AWS_EC2_MAX_BATCH', '1000'))
+
+# State a job waits for, and states that end tracking of an instance early
+_TARGETS = {'launch': 'running', 'terminate': 'terminated'}
+_DEAD_ENDS = {'launch': {'shutting-down', 'terminated', 'stopping', 'stopped'}, 'terminate': set()}
+# Job-side states for instances that cannot be tracked
+_UNTRACKED = {'error', 'not-found'}
+
+JobListener = Callable[[Dict[str, Any]], None]
+
+
+def _chunks(items: List[str], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class Ec2Job:
+    def __init__(self, action: str, region: Optional[str], params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.action = action
+        self.region = region
+        self.params = params
+        self.status = 'queued'
+        self.instances: Dict[str, str] = {}
+        self.errors: List[str] = []
+        self.last_poll_error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'id': self.id, 'action': self.action, 'region': self.region, 'status': self.status,
+                'counts': dict(Counter(self.instances.values())), 'instances': dict(self.instances),
+                'errors': list(self.errors), 'last_poll_error': self.last_poll_error,
+                'created': self.created, 'finished': self.finished,
+            }
+
+
+class Ec2JobManager:
+    def __init__(self, workers: int = 4, poll_interval: float = 5.0, timeout: float = 900.0, keep: int = 200):
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ec2-job')
+        self._jobs: "OrderedDict[str, Ec2Job]" = OrderedDict()
+        self._listeners: List[JobListener] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback: JobListener) -> None:
+        self._listeners.append(callback)
+
+    def get(self, job_id: str) -> Optional[Ec2Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def launch(self, ami: str, count: int, instance_type: str = 't3.micro', key_name: Optional[str] = None,
+               region: Optional[str] = None, tags: Optional[Dict[str, str]] = None) -> Ec2Job:
+        if not 1 <= count <= MAX_BATCH:
+            raise ValueError(f'count must be between 1 and {MAX_BATCH}')
+        params = {'ImageId': ami, 'InstanceType': instance_type, 'count': count}
+        if key_name:
+            params['KeyName'] = key_name
+        if tags:
+            params['TagSpecifications'] = [{'ResourceType': 'instance',
+                                            'Tags': [{'Key': k, 'Value': str(v)} for k, v in tags.items()]}]
+        return self._submit(Ec2Job('launch', region, params))
+
+    def terminate(self, instance_ids: List[str], region: Optional[str] = None) -> Ec2Job:
+        ids = list(dict.fromkeys(instance_ids))
+        if not 1 <= len(ids) <= MAX_BATCH:
+            raise ValueError(f'instance_ids must list between 1 and {MAX_BATCH} ids')
+        return self._submit(Ec2Job('terminate', region, {'ids': ids}))
+
+    # -- worker -----------------------------------------------------------
+
+    def _submit(self, job: Ec2Job) -> Ec2Job:
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.keep:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.finished is None:
+                    break
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job)
+        return job
+
+    def _publish(self, job: Ec2Job, changed: Dict[str, str]) -> None:
+        snap = job.snapshot()
+        event = {'id': job.id, 'action': job.action, 'region': job.region, 'status': snap['status'], 'counts': snap['counts'],
+                 'changed': changed, 'errors': snap['errors']}
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                pass
+
+    def _run(self, job: Ec2Job) -> None:
+        with job.lock:
+            job.status = 'running'
+        try:
+            ec2 = get_aws_client('ec2', job.region)
+            changed = self._launch(ec2, job) if job.action == 'launch' else self._terminate(ec2, job)
+            self._publish(job, changed)
+            self._track(ec2, job)
+        except Exception as e:
+            with job.lock:
+                job.errors.append(str(e))
+        with job.lock:
+            target = _TARGETS[job.action]
+            reached = sum(1 for s in job.instances.values() if s == target)
+            if reached and reached == len(job.instances) and not job.errors:
+                job.status = 'done'
+            else:
+                job.status = 'partial' if reached else 'failed'
+            job.finished = time.time()
+        self._publish(job, {})
+
+    def _launch(self, ec2, job: Ec2Job) -> Dict[str, str]:
+        params = dict(job.params)
+        remaining = params.pop('count')
+        changed = {}
+        while remaining > 0:
+            n = min(remaining, LAUNCH_CHUNK)
+            try:
+                resp = ec2.run_instances(MinCount=1, MaxCount=n, **params)
+            except Exception as e:
+                with job.lock:
+                    job.errors.append(str(e))
+                break
+            for inst in resp.get('Instances', []):
+                changed[inst['InstanceId']] = inst['State']['Name']
+            with job.lock:
+                job.instances.update(changed)
+            got = len(resp.get('Instances', []))
+            if got < n:
+                with job.lock:
+                    job.errors.append(f'capacity: launched {got} of {n} requested in one call')
+            remaining -= n
+        return changed
+
+    def _terminate(self, ec2, job: Ec2Job) -> Dict[str, str]:
+        changed = {}
+        for chunk in _chunks(job.params['ids'], TERMINATE_CHUNK):
+            while chunk:
+                try:
+                    resp = ec2.terminate_instances(InstanceIds=chunk)
+                except Exception as e:
+                    # One unknown id fails the whole call: drop the ids EC2 names and retry the rest
+                    missing = set(missing_instance_ids(e)) & set(chunk)
+                    with job.lock:
+                        job.errors.append(str(e))
+                        for iid in missing or chunk:
+                            job.instances[iid] = 'not-found' if missing else 'error'
+                    chunk = [iid for iid in chunk if iid not in missing] if missing else []
+                    continue
+                for item in resp.get('TerminatingInstances', []):
+                    changed[item['InstanceId']] = item['CurrentState']['Name']
+                break
+        with job.lock:
+            job.instances.update(changed)
+        return changed
+
+    def _describe(self, ec2, job: Ec2Job, instance_ids: List[str]) -> Dict[str, Any]:
+        """describe_instances for `instance_ids`, leaving out ids EC2 does not know yet.
+
+        Instances just returned by run_instances can be NotFound for a while
+        (eventual consistency); they stay as they are and are asked for again
+        next round. Any other failure is retried next round too.
+        """
+        while instance_ids:
+            try:
+                return ec2.describe_instances(InstanceIds=instance_ids)
+            except Exception as e:
+                missing = set(missing_instance_ids(e))
+                if not missing & set(instance_ids):
+                    with job.lock:
+                        job.last_poll_error = str(e)
+                    return {}
+            instance_ids = [i for i in instance_ids if i not in missing]
+        return {}
+
+    def _track(self, ec2, job: Ec2Job) -> None:
+        target, dead_ends = _TARGETS[job.action], _DEAD_ENDS[job.action]
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with job.lock:
+                waiting = [i for i, s in job.instances.items()
+                           if s != target and s not in dead_ends and s not in _UNTRACKED]
+            if not waiting:
+                return
+            if time.monotonic() >= deadline:
+                with job.lock:
+                    job.errors.append(f'timed out waiting for {len(waiting)} instances')
+                return
+            time.sleep(self.poll_interval)
+            changed = {}
+            for chunk in _chunks(waiting, DESCRIBE_CHUNK):
+                resp = self._describe(ec2, job, chunk)
+                for reservation in resp.get('Reservations', []):
+                    for inst in reservation.get('Instances', []):
+                        state = inst['State']['Name']
+                        if job.instances.get(inst['InstanceId']) != state:
+                            changed[inst['InstanceId']] = state
+            if changed:
+                with job.lock:
+                    job.instances.update(changed)
+                self._publish(job, changed)
+
+
+_manager = Ec2JobManager(
+    workers=int(os.environ.get('AWS_EC2_JOB_WORKERS', '4')),
+    poll_interval=float(os.environ.get('AWS_EC2_JOB_POLL_INTERVAL', '5')),
+    timeout=float(os.environ.get('AWS_EC2_JOB_TIMEOUT', '900')),
+)
+
+
+def get_job_manager() -> Ec2JobManager:
+    return _manager
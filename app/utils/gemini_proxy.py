@@ -0,0 +1,220 @@
+"""
+Gemini text generation proxy with a response cache and request coalescing.
+
+Requests are keyed by the normalised prompt (Unicode NFC, whitespace
+collapsed) and generation parameters; upstream always gets the prompt
+exactly as sent, newlines and indentation included. A finished response is kept in an
+LRU cache for GEMINI_CACHE_TTL seconds (GEMINI_CACHE_SIZE entries), and
+identical requests arriving while one is still being generated attach to
+that upstream call instead of starting their own (single flight).
+
+Upstream is always called with `streamGenerateContent`, on a small thread
+pool, and every chunk is recorded on the flight, so each caller, whether it
+wants the whole text or a token stream (SSE / Socket.IO), replays the
+chunks so far and then follows live. A caller that goes away does not
+cancel the flight; it still completes and fills the cache. Requests with
+`use_cache=False` neither read nor fill the cache.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.utils.providers import get_gemini
+
+DEFAULT_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-1.5-flash')
+MAX_PROMPT_CHARS = int(os.environ.get('GEMINI_MAX_PROMPT_CHARS', '32000'))
+
+# request parameter -> generationConfig field
+_GENERATION_PARAMS = {
+    'temperature': 'temperature',
+    'max_output_tokens': 'maxOutputTokens',
+    'top_p': 'topP',
+    'top_k': 'topK',
+}
+
+
+def normalize_prompt(prompt: str) -> str:
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', prompt)).strip()
+
+
+def parse_params(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Pick and validate the generation parameters from a request payload."""
+    params: Dict[str, Any] = {'model': str(payload.get('model') or DEFAULT_MODEL)}
+    if not re.fullmatch(r'[\w.\-]+', params['model']):
+        raise ValueError('invalid model name')
+    for name in _GENERATION_PARAMS:
+        if payload.get(name) is not None:
+            try:
+                params[name] = int(payload[name]) if name in ('max_output_tokens', 'top_k') else float(payload[name])
+            except (TypeError, ValueError):
+                raise ValueError(f'{name} must be a number')
+    if payload.get('system'):
+        params['system'] = str(payload['system'])
+    return params
+
+
+def cache_key(prompt: str, params: Dict[str, Any]) -> str:
+    # Normalised for the key only; upstream gets the caller's text as is
+    if params.get('system'):
+        params = dict(params, system=normalize_prompt(params['system']))
+    raw = json.dumps([normalize_prompt(prompt), params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _request_body(prompt: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    body: Dict[str, Any] = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+    config = {field: params[name] for name, field in _GENERATION_PARAMS.items() if name in params}
+    if config:
+        body['generationConfig'] = config
+    if params.get('system'):
+        body['systemInstruction'] = {'parts': [{'text': params['system']}]}
+    return body
+
+
+def _chunk_text(chunk: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    candidates = chunk.get('candidates') or [{}]
+    parts = (candidates[0].get('content') or {}).get('parts') or []
+    return ''.join(p.get('text', '') for p in parts), candidates[0].get('finishReason')
+
+
+class _Flight:
+    """One upstream generation; any number of readers follow its chunks."""
+
+    def __init__(self, key: str, cacheable: bool = True):
+        self.key = key
+        self.cacheable = cacheable
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+        self.cond = threading.Condition()
+
+    def follow(self) -> Iterator[str]:
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                new, index = self.chunks[index:], len(self.chunks)
+                finished, error = self.done, self.error
+            yield from new
+            if finished and index >= len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class GeminiProxy:
+    def __init__(self, cache_ttl: float = 300.0, cache_size: int = 512, max_concurrency: int = 8):
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='gemini')
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'coalesced': 0, 'upstream': 0, 'errors': 0}
+
+    def stream(self, prompt: str, params: Dict[str, Any], use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+        """Yield {"text": delta} events, then a final {"done": True, "text", "cached", ...}."""
+        if not normalize_prompt(prompt) or len(prompt) > MAX_PROMPT_CHARS:
+            raise ValueError(f'prompt must be 1..{MAX_PROMPT_CHARS} characters')
+        key = cache_key(prompt, params)
+        cached, flight, coalesced = self._lookup(key, prompt, params, use_cache)
+        if cached is not None:
+            yield {'text': cached['text']}
+            yield dict(cached, done=True, cached=True, coalesced=False)
+            return
+        parts = []
+        for delta in flight.follow():
+            parts.append(delta)
+            yield {'text': delta}
+        yield {'done': True, 'text': ''.join(parts), 'finish_reason': flight.finish_reason, 'usage': flight.usage,
+               'model': params['model'], 'cached': False, 'coalesced': coalesced}
+
+    def generate(self, prompt: str, params: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+        """Whole response: {"text", "finish_reason", "usage", "model", "cached", "coalesced"}."""
+        for event in self.stream(prompt, params, use_cache):
+            if event.get('done'):
+                return event
+        raise RuntimeError('generation ended without a result')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, cached=len(self._cache), in_flight=len(self._flights))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _lookup(self, key: str, prompt: str, params: Dict[str, Any],
+                use_cache: bool) -> Tuple[Optional[Dict[str, Any]], Optional[_Flight], bool]:
+        with self._lock:
+            if use_cache:
+                entry = self._cache.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._cache.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[1], None, False
+                if entry is not None:
+                    del self._cache[key]
+                flight = self._flights.get(key)
+                if flight is not None:
+                    self._stats['coalesced'] += 1
+                    return None, flight, True
+            flight = _Flight(key, cacheable=use_cache)
+            if use_cache:
+                self._flights[key] = flight
+            self._stats['upstream'] += 1
+        self._executor.submit(self._run, flight, prompt, params)
+        return None, flight, False
+
+    def _run(self, flight: _Flight, prompt: str, params: Dict[str, Any]) -> None:
+        try:
+            for chunk in get_gemini().stream_generate(params['model'], _request_body(prompt, params)):
+                text, finish_reason = _chunk_text(chunk)
+                with flight.cond:
+                    if text:
+                        flight.chunks.append(text)
+                    flight.finish_reason = finish_reason or flight.finish_reason
+                    flight.usage = chunk.get('usageMetadata') or flight.usage
+                    flight.cond.notify_all()
+        except Exception as e:
+            flight.error = e
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            if flight.error is not None:
+                self._stats['errors'] += 1
+            elif flight.cacheable and flight.finish_reason in (None, 'STOP', 'MAX_TOKENS'):
+                # Blocked/failed generations (SAFETY, RECITATION, ...) are not cached
+                self._cache[flight.key] = (time.monotonic() + self.cache_ttl, {
+                    'text': ''.join(flight.chunks), 'finish_reason': flight.finish_reason,
+                    'usage': flight.usage, 'model': params['model'],
+                })
+                self._cache.move_to_end(flight.key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        with flight.cond:
+            flight.done = True
+            flight.cond.notify_all()
+
+
+_proxy = GeminiProxy(
+    cache_ttl=float(os.environ.get('GEMINI_CACHE_TTL', '300')),
+    cache_size=int(os.environ.get('GEMINI_CACHE_SIZE', '512')),
+    max_concurrency=int(os.environ.get('GEMINI_MAX_CONCURRENCY', '8')),
+)
+
+
+def get_gemini_proxy() -> GeminiProxy:
+    return _proxy
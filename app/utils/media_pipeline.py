@@ -0,0 +1,262 @@
+"""
+Post-upload media processing on a process pool.
+
+Uploaded photos get a thumbnail and a downscaled, recompressed JPEG preview;
+videos get a poster-frame thumbnail and a short, low-resolution MP4 preview
+capped at MEDIA_VIDEO_PREVIEW_MAX_BYTES. Artifacts are written next to the
+original as `<upload>.thumb.jpg` / `<upload>.preview.jpg|mp4`, via a temp
+file and rename, so a half-written artifact is never visible.
+
+Decoding and encoding are CPU-bound and hold the GIL for long stretches, so
+the work runs in a separate `ProcessPoolExecutor` (MEDIA_WORKERS processes,
+started lazily with forkserver/spawn rather than forking the threaded
+server) and never competes with the Flask/Socket.IO threads. Images need
+Pillow, videos need ffmpeg (FFMPEG_BINARY or on PATH); a missing tool makes
+those jobs fail with a clear error instead of breaking uploads.
+"""
+from __future__ import annotations
+
+import mimetypes
+import multiprocessing
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    from PIL import Image, ImageOps
+except Exception:  # optional dependency
+    Image = None
+    ImageOps = None
+
+THUMB_SIZE = int(os.environ.get('MEDIA_THUMB_SIZE', '320'))
+PREVIEW_SIZE = int(os.environ.get('MEDIA_PREVIEW_SIZE', '1600'))
+JPEG_QUALITY = int(os.environ.get('MEDIA_JPEG_QUALITY', '82'))
+VIDEO_PREVIEW_WIDTH = int(os.environ.get('MEDIA_VIDEO_PREVIEW_WIDTH', '640'))
+VIDEO_PREVIEW_SECONDS = int(os.environ.get('MEDIA_VIDEO_PREVIEW_SECONDS', '30'))
+VIDEO_PREVIEW_MAX_BYTES = int(os.environ.get('MEDIA_VIDEO_PREVIEW_MAX_BYTES', str(8 * 1024 * 1024)))
+FFMPEG_TIMEOUT = float(os.environ.get('MEDIA_FFMPEG_TIMEOUT', '600'))
+
+ARTIFACT_SUFFIXES = ('.thumb.jpg', '.preview.jpg', '.preview.mp4')
+
+
+def media_kind(path: str) -> Optional[str]:
+    mimetype = mimetypes.guess_type(path)[0] or ''
+    if mimetype.startswith('image/'):
+        return 'image'
+    if mimetype.startswith('video/'):
+        return 'video'
+    return None
+
+
+def artifacts_for(path: str) -> Dict[str, Dict[str, Any]]:
+    """Artifacts already on disk for an upload, keyed by "thumb"/"preview"."""
+    found = {}
+    for suffix in ARTIFACT_SUFFIXES:
+        artifact = Path(path + suffix)
+        if artifact.exists():
+            found[suffix.split('.')[1]] = {'path': str(artifact), 'filename': artifact.name,
+                                           'size': artifact.stat().st_size}
+    return found
+
+
+# -- worker-side functions (run in the pool processes) -------------------------
+
+
+def _save_jpeg(img, dest: Path) -> None:
+    tmp = dest.with_name(f'{dest.name}.{uuid.uuid4().hex[:8]}.tmp')
+    img.save(tmp, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    os.replace(tmp, dest)
+
+
+def _process_image(path: str) -> Dict[str, Any]:
+    if Image is None:
+        raise RuntimeError('Pillow not installed')
+    with Image.open(path) as img:
+        width, height = img.size
+        # JPEG can decode at 1/2..1/8 scale directly, far cheaper than a full decode
+        ratio = min(1.0, PREVIEW_SIZE / max(width, height))
+        img.draft('RGB', (int(width * ratio), int(height * ratio)))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if max(img.size) > PREVIEW_SIZE:
+            preview = img.copy()
+            preview.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.LANCZOS)
+        else:
+            preview = img
+        preview_path = Path(path + '.preview.jpg')
+        _save_jpeg(preview, preview_path)
+        if preview_path.stat().st_size >= os.path.getsize(path) and preview is img:
+            # Already small: recompressing only made it bigger
+            preview_path.unlink()
+        img.thumbnail((THUMB_SIZE, THUMB_SIZE), Image.BILINEAR)
+        _save_jpeg(img, Path(path + '.thumb.jpg'))
+    return {'width': width, 'height': height}
+
+
+def _ffmpeg() -> str:
+    binary = os.environ.get('FFMPEG_BINARY') or shutil.which('ffmpeg')
+    if not binary:
+        raise RuntimeError('ffmpeg not installed')
+    return binary
+
+
+def _run_ffmpeg(args) -> None:
+    proc = subprocess.run([_ffmpeg(), '-hide_banner', '-loglevel', 'error', '-nostdin', '-y', *args],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=FFMPEG_TIMEOUT)
+    if proc.returncode != 0:
+        raise RuntimeError(f'ffmpeg failed: {proc.stderr.decode(errors="replace")[-500:]}')
+
+
+def _process_video(path: str) -> Dict[str, Any]:
+    thumb = Path(path + '.thumb.jpg')
+    preview = Path(path + '.preview.mp4')
+    tmp_thumb = thumb.with_name(f'{thumb.name}.{uuid.uuid4().hex[:8]}.tmp.jpg')
+    tmp_preview = preview.with_name(f'{preview.name}.{uuid.uuid4().hex[:8]}.tmp.mp4')
+    scale = f"scale='min({THUMB_SIZE},iw)':-2"
+    try:
+        try:
+            _run_ffmpeg(['-ss', '1', '-i', path, '-frames:v', '1', '-vf', scale, tmp_thumb])
+        except RuntimeError:
+            pass
+        if not tmp_thumb.exists() or not tmp_thumb.stat().st_size:
+            # Shorter than a second: take the first frame
+            _run_ffmpeg(['-i', path, '-frames:v', '1', '-vf', scale, tmp_thumb])
+        os.replace(tmp_thumb, thumb)
+
+        # Constant quality, but peak bitrate bounded so the whole clip fits the
+        # byte budget (-fs alone is not reliable with the mp4 muxer)
+        max_rate = max(100_000, int(VIDEO_PREVIEW_MAX_BYTES * 8 * 0.9 / (VIDEO_PREVIEW_SECONDS + 1)) - 64_000)
+        _run_ffmpeg([
+            '-i', path, '-t', str(VIDEO_PREVIEW_SECONDS),
+            '-vf', f"scale='min({VIDEO_PREVIEW_WIDTH},iw)':-2",
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '30',
+            '-maxrate', str(max_rate), '-bufsize', str(max_rate), '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-b:a', '64k', '-movflags', '+faststart', tmp_preview,
+        ])
+        if tmp_preview.stat().st_size > VIDEO_PREVIEW_MAX_BYTES:
+            raise RuntimeError(f'video preview exceeds {VIDEO_PREVIEW_MAX_BYTES} bytes')
+        os.replace(tmp_preview, preview)
+    finally:
+        tmp_thumb.unlink(missing_ok=True)
+        tmp_preview.unlink(missing_ok=True)
+    return {}
+
+
+def _process(path: str, kind: str) -> Dict[str, Any]:
+    info = _process_image(path) if kind == 'image' else _process_video(path)
+    return {'info': info, 'artifacts': artifacts_for(path)}
+
+
+# -- job tracking (server side) ------------------------------------------------
+
+
+class MediaJob:
+    def __init__(self, path: str, kind: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.path = path
+        self.kind = kind
+        self.status = 'queued'
+        self.artifacts: Dict[str, Dict[str, Any]] = {}
+        self.info: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.future: Optional[Future] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        status = self.status
+        if status == 'queued' and self.future is not None and self.future.running():
+            status = 'processing'
+        return {
+            'id': self.id, 'path': self.path, 'filename': os.path.basename(self.path), 'kind': self.kind,
+            'status': status, 'artifacts': self.artifacts, 'info': self.info, 'error': self.error,
+            'created': self.created, 'finished': self.finished,
+        }
+
+
+class MediaPipeline:
+    def __init__(self, workers: int = 2, keep: int = 1000):
+        self.workers = workers
+        self.keep = keep
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: "OrderedDict[str, MediaJob]" = OrderedDict()
+        self._by_path: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, path: str, filename: Optional[str] = None) -> Optional[MediaJob]:
+        """Queue processing for the file at `path`; None if it isn't an image or video.
+
+        `filename` is used to tell the media type when `path` has no extension.
+        """
+        kind = media_kind(filename or path)
+        if kind is None:
+            return None
+        with self._lock:
+            existing = self._jobs.get(self._by_path.get(path, ''))
+            if existing is not None and self._reusable(existing):
+                return existing
+            job = MediaJob(path, kind)
+            self._jobs[job.id] = job
+            self._by_path[path] = job.id
+            self._trim_locked()
+            try:
+                job.future = self._executor_locked().submit(_process, path, kind)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool
+                self._executor = None
+                job.future = self._executor_locked().submit(_process, path, kind)
+        job.future.add_done_callback(lambda f, job=job: self._finish(job, f))
+        return job
+
+    def get(self, job_id: str) -> Optional[MediaJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @staticmethod
+    def _reusable(job: MediaJob) -> bool:
+        # In flight, or done with every artifact still on disk (the store may
+        # have evicted a blob and its artifacts since, then re-received it)
+        if job.status == 'queued':
+            return True
+        return job.status == 'done' and artifacts_for(job.path).keys() >= job.artifacts.keys()
+
+    def _executor_locked(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._executor
+
+    def _trim_locked(self) -> None:
+        while len(self._jobs) > self.keep:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.finished is None:
+                break
+            self._jobs.popitem(last=False)
+            if self._by_path.get(oldest.path) == oldest.id:
+                del self._by_path[oldest.path]
+
+    def _finish(self, job: MediaJob, future: Future) -> None:
+        try:
+            result = future.result()
+            job.artifacts, job.info, job.status = result['artifacts'], result['info'], 'done'
+        except Exception as e:
+            job.artifacts, job.error, job.status = artifacts_for(job.path), str(e), 'failed'
+        job.future = None
+        job.finished = time.time()
+
+
+_pipeline = MediaPipeline(workers=int(os.environ.get('MEDIA_WORKERS', str(max(1, (os.cpu_count() or 2) // 2)))))
+
+
+def get_media_pipeline() -> MediaPipeline:
+    return _pipeline
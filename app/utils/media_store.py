@@ -0,0 +1,230 @@
+"""
+Content-addressed, quota-bounded store for uploaded media.
+
+File contents live once under `<uploads>/blobs/<aa>/<sha256>` (the digest is
+computed while the upload streams in, see app.utils.uploads). Each upload is
+a row in a small SQLite index (`<uploads>/index.sqlite3`) plus a named hard
+link `<uploads>/upload_<timestamp>_<id>_<name>` to its blob, so uploading
+the same capture twice stores its bytes once and costs no copy.
+
+A blob is referenced while at least one upload points at it. Deleting an
+upload drops the reference; unreferenced blobs stay around (a re-upload is
+then free) until the MEDIA_STORE_QUOTA_BYTES quota needs room, and are
+evicted least recently used first, together with their thumbnails/previews.
+Referenced blobs are never evicted: if the quota cannot be met the upload is
+refused with QuotaExceeded. Setting MEDIA_STORE_RETENTION_DAYS (off by
+default) also releases uploads unused for that many days when room is made.
+
+Every change runs inside an immediate SQLite transaction, and the file
+operations (rename, link, unlink) happen while it holds the database write
+lock, so worker processes sharing the uploads folder do not race on files.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from werkzeug.utils import secure_filename
+
+QUOTA_BYTES = int(os.environ.get('MEDIA_STORE_QUOTA_BYTES', str(20 * 1024 ** 3)))
+RETENTION_DAYS = float(os.environ.get('MEDIA_STORE_RETENTION_DAYS', '0'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    id TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL REFERENCES blobs(sha256),
+    filename TEXT NOT NULL,
+    original_name TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_sha256 ON uploads(sha256);
+CREATE UNIQUE INDEX IF NOT EXISTS uploads_filename ON uploads(filename);
+CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs(last_access);
+"""
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class MediaStore:
+    def __init__(self, root: Path, quota_bytes: int = QUOTA_BYTES, retention_days: float = RETENTION_DAYS):
+        self.root = Path(root)
+        self.quota_bytes = quota_bytes
+        self.retention = retention_days * 86400
+        self.blob_dir = self.root / 'blobs'
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit; transactions are opened explicitly by _transaction()
+        self._db = sqlite3.connect(str(self.root / 'index.sqlite3'), check_same_thread=False,
+                                   isolation_level=None, timeout=30.0)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.blob_dir / sha256[:2] / sha256
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """This process's lock plus the database write lock, held across file operations."""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    # -- writes -----------------------------------------------------------
+
+    def add(self, part: Path, original_name: Optional[str], sha256: str, size: int) -> Dict[str, Any]:
+        """Take ownership of a fully written, hashed temp file and record an upload for it.
+
+        The temp file must be on the same filesystem as the store; it is
+        renamed into place, or simply removed if the blob already exists.
+        """
+        upload_id = uuid.uuid4().hex[:16]
+        timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+        filename = f"upload_{timestamp}_{upload_id[:8]}_{secure_filename(original_name or '') or 'file'}"
+        blob = self.blob_path(sha256)
+        now = time.time()
+        refused: Optional[QuotaExceeded] = None
+        with self._transaction():
+            try:
+                known = self._db.execute('SELECT 1 FROM blobs WHERE sha256 = ?', (sha256,)).fetchone()
+                if known and blob.exists():
+                    part.unlink()
+                else:
+                    self._make_room_locked(size)
+                    blob.parent.mkdir(exist_ok=True)
+                    os.replace(part, blob)
+                os.link(blob, self.root / filename)
+            except QuotaExceeded as e:
+                # Commit what was evicted on the way; those files are already gone
+                part.unlink(missing_ok=True)
+                refused = e
+            except BaseException:
+                part.unlink(missing_ok=True)
+                raise
+            else:
+                self._db.execute(
+                    'INSERT INTO blobs (sha256, size, created, last_access) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT(sha256) DO UPDATE SET last_access = excluded.last_access',
+                    (sha256, size, now, now),
+                )
+                self._db.execute(
+                    'INSERT INTO uploads (id, sha256, filename, original_name, size, created, last_access) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (upload_id, sha256, filename, original_name, size, now, now),
+                )
+        if refused is not None:
+            raise refused
+        return {'id': upload_id, 'path': str(self.root / filename), 'filename': filename, 'size': size,
+                'sha256': sha256, 'deduplicated': bool(known)}
+
+    def delete(self, upload_id: str) -> bool:
+        """Drop an upload; its blob becomes evictable once nothing else references it."""
+        with self._transaction():
+            row = self._db.execute('SELECT filename FROM uploads WHERE id = ?', (upload_id,)).fetchone()
+            if row is None:
+                return False
+            self._release_locked(upload_id, row['filename'])
+        return True
+
+    # -- reads ------------------------------------------------------------
+
+    def get(self, upload_id: str, touch: bool = True) -> Optional[Dict[str, Any]]:
+        """Look up an upload by id; None if unknown or its blob is gone."""
+        with self._transaction():
+            row = self._db.execute('SELECT * FROM uploads WHERE id = ?', (upload_id,)).fetchone()
+            if row is None:
+                return None
+            blob = self.blob_path(row['sha256'])
+            if not blob.exists():
+                self._release_locked(upload_id, row['filename'])
+                return None
+            if touch:
+                now = time.time()
+                self._db.execute('UPDATE uploads SET last_access = ? WHERE id = ?', (now, upload_id))
+                self._db.execute('UPDATE blobs SET last_access = ? WHERE sha256 = ?', (now, row['sha256']))
+        return {'id': row['id'], 'path': str(self.root / row['filename']), 'filename': row['filename'],
+                'original_name': row['original_name'], 'size': row['size'], 'sha256': row['sha256'],
+                'blob': str(blob), 'created': row['created']}
+
+    def find_by_path(self, path: str) -> Optional[Dict[str, Any]]:
+        """Resolve a path previously returned for an upload; anything outside the index is None."""
+        candidate = Path(path)
+        if candidate.parent.resolve() != self.root.resolve():
+            return None
+        with self._lock:
+            row = self._db.execute('SELECT id FROM uploads WHERE filename = ?', (candidate.name,)).fetchone()
+        return self.get(row['id']) if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            blobs = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+            uploads = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM uploads').fetchone()
+        return {'blobs': blobs[0], 'stored_bytes': blobs[1], 'uploads': uploads[0], 'logical_bytes': uploads[1],
+                'quota_bytes': self.quota_bytes}
+
+    # -- eviction ---------------------------------------------------------
+
+    def _release_locked(self, upload_id: str, filename: str) -> None:
+        (self.root / filename).unlink(missing_ok=True)
+        self._db.execute('DELETE FROM uploads WHERE id = ?', (upload_id,))
+
+    def _make_room_locked(self, incoming: int) -> None:
+        if incoming > self.quota_bytes:
+            raise QuotaExceeded(f'upload of {incoming} bytes exceeds the {self.quota_bytes} byte quota')
+        if self.retention > 0:
+            # Opt-in: release uploads nobody has opened for RETENTION_DAYS
+            cutoff = time.time() - self.retention
+            for row in self._db.execute('SELECT id, filename FROM uploads WHERE last_access < ?', (cutoff,)).fetchall():
+                self._release_locked(row['id'], row['filename'])
+        used = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+        if used + incoming <= self.quota_bytes:
+            return
+        candidates = self._db.execute(
+            'SELECT sha256, size FROM blobs WHERE NOT EXISTS '
+            '(SELECT 1 FROM uploads WHERE uploads.sha256 = blobs.sha256) ORDER BY last_access'
+        ).fetchall()
+        for row in candidates:
+            blob = self.blob_path(row['sha256'])
+            for path in blob.parent.glob(f"{row['sha256']}*"):
+                path.unlink(missing_ok=True)  # the blob and its thumbnails/previews
+            self._db.execute('DELETE FROM blobs WHERE sha256 = ?', (row['sha256'],))
+            used -= row['size']
+            if used + incoming <= self.quota_bytes:
+                return
+        raise QuotaExceeded(f'upload quota of {self.quota_bytes} bytes is full of referenced uploads')
+
+
+_stores: Dict[str, MediaStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_media_store(root: Path) -> MediaStore:
+    """Store rooted at `root` (the app's uploads folder), opened once per process."""
+    key = str(Path(root).resolve())
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = MediaStore(Path(key))
+        return _stores[key]
@@ -0,0 +1,348 @@
+"""
+In-process outbound message queue (email/SMS) with a bounded worker pool.
+
+Routes enqueue a message and return its job id at once; a fixed number of
+worker threads send it through the `third_party_wrappers` functions. Failed
+sends that are worth retrying (rate limiting, provider 5xx, connection and
+timeout errors) are rescheduled with exponential backoff and jitter, honouring Retry-After
+when the provider sends one. A 429 also pauses the whole provider for that
+long, so queued messages don't keep hitting the limit. Each provider is
+additionally paced by a token bucket (`MESSAGING_<PROVIDER>_RATE` per
+second); a job waiting for its provider's token stays on the queue, so a
+backlog for one provider does not hold up workers for the others.
+
+The queue is memory-only: messages not yet sent are lost on restart.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+import urllib3
+
+from app.utils import third_party_wrappers
+
+StatusListener = Callable[[Dict[str, Any]], None]
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _send_email(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return third_party_wrappers.send_email_sendgrid(payload['to'], payload['subject'], payload['content'])
+
+
+def _send_email_attachments(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return third_party_wrappers.send_email_with_attachments_sendgrid(
+        payload['to'], payload['subject'], payload['content'], payload['attachments']
+    )
+
+
+def _send_bulk_email(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return third_party_wrappers.send_bulk_email_sendgrid(payload['recipients'], payload['subject'],
+                                                         payload['content'])
+
+
+def _send_sms(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return third_party_wrappers.send_sms_twilio(payload['to'], payload['body'])
+
+
+# kind -> (provider, send function)
+SENDERS: Dict[str, Tuple[str, Callable[[Dict[str, Any]], Dict[str, Any]]]] = {
+    'email': ('sendgrid', _send_email),
+    'email_attachments': ('sendgrid', _send_email_attachments),
+    'bulk_email': ('sendgrid', _send_bulk_email),
+    'sms': ('twilio', _send_sms),
+}
+
+
+# Failures of the connection itself, worth another attempt
+_NETWORK_ERRORS = (
+    requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError,
+    urllib3.exceptions.ProtocolError, urllib3.exceptions.TimeoutError, urllib3.exceptions.NewConnectionError,
+)
+# Attachment problems (deleted or evicted from the upload store, unreadable): retrying won't help
+_FILE_ERRORS = (FileNotFoundError, IsADirectoryError, NotADirectoryError, PermissionError)
+
+
+def classify_error(exc: Exception) -> Tuple[bool, Optional[float], Optional[int]]:
+    """Return (retryable, retry-after seconds, HTTP status) for a failed send.
+
+    Provider errors carry an HTTP status (`status_code` on SendGrid and
+    ProviderHTTPError, `status` on Twilio's `TwilioRestException`, or a
+    requests `response`); 429 and 5xx are retried. Without a status only
+    connection and timeout errors (requests, urllib3, other OSErrors) are
+    retried; anything else, such as a bad payload, a programming error, a
+    missing SDK or a missing attachment file, fails at once.
+    """
+    status = getattr(exc, 'status_code', None) or getattr(exc, 'status', None)
+    if not isinstance(status, int):
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    if not isinstance(status, int):
+        if isinstance(exc, _FILE_ERRORS):
+            return False, None, None
+        if isinstance(exc, _NETWORK_ERRORS):
+            return True, None, None
+        if isinstance(exc, requests.exceptions.RequestException):
+            # InvalidURL, TooManyRedirects, ... (all OSError subclasses)
+            return False, None, None
+        return isinstance(exc, OSError), None, None
+    retry_after = None
+    headers = getattr(exc, 'headers', None) or getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    try:
+        value = headers.get('Retry-After') or headers.get('retry-after')
+        retry_after = float(value) if value is not None else None
+    except (AttributeError, TypeError, ValueError):
+        pass
+    return status == 429 or status >= 500, retry_after, status
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self) -> float:
+        """Take a token; return how long until it may be used (locked by caller)."""
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, self.paused_until - now)
+        if self.rate > 0:
+            self.tokens -= 1
+            if self.tokens < 0:
+                wait = max(wait, -self.tokens / self.rate)
+        return wait
+
+
+class MessageJob:
+    def __init__(self, kind: str, payload: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.payload = payload
+        self.status = 'queued'
+        self.attempts = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.next_attempt: Optional[float] = None
+        self.finished: Optional[float] = None
+        # A provider token was taken for the next attempt (see MessageQueue._next_job)
+        self.has_token = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'id': self.id, 'kind': self.kind, 'to': self.payload.get('to'), 'status': self.status,
+            'attempts': self.attempts, 'result': self.result, 'error': self.error,
+            'created': self.created, 'next_attempt': self.next_attempt, 'finished': self.finished,
+        }
+
+
+class MessageQueue:
+    def __init__(self, workers: int = 4, max_queue: int = 10000, max_attempts: int = 5,
+                 base_delay: float = 2.0, max_delay: float = 300.0, rates: Optional[Dict[str, float]] = None,
+                 keep: int = 5000):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.keep = keep
+        self._buckets = {p: _TokenBucket(r, max(1.0, r)) for p, r in (rates or {}).items()}
+        self._heap: List[Tuple[float, int, MessageJob]] = []
+        self._counter = itertools.count()
+        self._jobs: "OrderedDict[str, MessageJob]" = OrderedDict()
+        self._pending = 0
+        self._listeners: List[StatusListener] = []
+        self._cond = threading.Condition()
+        # Notified whenever a job is sent or fails for good
+        self._finished = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+    def add_listener(self, callback: StatusListener) -> None:
+        self._listeners.append(callback)
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> MessageJob:
+        if kind not in SENDERS:
+            raise ValueError(f'unknown message kind: {kind}')
+        job = MessageJob(kind, payload)
+        with self._cond:
+            if self._pending >= self.max_queue:
+                raise QueueFull(f'message queue is full ({self.max_queue} pending)')
+            self._pending += 1
+            self._jobs[job.id] = job
+            self._trim_locked()
+            heapq.heappush(self._heap, (time.monotonic(), next(self._counter), job))
+            self._start_locked()
+            self._cond.notify()
+        self._publish(job)
+        return job
+
+    def enqueue_many(self, kind: str, payloads: List[Dict[str, Any]]) -> List[MessageJob]:
+        """Queue several messages at once; all or none (QueueFull) are queued."""
+        if kind not in SENDERS:
+            raise ValueError(f'unknown message kind: {kind}')
+        jobs = [MessageJob(kind, payload) for payload in payloads]
+        with self._cond:
+            if self._pending + len(jobs) > self.max_queue:
+                raise QueueFull(f'message queue cannot take {len(jobs)} more messages '
+                                f'({self._pending} of {self.max_queue} pending)')
+            now = time.monotonic()
+            for job in jobs:
+                self._pending += 1
+                self._jobs[job.id] = job
+                heapq.heappush(self._heap, (now, next(self._counter), job))
+            self._trim_locked()
+            self._start_locked()
+            self._cond.notify_all()
+        for job in jobs:
+            self._publish(job)
+        return jobs
+
+    def follow(self, jobs: List[MessageJob], poll: float = 1.0) -> Iterator[MessageJob]:
+        """Yield `jobs` as each one is sent or fails for good, in that order.
+
+        Stopping early does not cancel anything; the messages stay queued.
+        """
+        remaining = list(jobs)
+        while remaining:
+            with self._finished:
+                done = [job for job in remaining if job.finished is not None]
+                if not done:
+                    self._finished.wait(poll)
+                    continue
+            remaining = [job for job in remaining if job not in done]
+            yield from done
+
+    def get(self, job_id: str) -> Optional[MessageJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {'pending': self._pending, 'workers': self.workers, 'jobs': counts}
+
+    # -- worker -----------------------------------------------------------
+
+    def _start_locked(self) -> None:
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f'message-worker-{len(self._threads)}', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _trim_locked(self) -> None:
+        while len(self._jobs) > self.keep:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.finished is None:
+                break
+            self._jobs.popitem(last=False)
+
+    def _publish(self, job: MessageJob) -> None:
+        snapshot = job.snapshot()
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception:
+                pass
+
+    def _next_job(self) -> MessageJob:
+        """Pop the next due job whose provider has a token.
+
+        A job whose provider is out of tokens (or paused after a 429) takes
+        its token in advance and goes back on the heap for when it will be
+        sendable, so workers move on to other providers' jobs instead of
+        sleeping on the slow one.
+        """
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                due = self._heap[0][0] - now
+                if due > 0:
+                    self._cond.wait(due)
+                    continue
+                _, seq, job = heapq.heappop(self._heap)
+                bucket = self._buckets.get(SENDERS[job.kind][0])
+                if bucket is not None:
+                    if not job.has_token:
+                        wait = bucket.reserve()
+                        job.has_token = True
+                    else:
+                        wait = max(0.0, bucket.paused_until - now)
+                    if wait > 0:
+                        heapq.heappush(self._heap, (now + wait, seq, job))
+                        continue
+                job.has_token = False
+                return job
+
+    def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            provider, send = SENDERS[job.kind]
+            job.status = 'sending'
+            job.attempts += 1
+            try:
+                job.result = send(job.payload)
+                job.status, job.error, job.next_attempt = 'sent', None, None
+            except Exception as e:
+                job.error = str(e)
+                self._handle_failure(job, provider, e)
+            if job.status in ('sent', 'failed'):
+                job.finished = time.time()
+                with self._cond:
+                    self._pending -= 1
+                with self._finished:
+                    self._finished.notify_all()
+            self._publish(job)
+
+    def _handle_failure(self, job: MessageJob, provider: str, exc: Exception) -> None:
+        retryable, retry_after, status = classify_error(exc)
+        if not retryable or job.attempts >= self.max_attempts:
+            job.status, job.next_attempt = 'failed', None
+            return
+        delay = min(self.max_delay, self.base_delay * 2 ** (job.attempts - 1))
+        delay = random.uniform(delay / 2, delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        job.status = 'retrying'
+        job.next_attempt = time.time() + delay
+        with self._cond:
+            if status == 429 and provider in self._buckets:
+                bucket = self._buckets[provider]
+                bucket.paused_until = max(bucket.paused_until, time.monotonic() + delay)
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), job))
+            self._cond.notify()
+
+
+_queue = MessageQueue(
+    workers=int(os.environ.get('MESSAGING_WORKERS', '4')),
+    max_queue=int(os.environ.get('MESSAGING_MAX_QUEUE', '10000')),
+    max_attempts=int(os.environ.get('MESSAGING_MAX_ATTEMPTS', '5')),
+    base_delay=float(os.environ.get('MESSAGING_RETRY_BASE_DELAY', '2')),
+    rates={
+        'sendgrid': float(os.environ.get('MESSAGING_SENDGRID_RATE', '10')),
+        'twilio': float(os.environ.get('MESSAGING_TWILIO_RATE', '1')),
+    },
+)
+
+
+def get_message_queue() -> MessageQueue:
+    return _queue
@@ -0,0 +1,178 @@
+"""
+Process-wide, pooled clients for the external APIs (SendGrid, Twilio, Gemini).
+
+Each client is created once per process on first use and keeps its HTTP
+connections alive, so sends skip the TCP/TLS handshake and SDK setup.
+Pool size and timeout come from PROVIDER_POOL_SIZE / PROVIDER_TIMEOUT.
+SENDGRID_API_HOST, TWILIO_API_BASE and GEMINI_API_HOST point the clients
+elsewhere, e.g. at scripts/fake_provider_server.py or
+scripts/fake_gemini_server.py.
+
+The SendGrid SDK sends through urllib, which opens a new connection per
+request, so `SendGridClient` posts the same v3 JSON through a pooled
+`requests.Session` instead. Twilio's SDK takes an HTTP client, so it gets a
+pooled `TwilioHttpClient`.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ProviderHTTPError(Exception):
+    """Non-2xx provider response; `status_code` and `headers` drive retries."""
+
+    def __init__(self, status_code: int, body: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(f'HTTP {status_code}: {body[:500]}')
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+
+def _pooled_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class SendGridClient:
+    def __init__(self, api_key: str, host: str = 'https://api.sendgrid.com', pool_size: int = 10,
+                 timeout: float = 30.0):
+        self.host = host.rstrip('/')
+        self.timeout = timeout
+        self.session = _pooled_session(pool_size)
+        self.session.headers.update({'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'})
+
+    def send(self, body: Any) -> Dict[str, Any]:
+        """POST a v3 mail/send body; raises ProviderHTTPError on failure.
+
+        `body` is a dict, or an already-encoded JSON body such as a
+        `StreamingMailBody` (an iterable of bytes with a `len()`), which is
+        streamed with a Content-Length.
+        """
+        if isinstance(body, dict):
+            resp = self.session.post(f'{self.host}/v3/mail/send', json=body, timeout=self.timeout)
+        else:
+            resp = self.session.post(f'{self.host}/v3/mail/send', data=body, timeout=self.timeout)
+        if resp.status_code >= 400:
+            raise ProviderHTTPError(resp.status_code, resp.text, dict(resp.headers))
+        return {'status_code': resp.status_code, 'message_id': resp.headers.get('X-Message-Id')}
+
+
+class GeminiClient:
+    """Gemini `generateContent` REST API over a pooled session."""
+
+    def __init__(self, api_key: str, host: str = 'https://generativelanguage.googleapis.com', pool_size: int = 10,
+                 timeout: float = 60.0):
+        self.host = host.rstrip('/')
+        self.timeout = timeout
+        self.session = _pooled_session(pool_size)
+        self.session.headers.update({'x-goog-api-key': api_key, 'Content-Type': 'application/json'})
+
+    def stream_generate(self, model: str, body: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """POST to `streamGenerateContent?alt=sse`, yielding each response chunk as it arrives."""
+        resp = self.session.post(f'{self.host}/v1beta/models/{model}:streamGenerateContent', params={'alt': 'sse'},
+                                 json=body, timeout=self.timeout, stream=True)
+        with resp:
+            if resp.status_code >= 400:
+                raise ProviderHTTPError(resp.status_code, resp.text, dict(resp.headers))
+            for line in resp.iter_lines():
+                if line.startswith(b'data:'):
+                    yield json.loads(line[5:])
+
+
+def _twilio_client(account_sid: str, auth_token: str, base: Optional[str], pool_size: int, timeout: float):
+    try:
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+    except Exception as e:
+        raise RuntimeError('twilio package not installed') from e
+
+    class _HttpClient(TwilioHttpClient):
+        def request(self, method, url, *args, **kwargs):
+            if base and url.startswith('https://api.twilio.com'):
+                url = base.rstrip('/') + url[len('https://api.twilio.com'):]
+            return super().request(method, url, *args, **kwargs)
+
+    http_client = _HttpClient(pool_connections=True, timeout=timeout)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    http_client.session.mount('https://', adapter)
+    http_client.session.mount('http://', adapter)
+    return Client(account_sid, auth_token, http_client=http_client)
+
+
+class ProviderRegistry:
+    def __init__(self, pool_size: int = 10, timeout: float = 30.0):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def sendgrid(self) -> SendGridClient:
+        with self._lock:
+            if 'sendgrid' not in self._clients:
+                self._clients['sendgrid'] = SendGridClient(
+                    os.environ.get('SENDGRID_API_KEY') or 'PASTE_YOUR_SENDGRID_KEY',
+                    host=os.environ.get('SENDGRID_API_HOST', 'https://api.sendgrid.com'),
+                    pool_size=self.pool_size, timeout=self.timeout,
+                )
+            return self._clients['sendgrid']
+
+    def twilio(self):
+        with self._lock:
+            if 'twilio' not in self._clients:
+                self._clients['twilio'] = _twilio_client(
+                    os.environ.get('TWILIO_ACCOUNT_SID', 'PASTE_SID'),
+                    os.environ.get('TWILIO_AUTH_TOKEN', 'PASTE_TOKEN'),
+                    os.environ.get('TWILIO_API_BASE'),
+                    self.pool_size, self.timeout,
+                )
+            return self._clients['twilio']
+
+    def gemini(self) -> GeminiClient:
+        with self._lock:
+            if 'gemini' not in self._clients:
+                self._clients['gemini'] = GeminiClient(
+                    os.environ.get('GEMINI_API_KEY', 'PASTE_GEMINI_KEY'),
+                    host=os.environ.get('GEMINI_API_HOST', 'https://generativelanguage.googleapis.com'),
+                    pool_size=self.pool_size, timeout=self.timeout,
+                )
+            return self._clients['gemini']
+
+    def reset(self) -> None:
+        """Drop all clients, e.g. after rotating API keys; they are rebuilt on next use."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            session = getattr(client, 'session', None) or getattr(getattr(client, 'http_client', None), 'session', None)
+            if session is not None:
+                session.close()
+
+
+_registry = ProviderRegistry(
+    pool_size=int(os.environ.get('PROVIDER_POOL_SIZE', '10')),
+    timeout=float(os.environ.get('PROVIDER_TIMEOUT', '30')),
+)
+
+
+def get_sendgrid() -> SendGridClient:
+    return _registry.sendgrid()
+
+
+def get_twilio():
+    return _registry.twilio()
+
+
+def get_gemini() -> GeminiClient:
+    return _registry.gemini()
+
+
+def reset_providers() -> None:
+    _registry.reset()
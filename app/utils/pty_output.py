@@ -0,0 +1,140 @@
+"""
+Per-session output batching and flow control for PTY output.
+
+Reads from a PTY are merged into frames that are flushed either after a
+short time budget or once a byte cap is reached. Each frame is acknowledged
+by the client; once too many frames are unacknowledged the session either
+stops reading the PTY ("block", the kernel buffer then throttles the shell)
+or keeps reading and discards output, sending a one-line summary of what was
+dropped once the client catches up ("drop").
+
+All state is confined to the reactor thread: acks arriving on other threads
+are handed back with `call_soon`.
+"""
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+from app.utils.pty_reactor import PtyReactor, TimerHandle
+
+SendCallback = Callable[[bytes, Callable[..., None]], None]
+
+OVERFLOW_MODES = ('block', 'drop')
+
+
+class OutputBatcher:
+    def __init__(
+        self,
+        reactor: PtyReactor,
+        fd: int,
+        send: SendCallback,
+        flush_interval: float = 0.004,
+        max_bytes: int = 65536,
+        max_inflight: int = 4,
+        overflow: str = 'block',
+    ):
+        if overflow not in OVERFLOW_MODES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_MODES}, got {overflow!r}")
+        self.reactor = reactor
+        self.fd = fd
+        self.send = send
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_inflight = max_inflight
+        self.overflow = overflow
+
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.bytes_dropped = 0
+
+        self._buf = bytearray()
+        self._timer: Optional[TimerHandle] = None
+        self._inflight = 0
+        self._dropped = 0
+        self._paused = False
+        self._closed = False
+        self._generation = 0  # bumped by reset() so stale acks are ignored
+
+    @property
+    def pending_bytes(self) -> int:
+        return len(self._buf)
+
+    def feed(self, data: bytes) -> None:
+        """Queue PTY output; called on the reactor thread."""
+        if self._closed:
+            return
+        if self.overflow == 'drop' and self._inflight >= self.max_inflight:
+            self._dropped += len(data)
+            self.bytes_dropped += len(data)
+            return
+        self._buf += data
+        if len(self._buf) >= self.max_bytes:
+            self.flush()
+        elif self._timer is None:
+            self._timer = self.reactor.call_later(self.flush_interval, self.flush)
+
+    def flush(self, force: bool = False) -> None:
+        """Send the pending frame unless the client is too far behind."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._closed or (self._inflight >= self.max_inflight and not force):
+            return
+        if self._dropped:
+            notice = f"\r\n[output truncated: {self._dropped} bytes dropped]\r\n".encode()
+            self._buf[:0] = notice
+            self._dropped = 0
+        if not self._buf:
+            return
+        frame = bytes(self._buf)
+        self._buf.clear()
+        self._inflight += 1
+        self.frames_sent += 1
+        self.bytes_sent += len(frame)
+        self.send(frame, self._make_ack())
+        if self.overflow == 'block' and self._inflight >= self.max_inflight and not self._paused:
+            self._paused = True
+            self.reactor.pause(self.fd)
+
+    def _make_ack(self) -> Callable[..., None]:
+        generation = self._generation
+
+        def ack(*args) -> None:
+            # Client acknowledged the frame; may run on any thread
+            self.reactor.call_soon(lambda: self._on_ack(generation))
+        return ack
+
+    def reset(self, replay: bytes = b'') -> None:
+        """Forget pending output and unacked frames, e.g. after `send` changed.
+
+        A non-empty `replay` is then sent as a single frame. Reactor thread only.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._buf.clear()
+        self._dropped = 0
+        self._inflight = 0
+        self._generation += 1
+        if self._paused:
+            self._paused = False
+            self.reactor.resume(self.fd)
+        if replay:
+            self._buf += replay
+            self.flush()
+
+    def close(self, flush: bool = True) -> None:
+        """Optionally flush what is left, then ignore further input and acks."""
+        if flush:
+            self.flush(force=True)
+        self._closed = True
+
+    def _on_ack(self, generation: int) -> None:
+        if self._closed or generation != self._generation:
+            return
+        self._inflight = max(0, self._inflight - 1)
+        if self._paused and self._inflight < self.max_inflight:
+            self._paused = False
+            self.reactor.resume(self.fd)
+        if self._buf or self._dropped:
+            self.flush()
@@ -0,0 +1,219 @@
+"""
+Shared selector-based reactor for PTY master file descriptors.
+
+One daemon thread waits on every registered FD and only wakes up when a
+shell actually produced output, a timer is due, or the set of FDs changes,
+instead of running one polling thread per terminal.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import selectors
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+DataCallback = Callable[[bytes], None]
+CloseCallback = Callable[[], None]
+
+READ_SIZE = 65536
+
+
+class TimerHandle:
+    """Returned by `PtyReactor.call_later`; `cancel()` is idempotent."""
+
+    __slots__ = ('when', 'callback', 'cancelled')
+
+    def __init__(self, when: float, callback: Callable[[], None]):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class PtyReactor:
+    """Dispatch reads from many PTY FDs on a single thread.
+
+    `register`/`unregister` may be called from any thread. Changes are handed
+    to the loop thread through a wakeup pipe so the selector is only ever
+    touched by one thread; `unregister` blocks until the loop has dropped the
+    FD, so the caller can safely close it afterwards.
+    """
+
+    def __init__(self, read_size: int = READ_SIZE):
+        self.read_size = read_size
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, int, Optional[tuple], threading.Event]] = []
+        self._handlers: Dict[int, Tuple[DataCallback, CloseCallback]] = {}
+        self._paused: set = set()
+        self._timers: List[Tuple[float, int, TimerHandle]] = []
+        self._timer_seq = itertools.count()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        self._thread: Optional[threading.Thread] = None
+
+    # -- public API -------------------------------------------------------
+
+    def register(self, fd: int, on_data: DataCallback, on_close: CloseCallback) -> None:
+        """Start watching `fd`; `on_close` runs once on EOF or read error."""
+        os.set_blocking(fd, False)
+        self._ensure_running()
+        self._submit('add', fd, (on_data, on_close))
+
+    def unregister(self, fd: int) -> None:
+        """Stop watching `fd`. No callbacks for it run after this returns."""
+        if self._thread is None:
+            return
+        self._submit('remove', fd, None)
+
+    def pause(self, fd: int) -> None:
+        """Stop reading `fd` (the kernel buffer then throttles the shell)."""
+        self._submit('pause', fd, None)
+
+    def resume(self, fd: int) -> None:
+        self._submit('resume', fd, None)
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> TimerHandle:
+        """Run `callback` on the loop thread after `delay` seconds."""
+        self._ensure_running()
+        handle = TimerHandle(time.monotonic() + delay, callback)
+        with self._lock:
+            heapq.heappush(self._timers, (handle.when, next(self._timer_seq), handle))
+        if threading.current_thread() is not self._thread:
+            self._wake()
+        return handle
+
+    def call_soon(self, callback: Callable[[], None]) -> TimerHandle:
+        return self.call_later(0, callback)
+
+    def session_count(self) -> int:
+        return len(self._handlers)
+
+    # -- loop internals ---------------------------------------------------
+
+    def _ensure_running(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='pty-reactor', daemon=True)
+                self._thread.start()
+
+    def _submit(self, op: str, fd: int, handlers: Optional[tuple]) -> None:
+        done = threading.Event()
+        if threading.current_thread() is self._thread:
+            self._apply(op, fd, handlers)
+            return
+        with self._lock:
+            self._pending.append((op, fd, handlers, done))
+        self._wake()
+        done.wait()
+
+    def _wake(self) -> None:
+        try:
+            os.write(self._wake_w, b'\0')
+        except BlockingIOError:
+            pass  # a wakeup is already pending
+
+    def _apply(self, op: str, fd: int, handlers: Optional[tuple]) -> None:
+        if op == 'add':
+            self._handlers[fd] = handlers
+            self._selector.register(fd, selectors.EVENT_READ)
+            return
+        if fd not in self._handlers:
+            return
+        if op == 'remove':
+            del self._handlers[fd]
+            if fd in self._paused:
+                self._paused.discard(fd)
+            else:
+                self._selector.unregister(fd)
+        elif op == 'pause' and fd not in self._paused:
+            self._paused.add(fd)
+            self._selector.unregister(fd)
+        elif op == 'resume' and fd in self._paused:
+            self._paused.discard(fd)
+            self._selector.register(fd, selectors.EVENT_READ)
+
+    def _drain_pending(self) -> None:
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for op, fd, handlers, done in pending:
+            try:
+                self._apply(op, fd, handlers)
+            finally:
+                done.set()
+
+    def _next_timeout(self) -> Optional[float]:
+        with self._lock:
+            while self._timers and self._timers[0][2].cancelled:
+                heapq.heappop(self._timers)
+            if not self._timers:
+                return None
+            return max(0.0, self._timers[0][0] - time.monotonic())
+
+    def _run_timers(self) -> None:
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._timers and self._timers[0][0] <= now:
+                due.append(heapq.heappop(self._timers)[2])
+        for handle in due:
+            if not handle.cancelled:
+                self._dispatch(handle.callback)
+
+    def _run(self) -> None:
+        while True:
+            events = self._selector.select(self._next_timeout())
+            self._run_timers()
+            for key, _ in events:
+                fd = key.fd
+                if fd == self._wake_r:
+                    self._drain_pending()
+                    continue
+                handlers = self._handlers.get(fd)
+                if handlers is None or fd in self._paused:
+                    continue
+                on_data, on_close = handlers
+                try:
+                    data = os.read(fd, self.read_size)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    data = b''
+                if data:
+                    self._dispatch(on_data, data)
+                    continue
+                self._apply('remove', fd, None)
+                self._dispatch(on_close)
+
+    @staticmethod
+    def _dispatch(callback: Callable, *args) -> None:
+        # One misbehaving session must not take the shared loop down.
+        try:
+            callback(*args)
+        except Exception:
+            pass
+
+
+_reactor: Optional[PtyReactor] = None
+_reactor_lock = threading.Lock()
+
+
+def get_reactor() -> PtyReactor:
+    """Return the process-wide reactor, creating it on first use."""
+    global _reactor
+    with _reactor_lock:
+        if _reactor is None:
+            _reactor = PtyReactor()
+        return _reactor
@@ -0,0 +1,54 @@
+"""
+Fixed-capacity byte ring buffer holding the most recent output of a terminal.
+"""
+from __future__ import annotations
+
+
+class ScrollbackBuffer:
+    """Keep the last `capacity` bytes written; memory never exceeds `capacity`.
+
+    Storage grows on demand until it reaches `capacity` and is then reused in
+    place, so idle sessions with little output stay small.
+    """
+
+    __slots__ = ('capacity', 'total_written', '_buf', '_pos')
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError('capacity must be positive')
+        self.capacity = capacity
+        self.total_written = 0
+        self._buf = bytearray()
+        self._pos = 0  # offset of the oldest byte once the buffer is full
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._buf)
+
+    def write(self, data: bytes) -> None:
+        self.total_written += len(data)
+        cap = self.capacity
+        if len(data) >= cap:
+            self._buf[:] = data[-cap:]
+            self._pos = 0
+            return
+        if len(self._buf) < cap:
+            room = cap - len(self._buf)
+            self._buf += data[:room]
+            data = data[room:]
+            if not data:
+                return
+        end = self._pos + len(data)
+        if end <= cap:
+            self._buf[self._pos:end] = data
+        else:
+            split = cap - self._pos
+            self._buf[self._pos:] = data[:split]
+            self._buf[:end - cap] = data[split:]
+        self._pos = end % cap
+
+    def tail(self) -> bytes:
+        """Return the buffered bytes, oldest first."""
+        if self._pos == 0:
+            return bytes(self._buf)
+        return bytes(self._buf[self._pos:]) + bytes(self._buf[:self._pos])
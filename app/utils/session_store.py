@@ -0,0 +1,216 @@
+"""
+Server-side Flask sessions in SQLite with a per-process LRU front cache.
+
+Plugs into Flask-Session as SESSION_TYPE="sqlite" (see `init_session`).
+Session rows (pickled dict + expiry) live in one SQLite database in WAL
+mode, SESSION_SQLITE_PATH, so several worker processes can share it; each
+process keeps the most recently used SESSION_CACHE_SIZE rows in memory, so
+the usual authenticated request or Socket.IO connect is a dictionary lookup
+instead of opening and unpickling a file.
+
+The front cache stays coherent across processes through SQLite's
+`PRAGMA data_version`, which changes whenever another connection commits:
+when it has moved since the last request the cache is dropped and rows are
+read again. Writes happen only when the session was modified (login,
+logout, ...) or when a session is past half its lifetime and its expiry
+needs refreshing; the cookie is re-sent only in those cases (and on a
+refresh only for permanent sessions, whose cookie carries the expiry).
+Expired rows are purged at most once every SESSION_PURGE_INTERVAL seconds.
+"""
+from __future__ import annotations
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from flask_session.sessions import ServerSideSession, SessionInterface
+from itsdangerous import BadSignature, want_bytes
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    sid TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    expiry REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions(expiry);
+"""
+
+
+class SqliteSession(ServerSideSession):
+    pass
+
+
+class SqliteSessionInterface(SessionInterface):
+    session_class = SqliteSession
+
+    def __init__(self, path: str, cache_size: int = 1024, purge_interval: float = 300.0,
+                 use_signer: bool = False, permanent: bool = True):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.cache_size = cache_size
+        self.purge_interval = purge_interval
+        self.use_signer = use_signer
+        self.permanent = permanent
+        self.has_same_site_capability = hasattr(self, 'get_cookie_samesite')
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10.0)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+        # sid -> (expiry, pickled data); mirrors rows this process has seen
+        self._cache: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._data_version = self._db.execute('PRAGMA data_version').fetchone()[0]
+        self._purge_at = 0.0
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'touches': 0, 'invalidations': 0}
+
+    # -- Flask SessionInterface ------------------------------------------
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(app.session_cookie_name)
+        if sid and self.use_signer:
+            signer = self._get_signer(app)
+            if signer is None:
+                return None
+            try:
+                sid = signer.unsign(sid).decode()
+            except BadSignature:
+                sid = None
+        row = self._load(sid) if sid else None
+        if row is None:
+            # Unknown ids are not adopted, a client cannot pick its session id
+            return self.session_class(sid=self._generate_sid(), permanent=self.permanent)
+        session = self.session_class(pickle.loads(row[1]), sid=sid)
+        session.expiry = row[0]
+        return session
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified:
+                self._delete(session.sid)
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        stored_expiry = getattr(session, 'expiry', None)
+        if session.modified or stored_expiry is None:
+            self._store(session.sid, pickle.dumps(dict(session), pickle.HIGHEST_PROTOCOL), now + lifetime)
+        elif stored_expiry - now < lifetime / 2:
+            # Sliding expiry, as the filesystem backend had, but one write per half lifetime
+            self._touch(session.sid, now + lifetime)
+            if not (session.permanent and self.should_set_cookie(app, session)):
+                return
+        else:
+            return
+
+        conditional_cookie_kwargs = {}
+        if self.has_same_site_capability:
+            conditional_cookie_kwargs['samesite'] = self.get_cookie_samesite(app)
+        if self.use_signer:
+            session_id = self._get_signer(app).sign(want_bytes(session.sid))
+        else:
+            session_id = session.sid
+        response.set_cookie(app.session_cookie_name, session_id,
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                            secure=self.get_cookie_secure(app), **conditional_cookie_kwargs)
+
+    # -- store ------------------------------------------------------------
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, cached=len(self._cache))
+
+    def _sync_locked(self) -> None:
+        version = self._db.execute('PRAGMA data_version').fetchone()[0]
+        if version != self._data_version:
+            # Another process committed; any cached row may be stale
+            self._data_version = version
+            self._cache.clear()
+            self._stats['invalidations'] += 1
+
+    def _remember_locked(self, sid: str, expiry: float, data: bytes) -> None:
+        self._cache[sid] = (expiry, data)
+        self._cache.move_to_end(sid)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _load(self, sid: str) -> Optional[Tuple[float, bytes]]:
+        now = time.time()
+        with self._lock:
+            self._sync_locked()
+            row = self._cache.get(sid)
+            if row is not None:
+                self._cache.move_to_end(sid)
+                self._stats['hits'] += 1
+            else:
+                self._stats['misses'] += 1
+                row = self._db.execute('SELECT expiry, data FROM sessions WHERE sid = ?', (sid,)).fetchone()
+                if row is None:
+                    return None
+                row = (row[0], bytes(row[1]))
+                self._remember_locked(sid, *row)
+            if row[0] <= now:
+                del self._cache[sid]
+                return None
+            return row
+
+    def _store(self, sid: str, data: bytes, expiry: float) -> None:
+        with self._lock:
+            self._sync_locked()
+            self._db.execute('INSERT OR REPLACE INTO sessions (sid, data, expiry) VALUES (?, ?, ?)',
+                             (sid, data, expiry))
+            self._remember_locked(sid, expiry, data)
+            self._stats['writes'] += 1
+            self._purge_locked()
+
+    def _touch(self, sid: str, expiry: float) -> None:
+        with self._lock:
+            self._sync_locked()
+            self._db.execute('UPDATE sessions SET expiry = ? WHERE sid = ?', (expiry, sid))
+            row = self._cache.get(sid)
+            if row is not None:
+                self._cache[sid] = (expiry, row[1])
+            self._stats['touches'] += 1
+            self._purge_locked()
+
+    def _delete(self, sid: str) -> None:
+        with self._lock:
+            self._sync_locked()
+            self._db.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+            self._cache.pop(sid, None)
+
+    def _purge_locked(self) -> None:
+        now = time.time()
+        if now < self._purge_at:
+            return
+        self._purge_at = now + self.purge_interval
+        self._db.execute('DELETE FROM sessions WHERE expiry <= ?', (now,))
+        for sid in [s for s, (expiry, _) in self._cache.items() if expiry <= now]:
+            del self._cache[sid]
+
+
+def init_session(app) -> None:
+    """Install the SQLite session interface when SESSION_TYPE is "sqlite".
+
+    Call after `Session.init_app`; other session types are left to Flask-Session.
+    """
+    config = app.config
+    if config.get('SESSION_TYPE') != 'sqlite':
+        return
+    default_path = os.path.join(config.get('SESSION_FILE_DIR') or os.path.join(os.getcwd(), 'flask_session'),
+                                'sessions.sqlite3')
+    app.session_interface = SqliteSessionInterface(
+        config.get('SESSION_SQLITE_PATH') or os.environ.get('SESSION_SQLITE_PATH', default_path),
+        cache_size=int(config.get('SESSION_CACHE_SIZE') or os.environ.get('SESSION_CACHE_SIZE', '1024')),
+        purge_interval=float(config.get('SESSION_PURGE_INTERVAL') or os.environ.get('SESSION_PURGE_INTERVAL', '300')),
+        use_signer=config.get('SESSION_USE_SIGNER', False),
+        permanent=config.get('SESSION_PERMANENT', True),
+    )
@@ -0,0 +1,234 @@
+"""
+Pre-forked pool of warm PTY + bash pairs served by a small spawner process.
+
+`start_pool` forks the spawner early in `create_app`, while the web process
+is still small. The spawner keeps `size` shells already started and hands a
+shell's PTY master FD and a pidfd for it to the web process over a UNIX
+socket (SCM_RIGHTS) whenever a terminal is opened. Replacements are started
+only while no request is waiting, so a burst of terminals is served from
+the pool (or by forking on demand once it is empty) before any refill. The
+Socket.IO handler therefore never forks the (large) server process.
+
+Warm shells stay children of the spawner, which reaps them; the web process
+signals them through the pidfd, never a bare pid that may have been reused.
+
+If the pool is disabled or the spawner has gone away, `acquire_shell` falls
+back to forking in-process.
+"""
+from __future__ import annotations
+
+import collections
+import os
+import select
+import signal
+import socket
+import struct
+import threading
+import time
+from typing import Any, Deque, Dict, Optional, Tuple
+
+_PID = struct.Struct('!i')
+# How often an idle spawner wakes up to reap exited shells
+_REAP_INTERVAL = 1.0
+
+
+def spawn_shell() -> Tuple[int, int]:
+    """Fork `/bin/bash` on a fresh PTY and return (master_fd, pid)."""
+    master_fd, slave_fd = os.openpty()
+
+    pid = os.fork()
+    if pid == 0:
+        # child
+        os.setsid()
+        os.dup2(slave_fd, 0)
+        os.dup2(slave_fd, 1)
+        os.dup2(slave_fd, 2)
+        try:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            os.execv('/bin/bash', ['/bin/bash'])
+        except Exception:
+            os._exit(1)
+    os.close(slave_fd)
+    return master_fd, pid
+
+
+class Shell:
+    """A started shell: its PTY master FD and a pidfd to signal it by."""
+
+    def __init__(self, master_fd: int, pid: int, pidfd: int, warm: bool):
+        self.master_fd = master_fd
+        self.pid = pid
+        self.pidfd = pidfd
+        self.warm = warm
+
+    def hangup(self) -> None:
+        """Send SIGHUP and release the pidfd; in-process shells are also reaped."""
+        try:
+            signal.pidfd_send_signal(self.pidfd, signal.SIGHUP)
+        except OSError:
+            pass  # already exited
+        os.close(self.pidfd)
+        if not self.warm:
+            # Our own child: wait for it off the caller's thread so it does not linger as a zombie
+            threading.Thread(target=_reap, args=(self.pid,), daemon=True).start()
+
+
+def _reap(pid: int) -> None:
+    try:
+        os.waitpid(pid, 0)
+    except ChildProcessError:
+        pass
+
+
+def _spawn_warm() -> Tuple[int, int, int]:
+    master_fd, pid = spawn_shell()
+    return master_fd, pid, os.pidfd_open(pid)
+
+
+def _reap_children(pool: Deque[Tuple[int, int, int]]) -> None:
+    # Collect every exited shell, handed out or not, and drop dead ones from the pool
+    exited = set()
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            break
+        exited.add(pid)
+    for shell in [shell for shell in pool if shell[1] in exited]:
+        pool.remove(shell)
+        os.close(shell[0])
+        os.close(shell[2])
+
+
+def _spawner_main(sock: socket.socket, size: int) -> None:
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    pool: Deque[Tuple[int, int, int]] = collections.deque(_spawn_warm() for _ in range(size))
+    try:
+        while True:
+            # Refill one shell at a time, and only while nobody is waiting for one
+            idle = len(pool) >= size
+            ready, _, _ = select.select([sock], [], [], _REAP_INTERVAL if idle else 0)
+            _reap_children(pool)
+            if not ready:
+                if not idle:
+                    pool.append(_spawn_warm())
+                continue
+            request = sock.recv(1)
+            if not request:
+                break  # web process is gone
+            master_fd, pid, pidfd = pool.popleft() if pool else _spawn_warm()
+            socket.send_fds(sock, [_PID.pack(pid)], [master_fd, pidfd])
+            os.close(master_fd)
+            os.close(pidfd)
+    finally:
+        for master_fd, pid, pidfd in pool:
+            try:
+                signal.pidfd_send_signal(pidfd, signal.SIGHUP)
+            except OSError:
+                pass
+        os._exit(0)
+
+
+class ShellPool:
+    """Web-process side of the spawner connection."""
+
+    def __init__(self, size: int):
+        self.size = size
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        pid = os.fork()
+        if pid == 0:
+            parent_sock.close()
+            _spawner_main(child_sock, size)
+        child_sock.close()
+        self.spawner_pid = pid
+        self._sock = parent_sock
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Tuple[int, int, int]:
+        """Return (master_fd, pid, pidfd) of a warm shell."""
+        with self._lock:
+            self._sock.sendall(b'G')
+            msg, fds, _, _ = socket.recv_fds(self._sock, _PID.size, 2)
+        if len(msg) != _PID.size or len(fds) != 2:
+            for fd in fds:
+                os.close(fd)
+            raise OSError('shell spawner closed the connection')
+        return fds[0], _PID.unpack(msg)[0], fds[1]
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+_pool: Optional[ShellPool] = None
+_pool_lock = threading.Lock()
+_stats: Dict[str, int] = {'warm': 0, 'cold': 0}
+_first_output_ms: Deque[float] = collections.deque(maxlen=256)
+
+
+def start_pool(size: int) -> None:
+    """Fork the spawner once per process; `size <= 0` disables the pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None and size > 0:
+            _pool = ShellPool(size)
+
+
+def acquire_shell() -> Shell:
+    """Return a started shell; `warm` is False for an in-process fork.
+
+    Raises OSError if no shell could be started.
+    """
+    global _pool
+    pool = _pool
+    if pool is not None:
+        try:
+            master_fd, pid, pidfd = pool.acquire()
+            with _pool_lock:
+                _stats['warm'] += 1
+            return Shell(master_fd, pid, pidfd, True)
+        except OSError:
+            with _pool_lock:
+                dropped = _pool is pool
+                if dropped:
+                    _pool = None
+            if dropped:
+                pool.close()
+                threading.Thread(target=_reap, args=(pool.spawner_pid,), daemon=True).start()
+    master_fd, pid = spawn_shell()
+    try:
+        pidfd = os.pidfd_open(pid)
+    except OSError:
+        # Still our unreaped child, so the pid cannot have been reused
+        os.close(master_fd)
+        os.kill(pid, signal.SIGKILL)
+        _reap(pid)
+        raise
+    with _pool_lock:
+        _stats['cold'] += 1
+    return Shell(master_fd, pid, pidfd, False)
+
+
+def record_first_output(started: float) -> None:
+    """Record time-to-first-prompt for a shell requested at `started` (monotonic)."""
+    _first_output_ms.append((time.monotonic() - started) * 1000.0)
+
+
+def stats() -> Dict[str, Any]:
+    samples = sorted(_first_output_ms)
+    result: Dict[str, Any] = {
+        'pool_size': _pool.size if _pool is not None else 0,
+        'warm_starts': _stats['warm'],
+        'cold_starts': _stats['cold'],
+        'first_output_samples': len(samples),
+    }
+    if samples:
+        result['first_output_ms'] = {
+            'last': round(_first_output_ms[-1], 2),
+            'p50': round(samples[len(samples) // 2], 2),
+            'p95': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+            'max': round(samples[-1], 2),
+        }
+    return result
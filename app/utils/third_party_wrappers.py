@@ -2,44 +2,104 @@
 Wrappers for SendGrid, Twilio and placeholder methods for social posting.
 
 Store API keys in environment variables and keep this file small and focused.
+Provider clients are shared and pooled, see `app.utils.providers`.
 """
 from __future__ import annotations
 
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List
 
+from app.utils.mail_attachments import StreamingMailBody
+from app.utils.providers import get_sendgrid, get_twilio
+
+# SendGrid accepts at most 1000 personalizations per mail/send request
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+BULK_MAX_RECIPIENTS = int(os.environ.get('MESSAGING_BULK_MAX_RECIPIENTS', '10000'))
 
-def send_email_sendgrid(to: str, subject: str, html_content: str) -> Dict[str, Any]:
-    try:
-        from sendgrid import SendGridAPIClient
-        from sendgrid.helpers.mail import Mail
-    except Exception as e:
-        raise RuntimeError('sendgrid package not installed') from e
 
-    api_key = os.environ.get('SENDGRID_API_KEY') or 'PASTE_YOUR_SENDGRID_KEY'
+def send_email_sendgrid(to: str, subject: str, html_content: str) -> Dict[str, Any]:
     from_addr = os.environ.get('EMAIL_FROM', 'noreply@example.com')
+    return get_sendgrid().send({
+        'personalizations': [{'to': [{'email': to}]}],
+        'from': {'email': from_addr},
+        'subject': subject,
+        'content': [{'type': 'text/html', 'value': html_content}],
+    })
 
-    message = Mail(from_email=from_addr, to_emails=to, subject=subject, html_content=html_content)
-    sg = SendGridAPIClient(api_key)
-    resp = sg.send(message)
-    return {'status_code': resp.status_code}
 
+def send_email_with_attachments_sendgrid(to: str, subject: str, html_content: str,
+                                         attachments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Send an email with file attachments ({"path", "filename", "type"}).
 
-def send_sms_twilio(to: str, body: str) -> Dict[str, Any]:
-    try:
-        from twilio.rest import Client
-    except Exception as e:
-        raise RuntimeError('twilio package not installed') from e
+    The request body is streamed, base64-encoding each file block by block,
+    so memory use does not grow with attachment size.
+    """
+    from_addr = os.environ.get('EMAIL_FROM', 'noreply@example.com')
+    return get_sendgrid().send(StreamingMailBody({
+        'personalizations': [{'to': [{'email': to}]}],
+        'from': {'email': from_addr},
+        'subject': subject,
+        'content': [{'type': 'text/html', 'value': html_content}],
+    }, attachments))
 
-    account_sid = os.environ.get('TWILIO_ACCOUNT_SID', 'PASTE_SID')
-    auth_token = os.environ.get('TWILIO_AUTH_TOKEN', 'PASTE_TOKEN')
-    from_number = os.environ.get('TWILIO_FROM_NUMBER', '')
 
-    client = Client(account_sid, auth_token)
-    msg = client.messages.create(body=body, from_=from_number, to=to)
+def send_sms_twilio(to: str, body: str) -> Dict[str, Any]:
+    from_number = os.environ.get('TWILIO_FROM_NUMBER', '')
+    msg = get_twilio().messages.create(body=body, from_=from_number, to=to)
     return {'sid': msg.sid, 'status': msg.status}
 
 
+def _substitute(text: str, substitutions: Dict[str, Any]) -> str:
+    for key, value in substitutions.items():
+        text = text.replace(f'-{key}-', str(value))
+    return text
+
+
+def send_bulk_email_sendgrid(recipients: List[Dict[str, Any]], subject: str,
+                             html_content: str) -> Dict[str, Any]:
+    """Send one message to up to 1000 recipients in a single request.
+
+    `recipients` is a list of {"to": addr, "substitutions": {"name": ..}};
+    `-name-` tags in the subject and content are replaced per recipient by
+    SendGrid.
+    """
+    from_addr = os.environ.get('EMAIL_FROM', 'noreply@example.com')
+    return get_sendgrid().send({
+        'from': {'email': from_addr},
+        'subject': subject,
+        'content': [{'type': 'text/html', 'value': html_content}],
+        'personalizations': [
+            {'to': [{'email': r['to']}],
+             'substitutions': {f'-{k}-': str(v) for k, v in (r.get('substitutions') or {}).items()}}
+            for r in recipients
+        ],
+    })
+
+
+def bulk_email_payloads(recipients: List[Dict[str, Any]], subject: str,
+                        html_content: str) -> List[Dict[str, Any]]:
+    """One `bulk_email` message-queue payload per batch of 1000 personalizations.
+
+    Each batch is one SendGrid request and goes through the message queue,
+    so the SendGrid token bucket, retries and 429 pauses apply to it.
+    """
+    payloads = []
+    for start in range(0, len(recipients), SENDGRID_MAX_PERSONALIZATIONS):
+        batch = recipients[start:start + SENDGRID_MAX_PERSONALIZATIONS]
+        payloads.append({'to': [r['to'] for r in batch], 'recipients': batch, 'subject': subject,
+                         'content': html_content, 'batch': start // SENDGRID_MAX_PERSONALIZATIONS})
+    return payloads
+
+
+def bulk_sms_payloads(recipients: List[Dict[str, Any]], body: str) -> List[Dict[str, Any]]:
+    """One `sms` message-queue payload per recipient, with its `-key-` substitutions applied.
+
+    Bulk SMS goes through the message queue like single sends, so the Twilio
+    token bucket (MESSAGING_TWILIO_RATE), retries and 429 pauses apply.
+    """
+    return [{'to': r['to'], 'body': _substitute(body, r.get('substitutions') or {})} for r in recipients]
+
+
 def placeholder_post_x(text: str) -> Dict[str, Any]:
     # Implement OAuth flow and use Twitter/X API
     return {'status': 'not_implemented'}
@@ -0,0 +1,288 @@
+"""
+Streaming and resumable media uploads.
+
+Uploaded bytes are written straight to a `.part` file on the same
+filesystem as their final location while being hashed (SHA-256), then
+handed to a `commit` callback (by default a rename into place; the routes
+use app.utils.media_store), so nothing is spooled to a temp file and copied
+again. The size limit (UPLOAD_MAX_BYTES) is enforced as the bytes arrive.
+
+Resumable uploads are created with a declared size and filled with
+sequential chunks at explicit offsets. Their state lives in a JSON sidecar
+under `<upload dir>/.partial/`, so an upload interrupted by a dropped
+connection, or a server restart, continues from the last byte on disk.
+Chunks for one upload are serialised across threads and worker processes
+by a lock stripe: a thread lock plus an `flock` on `.partial/<stripe>.lock`.
+"""
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterator, List, Optional
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import FormDataParser
+from werkzeug.utils import secure_filename
+
+MAX_UPLOAD_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(4 * 1024 ** 3)))
+CHUNK_SIZE = 1024 * 1024
+# Suggested client chunk size for resumable uploads (one request per chunk)
+RESUMABLE_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+PARTIAL_TTL = float(os.environ.get('UPLOAD_PARTIAL_TTL', str(24 * 3600)))
+
+# Fixed set of locks shared by hash of the upload id, so unknown ids cost nothing
+_LOCK_STRIPES = 64
+_lock_stripes = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+# upload id -> (sha256 object, bytes hashed); rebuilt from disk after a restart
+_hashers: Dict[str, Any] = {}
+
+# (finished .part file, client filename, sha256 hex, size) -> description of the stored upload
+Commit = Callable[[Path, Optional[str], str, int], Dict[str, Any]]
+
+
+def final_name(filename: Optional[str]) -> str:
+    timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+    return f"upload_{timestamp}_{secure_filename(filename or '') or 'file'}"
+
+
+class HashingWriter:
+    """Write-through file that hashes and counts bytes, refusing to grow past `limit`."""
+
+    def __init__(self, path: Path, limit: int, mode: str = 'wb', hasher=None, written: int = 0,
+                 filename: Optional[str] = None):
+        self.path = path
+        self.filename = filename
+        self.limit = limit
+        self.hasher = hasher or hashlib.sha256()
+        self.written = written
+        self._file: IO[bytes] = open(path, mode)
+
+    def write(self, data: bytes) -> int:
+        if self.written + len(data) > self.limit:
+            raise RequestEntityTooLarge(f'upload exceeds {self.limit} bytes')
+        self._file.write(data)
+        self.hasher.update(data)
+        self.written += len(data)
+        return len(data)
+
+    # FormDataParser rewinds file containers once a part is complete
+    def seek(self, *args) -> int:
+        return 0
+
+    def close(self) -> None:
+        self._file.close()
+
+    def discard(self) -> None:
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+
+def rename_into(save_dir: Path) -> Commit:
+    """Commit that renames the finished file to `save_dir/upload_<timestamp>_<name>`."""
+    def commit(part: Path, filename: Optional[str], sha256: str, size: int) -> Dict[str, Any]:
+        name = final_name(filename)
+        dest = save_dir / name
+        os.replace(part, dest)
+        return {'path': str(dest), 'filename': name, 'size': size, 'sha256': sha256}
+    return commit
+
+
+def stream_to_disk(stream: IO[bytes], save_dir: Path, filename: Optional[str],
+                   limit: int = MAX_UPLOAD_BYTES, commit: Optional[Commit] = None) -> Dict[str, Any]:
+    """Copy a raw request body into `save_dir` in CHUNK_SIZE blocks."""
+    save_dir.mkdir(parents=True, exist_ok=True)
+    writer = HashingWriter(save_dir / f'.{uuid.uuid4().hex}.part', limit)
+    try:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+    except BaseException:
+        writer.discard()
+        raise
+    writer.close()
+    return (commit or rename_into(save_dir))(writer.path, filename, writer.hasher.hexdigest(), writer.written)
+
+
+def parse_multipart_to_disk(stream: IO[bytes], mimetype: str, content_length: Optional[int],
+                            options: Dict[str, str], save_dir: Path, field: str = 'file',
+                            limit: int = MAX_UPLOAD_BYTES, commit: Optional[Commit] = None
+                            ) -> Optional[Dict[str, Any]]:
+    """Parse a multipart body, writing file parts directly into `save_dir`.
+
+    Returns the saved `field` upload, or None if the body had no such part.
+    """
+    save_dir.mkdir(parents=True, exist_ok=True)
+    writers: List[HashingWriter] = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        writer = HashingWriter(save_dir / f'.{uuid.uuid4().hex}.part', limit, filename=filename)
+        writers.append(writer)
+        return writer
+
+    parser = FormDataParser(stream_factory=stream_factory, max_form_memory_size=1024 * 1024, silent=False)
+    try:
+        _, _, files = parser.parse(stream, mimetype, content_length, options)
+    except BaseException:
+        for writer in writers:
+            writer.discard()
+        raise
+    for writer in writers:
+        writer.close()
+    result = None
+    try:
+        for key, storage in files.items(multi=True):
+            writer = storage.stream
+            if key == field and result is None:
+                result = (commit or rename_into(save_dir))(
+                    writer.path, writer.filename, writer.hasher.hexdigest(), writer.written
+                )
+    finally:
+        for writer in writers:
+            writer.path.unlink(missing_ok=True)  # extra parts, or the part if commit failed
+    return result
+
+
+# -- resumable uploads ----------------------------------------------------------
+
+
+def _partial_dir(save_dir: Path) -> Path:
+    path = save_dir / '.partial'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+@contextlib.contextmanager
+def _lock_for(save_dir: Path, upload_id: str) -> Iterator[None]:
+    # hash() of a str differs between processes, so the stripe comes from a stable digest
+    stripe = int.from_bytes(hashlib.blake2b(upload_id.encode(), digest_size=2).digest(), 'big') % _LOCK_STRIPES
+    with _lock_stripes[stripe]:
+        with open(_partial_dir(save_dir) / f'{stripe}.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+
+def _load(save_dir: Path, upload_id: str) -> Optional[Dict[str, Any]]:
+    if not upload_id.isalnum():
+        return None
+    try:
+        with open(_partial_dir(save_dir) / f'{upload_id}.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _store(save_dir: Path, state: Dict[str, Any]) -> None:
+    path = _partial_dir(save_dir) / f"{state['id']}.json"
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _expire_partials(save_dir: Path) -> None:
+    cutoff = time.time() - PARTIAL_TTL
+    for meta in _partial_dir(save_dir).glob('*.json'):
+        try:
+            if meta.stat().st_mtime < cutoff:
+                meta.with_suffix('.part').unlink(missing_ok=True)
+                meta.unlink(missing_ok=True)
+                _hashers.pop(meta.stem, None)
+        except OSError:
+            pass
+
+
+def create_resumable(save_dir: Path, filename: Optional[str], size: int,
+                     limit: int = MAX_UPLOAD_BYTES) -> Dict[str, Any]:
+    if size < 0 or size > limit:
+        raise RequestEntityTooLarge(f'upload size must be between 0 and {limit} bytes')
+    _expire_partials(save_dir)
+    state = {'id': uuid.uuid4().hex, 'filename': filename, 'size': size, 'created': time.time()}
+    (_partial_dir(save_dir) / f"{state['id']}.part").touch()
+    _store(save_dir, state)
+    return resumable_status(save_dir, state['id'])
+
+
+def resumable_status(save_dir: Path, upload_id: str) -> Optional[Dict[str, Any]]:
+    state = _load(save_dir, upload_id)
+    if state is None:
+        return None
+    part = _partial_dir(save_dir) / f'{upload_id}.part'
+    offset = part.stat().st_size if part.exists() else 0
+    return {'upload_id': upload_id, 'filename': state['filename'], 'size': state['size'],
+            'offset': offset, 'chunk_size': RESUMABLE_CHUNK_SIZE}
+
+
+class OffsetMismatch(Exception):
+    def __init__(self, offset: int):
+        super().__init__(f'expected offset {offset}')
+        self.offset = offset
+
+
+def append_chunk(save_dir: Path, upload_id: str, offset: int, stream: IO[bytes],
+                 commit: Optional[Commit] = None) -> Optional[Dict[str, Any]]:
+    """Append the body of one chunk request at `offset`.
+
+    Returns the new status, with the final file's details once the declared
+    size is reached; None for an unknown upload. Raises OffsetMismatch if
+    `offset` is not the current end of the data (client must re-sync), and
+    RequestEntityTooLarge if the chunk runs past the declared size.
+    """
+    with _lock_for(save_dir, upload_id):
+        state = _load(save_dir, upload_id)
+        if state is None:
+            return None
+        part = _partial_dir(save_dir) / f'{upload_id}.part'
+        current = part.stat().st_size
+        if offset != current:
+            raise OffsetMismatch(current)
+        hasher, hashed = _hashers.get(upload_id, (None, 0))
+        if hasher is None or hashed != current:
+            # After a restart (or a failed chunk) rebuild the digest from disk
+            hasher = hashlib.sha256()
+            with open(part, 'rb') as f:
+                for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    hasher.update(block)
+        writer = HashingWriter(part, state['size'], mode='ab', hasher=hasher, written=current)
+        try:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(chunk)
+        finally:
+            writer.close()
+            _hashers[upload_id] = (writer.hasher, writer.written)
+        status = resumable_status(save_dir, upload_id)
+        if writer.written < state['size']:
+            _store(save_dir, state)  # bump mtime so active uploads don't expire
+            return status
+        # Complete: move the data into place and forget the upload
+        _hashers.pop(upload_id, None)
+        try:
+            result = (commit or rename_into(save_dir))(part, state['filename'], writer.hasher.hexdigest(),
+                                                       writer.written)
+        finally:
+            # The commit consumed the data (or discarded it on failure)
+            part.unlink(missing_ok=True)
+            (_partial_dir(save_dir) / f'{upload_id}.json').unlink(missing_ok=True)
+        return dict(status, complete=True, **result)
+
+
+def abort_resumable(save_dir: Path, upload_id: str) -> bool:
+    with _lock_for(save_dir, upload_id):
+        if _load(save_dir, upload_id) is None:
+            return False
+        (_partial_dir(save_dir) / f'{upload_id}.part').unlink(missing_ok=True)
+        (_partial_dir(save_dir) / f'{upload_id}.json').unlink(missing_ok=True)
+        _hashers.pop(upload_id, None)
+    return True
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Latency of POST /api/aws/cloudwatch_logs: new boto3 client per request vs cached client.
+
+Runs the Flask app in-process against scripts/fake_aws_endpoint.py, so no AWS
+account is needed. --latency-ms adds per-call endpoint latency.
+
+    python scripts/bench_aws_client.py --requests 200
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from fake_aws_endpoint import FakeAwsEndpoint  # noqa: E402
+
+
+def _time_requests(client, n: int):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        resp = client.post('/api/aws/cloudwatch_logs', json={'log_group': '/fake/app', 'last_minutes': 60})
+        samples.append((time.perf_counter() - start) * 1000.0)
+        assert resp.status_code == 200, resp.data
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.95)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    endpoint = FakeAwsEndpoint(log_events=100, latency=args.latency_ms / 1000.0).start()
+    os.environ.update(AWS_ENDPOINT_URL=endpoint.url, AWS_DEFAULT_REGION='us-east-1',
+                      AWS_ACCESS_KEY_ID='testing', AWS_SECRET_ACCESS_KEY='testing')
+
+    import boto3
+    from app import create_app
+    from app.routes import aws_api
+
+    tmp = tempfile.mkdtemp()
+    app = create_app({'SESSION_FILE_DIR': tmp, 'TERMINAL_SHELL_POOL_SIZE': '0'})
+    client = app.test_client()
+    client.post('/login', data={'username': 'FINITQ', 'password': 'INFINITQ'})
+
+    cached = aws_api.get_aws_client
+    aws_api.get_aws_client = lambda service: boto3.client(service, endpoint_url=endpoint.url)
+    _time_requests(client, 1)
+    per_request = _time_requests(client, args.requests)
+    aws_api.get_aws_client = cached
+    _time_requests(client, 1)
+    shared = _time_requests(client, args.requests)
+    endpoint.stop()
+
+    print(f"{args.requests} requests, {args.latency_ms:.1f} ms endpoint latency")
+    print(f"{'client':<12} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, (p50, p95) in (('per-request', per_request), ('cached', shared)):
+        print(f"{name:<12} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Latency of GET /api/docker/containers: new client per request vs shared client.
+
+Runs the Flask app in-process against scripts/fake_docker_daemon.py, so no
+Docker daemon is needed. --latency-ms adds per-call daemon latency.
+
+    python scripts/bench_docker_client.py --requests 200 --containers 20
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from fake_docker_daemon import FakeDockerDaemon  # noqa: E402
+
+
+def _time_requests(client, n: int):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        resp = client.get('/api/docker/containers')
+        samples.append((time.perf_counter() - start) * 1000.0)
+        assert resp.status_code == 200, resp.data
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.95)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--containers', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    sock = os.path.join(tmp, 'docker.sock')
+    daemon = FakeDockerDaemon(sock, args.containers, args.latency_ms / 1000.0).start()
+    os.environ['DOCKER_HOST'] = f'unix://{sock}'
+
+    import docker
+    from app import create_app
+    from app.routes import docker_api
+
+    app = create_app({'SESSION_FILE_DIR': tmp, 'TERMINAL_SHELL_POOL_SIZE': '0'})
+    client = app.test_client()
+    client.post('/login', data={'username': 'FINITQ', 'password': 'INFINITQ'})
+
+    shared = docker_api.get_client
+    docker_api.get_client = lambda: docker.from_env()
+    client.get('/api/docker/containers')
+    per_request = _time_requests(client, args.requests)
+    docker_api.get_client = shared
+    client.get('/api/docker/containers')
+    pooled = _time_requests(client, args.requests)
+    daemon.stop()
+
+    print(f"{args.requests} requests, {args.containers} containers, {args.latency_ms:.1f} ms daemon latency")
+    print(f"{'client':<12} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, (p50, p95) in (('per-request', per_request), ('shared', pooled)):
+        print(f"{name:<12} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Payload size and daemon round trips of GET /api/docker/inspect.
+
+Compares full uncached documents (the old behaviour, one daemon call per
+request) with a field projection served from the inspect cache, against
+scripts/fake_docker_daemon.py.
+
+    python scripts/bench_docker_inspect.py --requests 200 --containers 10
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from fake_docker_daemon import FakeDockerDaemon  # noqa: E402
+
+FIELDS = 'State.Status,NetworkSettings.IPAddress,Config.Image'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--containers', type=int, default=10)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    sock = os.path.join(tmp, 'docker.sock')
+    daemon = FakeDockerDaemon(sock, args.containers).start()
+    os.environ['DOCKER_HOST'] = f'unix://{sock}'
+
+    from app import create_app
+    from app.utils import docker_inspect
+
+    app = create_app({'SESSION_FILE_DIR': tmp, 'TERMINAL_SHELL_POOL_SIZE': '0'})
+    client = app.test_client()
+    client.post('/login', data={'username': 'FINITQ', 'password': 'INFINITQ'})
+    names = [f'fake-{i % args.containers}' for i in range(args.requests)]
+
+    def run(query: str, uncached: bool):
+        calls = daemon.inspect_calls
+        total = 0
+        start = time.perf_counter()
+        for name in names:
+            if uncached:
+                docker_inspect._cache.invalidate(daemon.find(name)['Id'])
+            resp = client.get(f'/api/docker/inspect?name={name}{query}')
+            total += len(resp.data)
+        elapsed = time.perf_counter() - start
+        return total / len(names), daemon.inspect_calls - calls, elapsed * 1000 / len(names)
+
+    full = run('', uncached=True)
+    projected = run(f'&fields={FIELDS}', uncached=False)
+    daemon.stop()
+
+    print(f"{args.requests} requests over {args.containers} containers")
+    print(f"{'mode':<20} {'bytes/resp':>10} {'daemon calls':>13} {'ms/req':>8}")
+    for label, (size, calls, ms) in (('full, uncached', full), ('projected, cached', projected)):
+        print(f"{label:<20} {size:>10.0f} {calls:>13} {ms:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
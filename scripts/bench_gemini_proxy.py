@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Gemini proxy: upstream calls and latency for N dashboard users sending the same prompt.
+
+Runs against scripts/fake_gemini_server.py. "direct" calls the pooled
+client once per user (what a plain proxy does); "proxy" goes through
+GeminiProxy (single flight + cache). Also reports time to first token when
+streaming vs waiting for the whole response, and the latency of a cache hit.
+
+    python scripts/bench_gemini_proxy.py --users 50 --latency-ms 300 --chunk-delay-ms 30
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from fake_gemini_server import FakeGeminiServer  # noqa: E402
+
+PROMPT = 'Summarise the state of the docker hosts and running EC2 instances for the morning report in two sentences'
+
+
+def _ms(seconds: float) -> str:
+    return f'{seconds * 1000:7.1f} ms'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=300.0)
+    parser.add_argument('--chunk-delay-ms', type=float, default=30.0)
+    args = parser.parse_args()
+
+    server = FakeGeminiServer(latency=args.latency_ms / 1000, chunk_delay=args.chunk_delay_ms / 1000).start()
+    os.environ['GEMINI_API_HOST'] = server.url
+    os.environ.setdefault('PROVIDER_POOL_SIZE', str(args.users))
+    from app.utils.gemini_proxy import GeminiProxy, _request_body, parse_params
+    from app.utils.providers import get_gemini
+
+    params = parse_params({})
+
+    def direct(_):
+        start = time.perf_counter()
+        text = ''.join(c['candidates'][0]['content']['parts'][0]['text']
+                       for c in get_gemini().stream_generate(params['model'], _request_body(PROMPT, params)))
+        return time.perf_counter() - start, text
+
+    proxy = GeminiProxy(max_concurrency=8)
+
+    def proxied(_):
+        start = time.perf_counter()
+        text = proxy.generate(PROMPT, params)['text']
+        return time.perf_counter() - start, text
+
+    for name, fn in (('direct', direct), ('proxy', proxied)):
+        before = server.requests
+        with ThreadPoolExecutor(args.users) as pool:
+            results = list(pool.map(fn, range(args.users)))
+        assert len({text for _, text in results}) == 1
+        times = [t for t, _ in results]
+        print(f'{name:6} {args.users} identical concurrent requests: {server.requests - before:3} upstream calls, '
+              f'p50 {_ms(statistics.median(times))}, max {_ms(max(times))}')
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        proxy.generate(PROMPT, params)
+    print(f'cache hit: {_ms((time.perf_counter() - start) / 1000)} per request')
+
+    start = time.perf_counter()
+    events = proxy.stream(PROMPT + ' (streamed)', params)
+    next(events)
+    first = time.perf_counter() - start
+    for _ in events:
+        pass
+    total = time.perf_counter() - start
+    print(f'streaming: first token after {_ms(first)}, complete after {_ms(total)}')
+    print(f'proxy stats: {proxy.stats()}')
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
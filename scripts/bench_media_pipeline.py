@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Request latency under concurrent photo uploads: thumbnails/previews built inside the request vs on the media process pool.
+
+Serves the app on a threaded Werkzeug server, logs in, then runs
+`--uploaders` threads that each upload `--uploads` large JPEGs while a probe
+thread times a cheap authenticated GET every 20 ms. "inline" runs the same
+processing function in the request thread, which is what the app would do
+without the pool.
+
+    python scripts/bench_media_pipeline.py --uploaders 4 --uploads 5
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests  # noqa: E402
+from PIL import Image  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.utils import media_pipeline  # noqa: E402
+
+
+class _InlinePipeline:
+    """Stand-in that processes inside the calling (request) thread."""
+
+    def submit(self, path):
+        kind = media_pipeline.media_kind(path)
+        if kind:
+            media_pipeline._process(path, kind)
+        return None
+
+    def get(self, job_id):
+        return None
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+
+
+def _run(base: str, photo: bytes, uploaders: int, uploads: int):
+    def session():
+        s = requests.Session()
+        s.post(f'{base}/login', data={'username': 'FINITQ', 'password': 'INFINITQ'},
+               allow_redirects=False)
+        return s
+
+    probes, upload_times = [], []
+    stop = threading.Event()
+
+    def probe():
+        s = session()
+        while not stop.is_set():
+            start = time.perf_counter()
+            s.get(f'{base}/api/js/media_jobs/none')
+            probes.append(time.perf_counter() - start)
+            time.sleep(0.02)
+
+    def upload():
+        s = session()
+        for _ in range(uploads):
+            start = time.perf_counter()
+            resp = s.post(f'{base}/api/js/upload_media', files={'file': ('photo.jpg', photo, 'image/jpeg')})
+            resp.raise_for_status()
+            upload_times.append(time.perf_counter() - start)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    time.sleep(0.5)
+    threads = [threading.Thread(target=upload) for _ in range(uploaders)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stop.set()
+    prober.join()
+    return probes, upload_times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--uploaders', type=int, default=4)
+    parser.add_argument('--uploads', type=int, default=5)
+    parser.add_argument('--megapixels', type=int, default=12)
+    args = parser.parse_args()
+
+    width = int((args.megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    buf = io.BytesIO()
+    Image.effect_mandelbrot((width, height), (-2, -1.5, 1, 1.5), 100).convert('RGB').save(buf, 'JPEG', quality=92)
+    photo = buf.getvalue()
+    print(f'photo: {width}x{height}, {len(photo) / 2 ** 20:.1f} MiB, cpus: {os.cpu_count()}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SESSION_FILE_DIR': tmp})
+        app.root_path = tmp
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_port}'
+
+        pool = media_pipeline.get_media_pipeline()
+        # Warm the worker processes so their startup isn't counted
+        warm = os.path.join(tmp, 'warm.jpg')
+        with open(warm, 'wb') as f:
+            f.write(photo)
+        job = pool.submit(warm)
+        while job.finished is None:
+            time.sleep(0.05)
+
+        for name, pipeline in (('inline', _InlinePipeline()), ('pool', pool)):
+            media_pipeline._pipeline = pipeline
+            probes, upload_times = _run(base, photo, args.uploaders, args.uploads)
+            print(f'{name:6} probe p50 {_pct(probes, 0.5):7.1f} ms  p95 {_pct(probes, 0.95):7.1f} ms  '
+                  f'max {max(probes) * 1000:7.1f} ms | upload p50 {_pct(upload_times, 0.5):7.1f} ms  '
+                  f'mean {statistics.mean(upload_times) * 1000:7.1f} ms')
+        media_pipeline._pipeline = pool
+        # Let queued pool work drain before the temp dir goes away
+        while any(j.finished is None for j in list(pool._jobs.values())):
+            time.sleep(0.1)
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Send throughput: a new SendGrid/Twilio client per message vs the shared, pooled provider clients.
+
+Runs against scripts/fake_provider_server.py (plain HTTP, so the saving shown
+is connection + client setup only; with TLS to the real APIs it is larger).
+
+    python scripts/bench_providers.py --messages 400 --concurrency 8 --latency-ms 20
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from fake_provider_server import FakeProviderServer  # noqa: E402
+
+
+def _run(server, send, n: int, concurrency: int):
+    connections = server.connections
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(send, range(n)))
+    elapsed = time.perf_counter() - start
+    return n / elapsed, server.connections - connections
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    args = parser.parse_args()
+
+    server = FakeProviderServer(latency=args.latency_ms / 1000.0).start()
+    os.environ.update(SENDGRID_API_HOST=server.url, TWILIO_API_BASE=server.url,
+                      TWILIO_ACCOUNT_SID='ACfake', TWILIO_AUTH_TOKEN='fake', TWILIO_FROM_NUMBER='+15550000000')
+
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail
+
+    from app.utils import providers
+    from app.utils.third_party_wrappers import send_email_sendgrid, send_sms_twilio
+
+    def email_per_call(i):
+        message = Mail(from_email='noreply@example.com', to_emails=f'u{i}@example.com', subject='s', html_content='c')
+        SendGridAPIClient('key', host=server.url).send(message)
+
+    def sms_per_call(i):
+        client = providers._twilio_client('ACfake', 'fake', server.url, 1, 30)
+        client.messages.create(body='hi', from_='+15550000000', to=f'+1555{i:07d}')
+
+    rows = [
+        ('email', 'per-call client', _run(server, email_per_call, args.messages, args.concurrency)),
+        ('email', 'shared pooled', _run(server, lambda i: send_email_sendgrid(f'u{i}@example.com', 's', 'c'),
+                                        args.messages, args.concurrency)),
+        ('sms', 'per-call client', _run(server, sms_per_call, args.messages, args.concurrency)),
+        ('sms', 'shared pooled', _run(server, lambda i: send_sms_twilio(f'+1555{i:07d}', 'hi'),
+                                      args.messages, args.concurrency)),
+    ]
+    server.stop()
+
+    print(f"{args.messages} messages, concurrency {args.concurrency}, {args.latency_ms:.0f} ms provider latency")
+    print(f"{'kind':<6} {'client':<16} {'msg/s':>8} {'connections':>12}")
+    for kind, label, (rate, conns) in rows:
+        print(f"{kind:<6} {label:<16} {rate:>8.1f} {conns:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for PTY output delivery: one frame per read vs batching.
+
+A writer thread pushes --megabytes of output through a raw PTY as fast as it
+can (like `cat` on a large log). Frames are JSON-encoded the way Socket.IO
+would and handed to a simulated client thread that pays --frame-cost-us per
+message (parsing, dispatch, xterm write) and acks each frame.
+
+    python scripts/bench_pty_output.py --megabytes 64 --frame-cost-us 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import tty
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.pty_output import OutputBatcher  # noqa: E402
+from app.utils.pty_reactor import PtyReactor  # noqa: E402
+
+CHUNK = b'x' * 79 + b'\n'
+
+
+def _writer(fd: int, total: int) -> None:
+    block = CHUNK * (65536 // len(CHUNK))
+    sent = 0
+    while sent < total:
+        sent += os.write(fd, block[: total - sent])
+
+
+def run(total: int, frame_cost: float, read_size: int, batched: bool):
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    reactor = PtyReactor(read_size=read_size)
+    inbox: queue.Queue = queue.Queue()
+    received = [0, 0]  # bytes, frames
+    done = threading.Event()
+
+    def send(frame: bytes, ack) -> None:
+        inbox.put((json.dumps({'data': frame.decode(errors='ignore')}), ack))
+
+    def client() -> None:
+        while received[0] < total:
+            packet, ack = inbox.get()
+            msg = json.loads(packet)
+            deadline = time.perf_counter() + frame_cost
+            while time.perf_counter() < deadline:
+                pass
+            received[0] += len(msg['data'])
+            received[1] += 1
+            ack()
+        done.set()
+
+    if batched:
+        batcher = OutputBatcher(reactor, master, send)
+    else:
+        batcher = OutputBatcher(reactor, master, send, flush_interval=0, max_bytes=1, max_inflight=1 << 30)
+
+    start = time.perf_counter()
+    reactor.register(master, batcher.feed, lambda: None)
+    threading.Thread(target=client, daemon=True).start()
+    threading.Thread(target=_writer, args=(slave, total), daemon=True).start()
+    done.wait()
+    elapsed = time.perf_counter() - start
+
+    reactor.unregister(master)
+    os.close(master)
+    os.close(slave)
+    return received[0] / elapsed / 1e6, received[1], inbox.qsize()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--megabytes', type=int, default=64)
+    parser.add_argument('--frame-cost-us', type=float, default=200.0)
+    args = parser.parse_args()
+
+    total = args.megabytes * 1_000_000
+    cost = args.frame_cost_us / 1e6
+    print(f"{args.megabytes} MB through a PTY, {args.frame_cost_us:.0f} us client cost per frame")
+    print(f"{'mode':<22} {'MB/s':>8} {'frames':>9}")
+    for name, read_size, batched in (
+        ('per-read (4 KiB)', 4096, False),
+        ('batched (64 KiB cap)', 65536, True),
+    ):
+        mbps, frames, _ = run(total, cost, read_size, batched)
+        print(f"{name:<22} {mbps:>8.1f} {frames:>9}")
+
+
+if __name__ == '__main__':
+    main()
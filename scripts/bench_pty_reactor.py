@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Idle-cost benchmark: one polling thread per PTY vs the shared PtyReactor.
+
+Opens N idle PTY pairs (no shell is forked, the slave end is simply held
+open) and reports thread count and process CPU time spent while nothing is
+being written.
+
+    python scripts/bench_pty_reactor.py --sessions 500 --seconds 10
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import resource
+import select
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.pty_reactor import PtyReactor  # noqa: E402
+
+
+def _legacy_reader(fd: int, stop: threading.Event) -> None:
+    # Mirrors the old per-session `_pty_reader` loop
+    while not stop.is_set():
+        r, _, _ = select.select([fd], [], [], 0.1)
+        if fd in r:
+            try:
+                if not os.read(fd, 4096):
+                    break
+            except OSError:
+                break
+
+
+def _open_ptys(n: int):
+    return [os.openpty() for _ in range(n)]
+
+
+def _close_ptys(pairs) -> None:
+    for master, slave in pairs:
+        os.close(master)
+        os.close(slave)
+
+
+def _measure(seconds: float):
+    cpu0 = time.process_time()
+    time.sleep(seconds)
+    return threading.active_count(), time.process_time() - cpu0
+
+
+def bench_threads(n: int, seconds: float):
+    pairs = _open_ptys(n)
+    stop = threading.Event()
+    threads = [threading.Thread(target=_legacy_reader, args=(m, stop), daemon=True) for m, _ in pairs]
+    for t in threads:
+        t.start()
+    try:
+        return _measure(seconds)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        _close_ptys(pairs)
+
+
+def bench_reactor(n: int, seconds: float):
+    pairs = _open_ptys(n)
+    reactor = PtyReactor()
+    for master, _ in pairs:
+        reactor.register(master, lambda data: None, lambda: None)
+    try:
+        return _measure(seconds)
+    finally:
+        for master, _ in pairs:
+            reactor.unregister(master)
+        _close_ptys(pairs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = args.sessions * 2 + 64
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+    print(f"{args.sessions} idle sessions, {args.seconds:.0f}s window")
+    print(f"{'mode':<10} {'threads':>8} {'cpu s':>8} {'cpu %':>7}")
+    for name, fn in (('threads', bench_threads), ('reactor', bench_reactor)):
+        threads, cpu = fn(args.sessions, args.seconds)
+        print(f"{name:<10} {threads:>8} {cpu:>8.3f} {100 * cpu / args.seconds:>6.1f}%")
+
+
+if __name__ == '__main__':
+    main()
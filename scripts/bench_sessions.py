@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Authenticated request latency and throughput: filesystem sessions vs the SQLite + LRU session store.
+
+Builds the app once per SESSION_TYPE in a temp directory, logs in --users
+distinct users and then sends --requests GETs (round robin over the users)
+to a `login_required` view that does nothing else, first from one thread
+for latency and then from --threads threads for throughput. Also counts
+requests bounced to /login: the filesystem backend prunes session files
+beyond SESSION_FILE_THRESHOLD (500), logging users out.
+
+    python scripts/bench_sessions.py --users 200 --requests 5000 --threads 8
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app  # noqa: E402
+from app.auth import login_required  # noqa: E402
+
+
+def _build(session_type: str, tmp: str):
+    app = create_app({'SESSION_TYPE': session_type, 'SESSION_FILE_DIR': os.path.join(tmp, session_type),
+                      'TERMINAL_SHELL_POOL_SIZE': '0'})
+
+    @app.route('/_bench')
+    @login_required
+    def _bench():
+        return 'ok'
+
+    return app
+
+
+def _login(app):
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'FINITQ', 'password': 'INFINITQ'})
+    assert response.status_code == 302, response.status_code
+    return client
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for session_type in ('filesystem', 'sqlite'):
+            app = _build(session_type, tmp)
+            clients = [_login(app) for _ in range(args.users)]
+
+            times, bounced = [], 0
+            for i in range(args.requests):
+                start = time.perf_counter()
+                status = clients[i % args.users].get('/_bench').status_code
+                times.append(time.perf_counter() - start)
+                bounced += status != 200
+            times.sort()
+
+            def worker(offset):
+                failed = 0
+                for i in range(offset, args.requests, args.threads):
+                    failed += clients[i % args.users].get('/_bench').status_code != 200
+                return failed
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.threads) as pool:
+                bounced += sum(pool.map(worker, range(args.threads)))
+            elapsed = time.perf_counter() - start
+
+            print(f'{session_type:10} p50 {statistics.median(times) * 1e6:6.0f} us, '
+                  f'p99 {times[int(len(times) * 0.99)] * 1e6:6.0f} us, '
+                  f'{args.requests / elapsed:7.0f} req/s with {args.threads} threads, '
+                  f'{bounced} logged out')
+            if hasattr(app.session_interface, 'stats'):
+                print(f'{"":10} store stats: {app.session_interface.stats()}')
+
+
+if __name__ == '__main__':
+    main()
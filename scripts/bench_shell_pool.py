@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-prompt: in-process fork vs the pre-forked shell pool.
+
+--ballast-mb allocates and touches memory first so the in-process fork has
+to copy the page tables of a realistically sized server process.
+
+    python scripts/bench_shell_pool.py --trials 20 --ballast-mb 512
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import select
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import shell_pool  # noqa: E402
+
+
+def _first_output_ms(acquire) -> float:
+    start = time.perf_counter()
+    master_fd, pid, pidfd = acquire()
+    select.select([master_fd], [], [], 10.0)
+    elapsed = (time.perf_counter() - start) * 1000.0
+    os.close(master_fd)
+    signal.pidfd_send_signal(pidfd, signal.SIGHUP)
+    os.close(pidfd)
+    return elapsed
+
+
+def _fork_shell():
+    master_fd, pid = shell_pool.spawn_shell()
+    return master_fd, pid, os.pidfd_open(pid)
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[-1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--trials', type=int, default=20)
+    parser.add_argument('--pool-size', type=int, default=2)
+    parser.add_argument('--ballast-mb', type=int, default=512)
+    parser.add_argument('--pace', type=float, default=3.0,
+                        help='seconds between pool requests, enough for the spawner to refill')
+    args = parser.parse_args()
+
+    # Start the spawner first, like create_app does, while the process is small
+    pool = shell_pool.ShellPool(args.pool_size)
+    ballast = bytearray(args.ballast_mb * 1024 * 1024)
+    for i in range(0, len(ballast), 4096):
+        ballast[i] = 1
+    time.sleep(args.pace)  # let the pool warm up
+
+    cold = []
+    for _ in range(args.trials):
+        cold.append(_first_output_ms(_fork_shell))
+        os.waitpid(-1, 0)
+    warm = []
+    for _ in range(args.trials):
+        warm.append(_first_output_ms(pool.acquire))
+        time.sleep(args.pace)
+    pool.close()
+
+    print(f"{args.trials} trials, {args.ballast_mb} MB resident ballast")
+    print(f"{'mode':<8} {'p50 ms':>8} {'max ms':>8}")
+    for name, samples in (('fork', cold), ('pool', warm)):
+        p50, worst = _summary(samples)
+        print(f"{name:<8} {p50:>8.2f} {worst:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
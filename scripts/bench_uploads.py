@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Multipart upload cost: Werkzeug's request.files + FileStorage.save() vs the streaming upload path.
+
+Feeds the same multipart body to both through the Flask test client and
+reports wall time, bytes written to disk (from /proc/self/io, Linux only)
+and peak Python heap.
+
+    python scripts/bench_uploads.py --size-mb 256
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask, jsonify, request  # noqa: E402
+
+from app.utils import uploads  # noqa: E402
+
+
+def _disk_writes() -> int:
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('write_bytes:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _app(save_dir: Path) -> Flask:
+    app = Flask(__name__)
+
+    @app.route('/old', methods=['POST'])
+    def old():
+        uploaded = request.files['file']
+        dest = save_dir / f'old_{uploaded.filename}'
+        uploaded.save(str(dest))
+        return jsonify({'path': str(dest)})
+
+    @app.route('/new', methods=['POST'])
+    def new():
+        saved = uploads.parse_multipart_to_disk(
+            request.stream, request.mimetype, request.content_length, request.mimetype_params, save_dir
+        )
+        return jsonify(saved)
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=int, default=256)
+    args = parser.parse_args()
+
+    boundary = 'benchboundary'
+    payload = os.urandom(1024 * 1024) * args.size_mb
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="clip.mp4"\r\n'
+        f'Content-Type: video/mp4\r\n\r\n'
+    ).encode() + payload + f'\r\n--{boundary}--\r\n'.encode()
+    del payload
+
+    with tempfile.TemporaryDirectory() as tmp:
+        client = _app(Path(tmp)).test_client()
+        for name in ('old', 'new'):
+            os.sync()
+            writes = _disk_writes()
+            tracemalloc.start()
+            start = time.perf_counter()
+            resp = client.post(f'/{name}', input_stream=io.BytesIO(body), content_length=len(body),
+                               content_type=f'multipart/form-data; boundary={boundary}')
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            os.sync()
+            written = _disk_writes() - writes
+            assert resp.status_code == 200, resp.data
+            os.unlink(resp.json['path'])
+            print(f'{name}: {elapsed * 1000:8.1f} ms  disk writes {written / 2 ** 20:8.1f} MiB  '
+                  f'peak heap {peak / 2 ** 20:6.2f} MiB')
+
+
+if __name__ == '__main__':
+    main()
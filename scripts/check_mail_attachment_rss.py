@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Peak RSS growth while emailing a large attachment: read + b64encode + JSON vs the streamed body.
+
+Each variant runs in its own child process (ru_maxrss never goes down) and
+sends to scripts/fake_provider_server.py, itself in another process so its
+copy of the request doesn't count. Exits 1 if the streamed send grows RSS by
+more than --limit-mb, so it can gate a release.
+
+    python scripts/check_mail_attachment_rss.py --size-mb 100 --limit-mb 16
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def _child(mode: str, path: str) -> None:
+    from app.utils.providers import get_sendgrid
+    from app.utils.third_party_wrappers import send_email_with_attachments_sendgrid
+
+    get_sendgrid()  # build the client before the baseline
+    baseline = _rss_mb()
+    attachment = {'path': path, 'filename': 'capture.mp4', 'type': 'video/mp4'}
+    if mode == 'naive':
+        with open(path, 'rb') as f:
+            content = base64.b64encode(f.read()).decode()
+        get_sendgrid().send({
+            'personalizations': [{'to': [{'email': 'rss@example.com'}]}],
+            'from': {'email': 'noreply@example.com'}, 'subject': 'capture',
+            'content': [{'type': 'text/html', 'value': '<p>capture</p>'}],
+            'attachments': [dict(attachment, content=content, disposition='attachment')],
+        })
+    else:
+        send_email_with_attachments_sendgrid('rss@example.com', 'capture', '<p>capture</p>', [attachment])
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'baseline_mb': baseline, 'peak_mb': peak}))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=int, default=100)
+    parser.add_argument('--limit-mb', type=float, default=16.0)
+    parser.add_argument('--child', choices=['naive', 'streaming'])
+    parser.add_argument('--file')
+    args = parser.parse_args()
+    if args.child:
+        return _child(args.child, args.file)
+
+    port = _free_port()
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'scripts', 'fake_provider_server.py'),
+                               '--port', str(port)], stdout=subprocess.DEVNULL)
+    env = dict(os.environ, SENDGRID_API_HOST=f'http://127.0.0.1:{port}', PROVIDER_TIMEOUT='300')
+    try:
+        time.sleep(1.0)
+        with tempfile.NamedTemporaryFile(suffix='.mp4') as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+            f.flush()
+            growth = {}
+            for mode in ('naive', 'streaming'):
+                start = time.perf_counter()
+                out = subprocess.run([sys.executable, __file__, '--child', mode, '--file', f.name],
+                                     env=env, capture_output=True, text=True, check=True).stdout
+                elapsed = time.perf_counter() - start
+                result = json.loads(out.strip().splitlines()[-1])
+                growth[mode] = result['peak_mb'] - result['baseline_mb']
+                print(f'{mode:9} {args.size_mb} MiB attachment: peak RSS +{growth[mode]:7.1f} MiB '
+                      f'({growth[mode] / args.size_mb:.2f}x file size), {elapsed:.2f} s')
+    finally:
+        server.terminate()
+        server.wait()
+    if growth['streaming'] > args.limit_mb:
+        print(f'FAIL: streamed send grew RSS by more than {args.limit_mb} MiB')
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Minimal fake AWS endpoint (EC2 query API + CloudWatch Logs JSON API), for benchmarks.
+
+Implements just enough for boto3's `ec2.describe_instances()` /
+`describe_regions()` / `run_instances()` / `terminate_instances()` and
+`logs.filter_log_events()`, including pagination. Calls naming unknown
+instance ids fail with InvalidInstanceID.NotFound, listing them. Instances move from
+pending to running (and shutting-down to terminated) after
+`transition_delay` seconds. Point boto3 at it with
+AWS_ENDPOINT_URL=http://127.0.0.1:<port> and any dummy credentials.
+
+    python scripts/fake_aws_endpoint.py --port 4566 --instances 50 --log-events 5000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs
+from xml.sax.saxutils import escape
+
+EC2_NS = 'http://ec2.amazonaws.com/doc/2016-11-15/'
+REGIONS = ['us-east-1', 'us-west-2', 'eu-west-1']
+
+
+def _instance_xml(inst: dict) -> str:
+    return (
+        f"<item><instanceId>{inst['id']}</instanceId><imageId>{inst['ami']}</imageId>"
+        f"<instanceState><code>{inst['code']}</code><name>{inst['state']}</name></instanceState>"
+        f"<instanceType>{inst['type']}</instanceType><launchTime>2024-01-01T00:00:00.000Z</launchTime>"
+        f"<placement><availabilityZone>{inst['region']}a</availabilityZone></placement>"
+        f"<privateIpAddress>{inst['ip']}</privateIpAddress></item>"
+    )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; avoid Nagle stalls on keep-alive
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: bytes, status: int = 200, content_type: str = 'text/xml'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('x-amzn-RequestId', 'fake')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _ec2(self, action: str, response: str):
+        body = f'<{action}Response xmlns="{EC2_NS}"><requestId>fake</requestId>{response}</{action}Response>'
+        self._send(body.encode())
+
+    def _ec2_error(self, code: str, message: str, status: int = 400):
+        body = (f'<Response><Errors><Error><Code>{code}</Code><Message>{escape(message)}</Message>'
+                f'</Error></Errors><RequestID>fake</RequestID></Response>')
+        self._send(body.encode(), status)
+
+    def do_POST(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        region = _region_of(self.headers.get('Authorization', ''))
+        with server.lock:
+            server.calls += 1
+        target = self.headers.get('X-Amz-Target', '')
+        if target.startswith('Logs_'):
+            return self._logs(target.split('.', 1)[1], json.loads(body or b'{}'))
+        params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+        action = params.get('Action', '')
+        handler = getattr(self, f'_ec2_{action}', None)
+        if handler is None:
+            return self._ec2_error('InvalidAction', f'not implemented: {action}')
+        handler(params, region)
+
+    # -- EC2 ----------------------------------------------------------------
+
+    def _ec2_DescribeRegions(self, params, region):
+        items = ''.join(f'<item><regionName>{r}</regionName><regionEndpoint>ec2.{r}.amazonaws.com'
+                        f'</regionEndpoint></item>' for r in self.server.regions)
+        self._ec2('DescribeRegions', f'<regionInfo>{items}</regionInfo>')
+
+    def _ec2_DescribeInstances(self, params, region):
+        server = self.server
+        with server.lock:
+            server.describe_calls += 1
+            server.advance_states()
+            instances = [i for i in server.instances.values() if i['region'] == region]
+        wanted = {v for k, v in params.items() if k.startswith('InstanceId.')}
+        missing = sorted(wanted - {i['id'] for i in instances})
+        if missing:
+            return self._ec2_error('InvalidInstanceID.NotFound', _not_found_message(missing))
+        if wanted:
+            instances = [i for i in instances if i['id'] in wanted]
+        start = int(params.get('NextToken') or 0)
+        size = int(params.get('MaxResults') or 1000)
+        page = instances[start:start + size]
+        items = ''.join(f'<item><reservationId>r-{i["id"][2:]}</reservationId><ownerId>123456789012</ownerId>'
+                        f'<instancesSet>{_instance_xml(i)}</instancesSet></item>' for i in page)
+        token = f'<nextToken>{start + size}</nextToken>' if start + size < len(instances) else ''
+        self._ec2('DescribeInstances', f'<reservationSet>{items}</reservationSet>{token}')
+
+    def _ec2_RunInstances(self, params, region):
+        server = self.server
+        count = int(params.get('MaxCount') or 1)
+        created = []
+        for _ in range(count):
+            created.append(server.add_instance(region, params.get('ImageId', 'ami-fake'),
+                                               params.get('InstanceType', 't3.micro'), state='pending'))
+        items = ''.join(_instance_xml(i) for i in created)
+        self._ec2('RunInstances', f'<reservationId>r-fake</reservationId><ownerId>123456789012</ownerId>'
+                                  f'<instancesSet>{items}</instancesSet>')
+
+    def _ec2_TerminateInstances(self, params, region):
+        server = self.server
+        ids = [v for k, v in sorted(params.items()) if k.startswith('InstanceId.')]
+        items = []
+        with server.lock:
+            # Like EC2, one unknown id fails the whole call and nothing is terminated
+            missing = [i for i in ids if i not in server.instances]
+            if missing:
+                return self._ec2_error('InvalidInstanceID.NotFound', _not_found_message(missing))
+            for iid in ids:
+                inst = server.instances[iid]
+                prev = (inst['code'], inst['state'])
+                inst.update(code=32, state='shutting-down', changed=time.monotonic())
+                items.append(f'<item><instanceId>{iid}</instanceId>'
+                             f'<previousState><code>{prev[0]}</code><name>{prev[1]}</name></previousState>'
+                             f'<currentState><code>32</code><name>shutting-down</name></currentState></item>')
+        self._ec2('TerminateInstances', f'<instancesSet>{"".join(items)}</instancesSet>')
+
+    # -- CloudWatch Logs ------------------------------------------------------
+
+    def _logs(self, operation: str, payload: dict):
+        if operation != 'FilterLogEvents':
+            return self._send(json.dumps({'__type': 'InvalidAction', 'message': operation}).encode(), 400,
+                              'application/x-amz-json-1.1')
+        server = self.server
+        group = payload.get('logGroupName')
+        with server.lock:
+            server.filter_calls += 1
+            events = server.log_groups.get(group)
+        if events is None:
+            body = {'__type': 'ResourceNotFoundException', 'message': 'The specified log group does not exist.'}
+            return self._send(json.dumps(body).encode(), 400, 'application/x-amz-json-1.1')
+        start_time = payload.get('startTime', 0)
+        end_time = payload.get('endTime', 1 << 62)
+        offset = int(payload.get('nextToken') or 0)
+        limit = min(int(payload.get('limit') or 10000), 10000)
+        matched = [e for e in events[offset:] if start_time <= e['timestamp'] <= end_time]
+        page = matched[:min(limit, server.page_size)]
+        result: Dict[str, object] = {'events': page, 'searchedLogStreams': []}
+        if len(matched) > len(page):
+            result['nextToken'] = str(events.index(page[-1], offset) + 1)
+        self._send(json.dumps(result).encode(), content_type='application/x-amz-json-1.1')
+
+
+def _not_found_message(ids: List[str]) -> str:
+    if len(ids) == 1:
+        return f"The instance ID '{ids[0]}' does not exist"
+    return f"The instance IDs '{', '.join(ids)}' do not exist"
+
+
+def _region_of(authorization: str) -> str:
+    # "AWS4-HMAC-SHA256 Credential=AKID/20240101/us-east-1/ec2/aws4_request, ..."
+    try:
+        return authorization.split('Credential=', 1)[1].split('/')[2]
+    except IndexError:
+        return 'us-east-1'
+
+
+class FakeAwsEndpoint(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, instances: int = 0, log_events: int = 0, latency: float = 0.0,
+                 regions: List[str] = REGIONS):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.latency = latency
+        self.regions = list(regions)
+        self.lock = threading.Lock()
+        self.instances: Dict[str, dict] = {}
+        self.log_groups: Dict[str, List[dict]] = {}
+        self.page_size = 1000
+        # Seconds before pending -> running and shutting-down -> terminated
+        self.transition_delay = 1.0
+        self.calls = 0
+        self.describe_calls = 0
+        self.filter_calls = 0
+        self._next = 0
+        for n in range(instances):
+            self.add_instance(self.regions[n % len(self.regions)])
+        if log_events:
+            self.add_log_events('/fake/app', log_events)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def add_instance(self, region: str, ami: str = 'ami-fake', instance_type: str = 't3.micro',
+                     state: str = 'running') -> dict:
+        with self.lock:
+            n = self._next
+            self._next += 1
+            inst = {'id': f'i-{n:017x}', 'region': region, 'ami': ami, 'type': instance_type,
+                    'state': state, 'code': 16 if state == 'running' else 0, 'ip': f'10.0.{n // 250}.{n % 250 + 1}',
+                    'changed': time.monotonic()}
+            self.instances[inst['id']] = inst
+            return inst
+
+    def advance_states(self) -> None:
+        # Called with self.lock held
+        cutoff = time.monotonic() - self.transition_delay
+        for inst in self.instances.values():
+            if inst['changed'] <= cutoff and inst['state'] in ('pending', 'shutting-down'):
+                running = inst['state'] == 'pending'
+                inst.update(state='running' if running else 'terminated', code=16 if running else 48,
+                            changed=time.monotonic())
+
+    def add_log_events(self, group: str, count: int, start_ms: int = 0, stream: str = 'stream-1') -> None:
+        now = start_ms or int(time.time() * 1000) - count
+        with self.lock:
+            events = self.log_groups.setdefault(group, [])
+            base = len(events)
+            for n in range(count):
+                events.append({'logStreamName': stream, 'timestamp': now + n, 'ingestionTime': now + n,
+                               'message': f'event {base + n} ' + '.' * 60, 'eventId': f'{group}-{base + n}'})
+
+    def start(self) -> 'FakeAwsEndpoint':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=4566)
+    parser.add_argument('--instances', type=int, default=50)
+    parser.add_argument('--log-events', type=int, default=5000)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+    endpoint = FakeAwsEndpoint(args.port, args.instances, args.log_events, args.latency_ms / 1000.0)
+    print(f'fake aws endpoint on {endpoint.url}')
+    endpoint.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Minimal fake Docker Engine API served over a UNIX socket, for benchmarks.
+
+Implements just enough of the API for docker-py's `from_env()`, `ping()`,
+`containers.list()`/`get()`/`logs()`/`stats()`, `images.list()`, `events()` and the
+low-level start/stop/remove calls (`stop_delay` simulates the stop grace). Point a client
+at it with DOCKER_HOST=unix://<path>. `add_container`/`remove_container`
+mutate the fake state and publish the matching events.
+
+    python scripts/fake_docker_daemon.py /tmp/fake-docker.sock --containers 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import re
+import socketserver
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+API_VERSION = '1.41'
+
+
+def _container(i: int) -> dict:
+    cid = f'{i:064x}'
+    return {
+        'Id': cid,
+        'Name': f'/fake-{i}',
+        'Created': '2024-01-01T00:00:00Z',
+        'State': {'Status': 'running', 'Running': True, 'Pid': 1000 + i},
+        'Config': {'Image': 'busybox:latest', 'Labels': {}, 'Env': ['PATH=/bin'] * 20, 'Tty': False},
+        'Image': 'sha256:' + 'b' * 64,
+        'NetworkSettings': {'IPAddress': f'172.17.{i // 250}.{i % 250 + 2}', 'Networks': {}},
+        'Mounts': [],
+        'HostConfig': {'NetworkMode': 'bridge'},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):  # unix sockets have no client address
+        pass
+
+    def address_string(self):
+        return 'unix'
+
+    def _send(self, body, status=200, content_type='application/json'):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Api-Version', API_VERSION)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_HEAD(self):
+        self._send(b'', content_type='text/plain')
+
+    def _stream_events(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        subscriber: queue.Queue = queue.Queue()
+        self.server.subscribers.append(subscriber)
+        try:
+            while True:
+                line = json.dumps(subscriber.get()).encode() + b'\n'
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            self.server.subscribers.remove(subscriber)
+
+    def _stream_logs(self, params):
+        # Multiplexed stdout frames, as for a container started without a TTY
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.docker.multiplexed-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        server = self.server
+        follow = params.get('follow', ['0'])[0] in ('1', 'true', 'True')
+        server.open_log_streams += 1
+        try:
+            n = 0
+            while n < server.log_lines or follow:
+                line = f'log line {n} '.encode() + b'.' * 60 + b'\n'
+                frame = struct.pack('>BxxxL', 1, len(line)) + line
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(frame), frame))
+                self.wfile.flush()
+                n += 1
+                if n >= server.log_lines:
+                    time.sleep(server.follow_interval)
+            self.wfile.write(b'0\r\n\r\n')
+        except OSError:
+            pass
+        finally:
+            server.open_log_streams -= 1
+
+    def _stream_stats(self, cid):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        server = self.server
+        server.open_stats_streams += 1
+        n = 0
+        try:
+            while True:
+                n += 1
+                sample = {
+                    'id': cid,
+                    'cpu_stats': {'cpu_usage': {'total_usage': n * 5_000_000}, 'system_cpu_usage': n * 100_000_000,
+                                  'online_cpus': 2},
+                    'precpu_stats': {'cpu_usage': {'total_usage': (n - 1) * 5_000_000},
+                                     'system_cpu_usage': (n - 1) * 100_000_000},
+                    'memory_stats': {'usage': 50_000_000, 'limit': 1_000_000_000, 'stats': {'inactive_file': 1_000_000}},
+                    'networks': {'eth0': {'rx_bytes': n * 1000, 'tx_bytes': n * 500}},
+                    'blkio_stats': {'io_service_bytes_recursive': [{'op': 'read', 'value': n * 4096},
+                                                                   {'op': 'write', 'value': n * 8192}]},
+                }
+                line = json.dumps(sample).encode() + b'\n'
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                self.wfile.flush()
+                time.sleep(server.stats_interval)
+        except OSError:
+            pass
+        finally:
+            server.open_stats_streams -= 1
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        path, _, query = self.path.partition('?')
+        path = re.sub(r'^/v[0-9.]+', '', path)
+        params = parse_qs(query)
+        if path == '/_ping':
+            return self._send(b'OK', content_type='text/plain')
+        if path == '/version':
+            return self._send({'ApiVersion': API_VERSION, 'Version': '24.0.0', 'MinAPIVersion': '1.12'})
+        if path == '/events':
+            return self._stream_events()
+        if path == '/containers/json':
+            filters = json.loads(params.get('filters', ['{}'])[0])
+            ids = filters.get('id')
+            show_all = params.get('all', ['0'])[0] in ('1', 'true', 'True')
+            server.list_calls += 1
+            return self._send([
+                {'Id': c['Id'], 'Names': [c['Name']], 'Image': 'busybox:latest',
+                 'State': c['State']['Status'], 'Status': 'Up 1 hour', 'Labels': {}}
+                for c in list(server.containers.values())
+                if (show_all or c['State']['Running'])
+                and (not ids or any(c['Id'].startswith(i) for i in ids))
+            ])
+        match = re.match(r'^/containers/([^/]+)/stats$', path)
+        if match:
+            return self._stream_stats(match.group(1))
+        if re.match(r'^/containers/([^/]+)/logs$', path):
+            return self._stream_logs(params)
+        match = re.match(r'^/containers/([^/]+)/json$', path)
+        if match:
+            server.inspect_calls += 1
+            c = server.find(match.group(1))
+            return self._send(c) if c else self._send({'message': 'No such container'}, 404)
+        if path == '/images/json':
+            return self._send([{'Id': 'sha256:' + 'b' * 64, 'RepoTags': ['busybox:latest']}])
+        match = re.match(r'^/images/(.+)/json$', path)
+        if match:
+            return self._send({'Id': 'sha256:' + 'b' * 64, 'RepoTags': ['busybox:latest']})
+        self._send({'message': f'not implemented: {path}'}, 404)
+
+
+    def do_POST(self):
+        server = self.server
+        path = re.sub(r'^/v[0-9.]+', '', self.path.partition('?')[0])
+        match = re.match(r'^/containers/([^/]+)/(start|stop)$', path)
+        c = server.find(match.group(1)) if match else None
+        if not c:
+            return self._send({'message': 'No such container'}, 404)
+        if match.group(2) == 'stop':
+            time.sleep(server.stop_delay)
+        running = match.group(2) == 'start'
+        c['State'].update(Running=running, Status='running' if running else 'exited')
+        server.publish('container', match.group(2), c['Id'])
+        self._send(b'', status=204)
+
+    def do_DELETE(self):
+        server = self.server
+        path = re.sub(r'^/v[0-9.]+', '', self.path.partition('?')[0])
+        match = re.match(r'^/containers/([^/]+)$', path)
+        c = server.find(match.group(1)) if match else None
+        if not c:
+            return self._send({'message': 'No such container'}, 404)
+        server.remove_container(c['Id'])
+        self._send(b'', status=204)
+
+
+class FakeDockerDaemon(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, containers: int = 20, latency: float = 0.0):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _Handler)
+        self.path = path
+        self.latency = latency
+        self.containers = {c['Id']: c for c in (_container(i) for i in range(containers))}
+        self.subscribers: list = []
+        self.list_calls = 0
+        self.inspect_calls = 0
+        self.log_lines = 1000
+        self.follow_interval = 0.05
+        self.open_log_streams = 0
+        self.stop_delay = 0.0
+        self.stats_interval = 1.0
+        self.open_stats_streams = 0
+        self._next = containers
+
+    def publish(self, kind: str, action: str, obj_id: str) -> None:
+        event = {'Type': kind, 'Action': action, 'id': obj_id, 'Actor': {'ID': obj_id},
+                 'time': int(time.time()), 'timeNano': time.time_ns()}
+        for subscriber in list(self.subscribers):
+            subscriber.put(event)
+
+    def add_container(self) -> str:
+        c = _container(self._next)
+        self._next += 1
+        self.containers[c['Id']] = c
+        self.publish('container', 'create', c['Id'])
+        self.publish('container', 'start', c['Id'])
+        return c['Id']
+
+    def remove_container(self, cid: str) -> None:
+        self.containers.pop(cid, None)
+        self.publish('container', 'destroy', cid)
+
+    def find(self, ref: str):
+        for c in self.containers.values():
+            if c['Id'].startswith(ref) or c['Name'].lstrip('/') == ref:
+                return c
+        return None
+
+    def start(self) -> 'FakeDockerDaemon':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        os.unlink(self.path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('path')
+    parser.add_argument('--containers', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+    daemon = FakeDockerDaemon(args.path, args.containers, args.latency_ms / 1000.0)
+    print(f'fake docker daemon on unix://{args.path}')
+    daemon.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
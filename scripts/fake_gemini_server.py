@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Minimal fake Gemini API (generateContent / streamGenerateContent), for tests and benchmarks.
+
+Answers `POST /v1beta/models/<model>:generateContent` with one response and
+`:streamGenerateContent?alt=sse` with Server-Sent Events, one chunk per
+`words_per_chunk` words. The text echoes the prompt, so responses are
+deterministic. `latency` is the time to the first chunk and `chunk_delay`
+the gap between chunks. A prompt containing "FAIL" gets a 500. Counters:
+`requests`, `connections`. Point the app at it with
+GEMINI_API_HOST=http://127.0.0.1:<port>.
+
+    python scripts/fake_gemini_server.py --port 8026 --latency-ms 300 --chunk-delay-ms 30
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, body) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        match = re.match(r'^/v1beta/models/([\w.\-]+):(generateContent|streamGenerateContent)(\?.*)?$', self.path)
+        if not match:
+            return self._send_json(404, {'error': {'code': 404, 'message': f'not found: {self.path}'}})
+        if not self.headers.get('x-goog-api-key'):
+            return self._send_json(403, {'error': {'code': 403, 'message': 'API key missing'}})
+        with server.lock:
+            server.requests += 1
+        prompt = ''.join(p.get('text', '') for c in body.get('contents', []) for p in c.get('parts', []))
+        time.sleep(server.latency)
+        if 'FAIL' in prompt:
+            return self._send_json(500, {'error': {'code': 500, 'message': 'internal error'}})
+        words = f'Echo from {match.group(1)}: {prompt}'.split(' ')
+        pieces = [' '.join(words[i:i + server.words_per_chunk]) + ' '
+                  for i in range(0, len(words), server.words_per_chunk)]
+        usage = {'promptTokenCount': len(prompt.split()), 'candidatesTokenCount': len(words),
+                 'totalTokenCount': len(prompt.split()) + len(words)}
+
+        def response(text, last):
+            chunk = {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'index': 0}]}
+            if last:
+                chunk['candidates'][0]['finishReason'] = 'STOP'
+                chunk['usageMetadata'] = usage
+            return chunk
+
+        if match.group(2) == 'generateContent':
+            return self._send_json(200, response(''.join(pieces), True))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(server.chunk_delay)
+            event = json.dumps(response(piece, i == len(pieces) - 1))
+            self._write_chunk(f'data: {event}\r\n\r\n'.encode())
+        self._write_chunk(b'')
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0, chunk_delay: float = 0.0, words_per_chunk: int = 3):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.words_per_chunk = words_per_chunk
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self) -> 'FakeGeminiServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8026)
+    parser.add_argument('--latency-ms', type=float, default=300.0)
+    parser.add_argument('--chunk-delay-ms', type=float, default=30.0)
+    args = parser.parse_args()
+    server = FakeGeminiServer(args.port, args.latency_ms / 1000.0, args.chunk_delay_ms / 1000.0)
+    print(f'fake gemini on {server.url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Minimal fake SendGrid and Twilio HTTP APIs, for benchmarks.
+
+Implements SendGrid's `POST /v3/mail/send` (202, counts personalizations)
+and Twilio's `POST /2010-04-01/Accounts/<sid>/Messages.json` (201 with a
+queued message). Decoded attachment sizes are summed in
+`attachment_bytes`. `latency` delays every response; `rate_limit_every`
+makes every Nth request answer 429 with Retry-After. Point the app at it
+with SENDGRID_API_HOST / TWILIO_API_BASE=http://127.0.0.1:<port>.
+
+Plain HTTP keeps TLS out of the measurement; `connections` counts accepted
+TCP connections, which shows whether clients reuse keep-alive sessions.
+
+    python scripts/fake_provider_server.py --port 8025 --latency-ms 20
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import re
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if server.latency:
+            time.sleep(server.latency)
+        with server.lock:
+            server.requests += 1
+            limited = server.rate_limit_every and server.requests % server.rate_limit_every == 0
+        if limited:
+            return self._send(429, {'errors': [{'message': 'rate limited'}]}, {'Retry-After': '1'})
+        path = self.path.partition('?')[0]
+        if path == '/v3/mail/send':
+            body = json.loads(raw or b'{}')
+            personalizations = body.get('personalizations') or []
+            if not personalizations or len(personalizations) > 1000:
+                return self._send(400, {'errors': [{'message': 'personalizations must have 1..1000 items'}]})
+            attached = sum(len(base64.b64decode(a.get('content') or '')) for a in body.get('attachments') or [])
+            with server.lock:
+                server.emails += len(personalizations)
+                server.mail_requests += 1
+                server.attachment_bytes += attached
+            return self._send(202)
+        match = re.match(r'^/2010-04-01/Accounts/([^/]+)/Messages\.json$', path)
+        if match:
+            form = {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+            if not form.get('To'):
+                return self._send(400, {'code': 21604, 'message': "A 'To' phone number is required.", 'status': 400})
+            with server.lock:
+                server.sms += 1
+            sid = 'SM' + uuid.uuid4().hex
+            return self._send(201, {
+                'sid': sid, 'account_sid': match.group(1), 'to': form['To'], 'from': form.get('From'),
+                'body': form.get('Body'), 'status': 'queued', 'num_segments': '1', 'direction': 'outbound-api',
+                'api_version': '2010-04-01', 'uri': f'/2010-04-01/Accounts/{match.group(1)}/Messages/{sid}.json',
+            })
+        self._send(404, {'message': f'not implemented: {path}'})
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0, rate_limit_every: int = 0):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.mail_requests = 0
+        self.emails = 0
+        self.attachment_bytes = 0
+        self.sms = 0
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self) -> 'FakeProviderServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--rate-limit-every', type=int, default=0)
+    args = parser.parse_args()
+    server = FakeProviderServer(args.port, args.latency_ms / 1000.0, args.rate_limit_every)
+    print(f'fake sendgrid/twilio on {server.url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from fake_provider_server import FakeProviderServer  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def provider_server():
+    """Fake SendGrid/Twilio, set as the provider host before any client is built."""
+    server = FakeProviderServer().start()
+    os.environ['SENDGRID_API_HOST'] = server.url
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def app(tmp_path, provider_server):
+    from app import create_app
+    return create_app({'SESSION_FILE_DIR': str(tmp_path / 'sessions'), 'TERMINAL_SHELL_POOL_SIZE': '0'})
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'FINITQ', 'password': 'INFINITQ'})
+    assert response.status_code == 302
+    return client
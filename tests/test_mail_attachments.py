@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.routes import js_tools
+from app.utils.mail_attachments import BLOCK_SIZE
+from app.utils.message_queue import get_message_queue
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Peak RSS growth allowed for one streamed send; reading and base64-encoding
+# the test file in memory grows it by over 100 MiB
+RSS_LIMIT_MB = 16
+
+
+def test_streamed_attachment_bounds_peak_rss(tmp_path, provider_server):
+    size = 32 * 1024 * 1024
+    assert size >= 8 * BLOCK_SIZE
+    path = tmp_path / 'capture.mp4'
+    with open(path, 'wb') as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(size // len(block)):
+            f.write(block)
+    before = provider_server.attachment_bytes
+
+    # In a child process: ru_maxrss never goes down, and the server's copy of the request must not count
+    out = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'scripts', 'check_mail_attachment_rss.py'),
+         '--child', 'streaming', '--file', str(path)],
+        env=dict(os.environ, SENDGRID_API_HOST=provider_server.url, PROVIDER_TIMEOUT='120'),
+        capture_output=True, text=True, check=True, timeout=300,
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+
+    assert provider_server.attachment_bytes - before == size
+    assert result['peak_mb'] - result['baseline_mb'] < RSS_LIMIT_MB
+
+
+def _upload(client, name, size):
+    response = client.post('/api/js/upload_media', data=os.urandom(size), headers={'X-Filename': name},
+                           content_type='application/octet-stream')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['id']
+
+
+def _send(client, upload_id):
+    response = client.post('/api/js/send_captured_email', json={'to': 'a@example.com', 'upload_id': upload_id})
+    assert response.status_code == 202, response.get_json()
+    body = response.get_json()
+    job = get_message_queue().get(body['job_id'])
+    next(get_message_queue().follow([job], poll=0.1))
+    assert job.status == 'sent', job.error
+    return body['delivery'], job
+
+
+def test_large_files_are_sent_as_link(client, tmp_path, provider_server, monkeypatch):
+    monkeypatch.setattr(js_tools, '_upload_dir', lambda: tmp_path / 'uploads')
+    monkeypatch.setattr(js_tools, 'MAX_ATTACHMENT_BYTES', 64 * 1024)
+
+    before = provider_server.attachment_bytes
+    delivery, job = _send(client, _upload(client, 'small.bin', 64 * 1024))
+    assert delivery == 'attachment'
+    assert job.kind == 'email_attachments'
+    assert provider_server.attachment_bytes - before == 64 * 1024
+
+    before = provider_server.attachment_bytes
+    upload_id = _upload(client, 'large.bin', 64 * 1024 + 1)
+    delivery, job = _send(client, upload_id)
+    assert delivery == 'link'
+    assert job.kind == 'email'
+    assert provider_server.attachment_bytes == before
+    link = job.payload['content'].split('href="', 1)[1].split('"', 1)[0]
+    response = client.get(link)
+    assert response.status_code == 200
+    assert len(response.data) == 64 * 1024 + 1